@@ -0,0 +1,126 @@
+"""
+PharmaGuard Prompt Benchmark
+Compares the full and compact explanation prompts (LLM_PROMPT_MODE) over the
+warm-up plan (every supported drug × phenotype plus common diplotypes):
+prompt tokens, response tokens, the output-token cap, and latency.
+
+Offline (default) responses are the recorded provider explanations in the
+explanation cache (explanations.db) where one exists for the full prompt,
+otherwise the rule-based explanation as a mock. Compact responses are the
+same text cut to the compact per-field limits. Latency is modelled per token
+(--overhead-ms, --prefill-ms, --decode-ms). With --live, the configured
+provider is called for real and wall-clock latency is measured.
+
+Usage (from backend/):
+    python bench_prompts.py
+    python bench_prompts.py --decode-ms 6
+    python bench_prompts.py --live --limit 5     # needs GEMINI_API_KEY or GROQ_API_KEY
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Live runs must reach the provider, not the explanation cache
+if "--live" in sys.argv:
+    os.environ["EXPLANATION_CACHE_ENABLED"] = "0"
+
+from services import explanation_cache, llm_service, orchestrator, warmup
+
+
+def _recorded_or_mock(args: dict) -> dict:
+    """A recorded provider explanation for the full prompt, else the rule-based one."""
+    recorded = explanation_cache.get(llm_service.clinical_prompt("full", **args).cache_key)
+    if recorded is not None:
+        return recorded
+    return llm_service.generate_fallback_explanation(**args)
+
+
+def _compact_response(explanation: dict) -> dict:
+    """What a model honouring the compact per-field word limits returns."""
+    return {
+        field: " ".join(str(explanation.get(field, "")).split()[:words])
+        for field, words in llm_service.COMPACT_FIELD_WORDS.items()
+    }
+
+
+def _response_tokens(explanation: dict) -> int:
+    return llm_service.estimate_tokens(json.dumps(
+        {k: v for k, v in explanation.items() if k != "generated_by"}
+    ))
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def run_offline(plan: list, args) -> dict:
+    rows = {"full": [], "compact": []}
+    for risk in plan:
+        kwargs = orchestrator.explanation_kwargs(risk)
+        full_response = _recorded_or_mock(kwargs)
+        for mode, response in (("full", full_response), ("compact", _compact_response(full_response))):
+            prompt = llm_service.clinical_prompt(mode, **kwargs)
+            prompt_tokens = prompt.estimated_tokens()
+            response_tokens = _response_tokens(response)
+            latency = args.overhead_ms + prompt_tokens * args.prefill_ms + response_tokens * args.decode_ms
+            rows[mode].append((prompt_tokens, response_tokens, prompt.max_output_tokens, latency))
+    return rows
+
+
+async def run_live(plan: list) -> dict:
+    rows = {"full": [], "compact": []}
+    for risk in plan:
+        kwargs = orchestrator.explanation_kwargs(risk)
+        for mode in ("full", "compact"):
+            prompt = llm_service.clinical_prompt(mode, **kwargs)
+            started = time.perf_counter()
+            response = await llm_service._generate_explanation(prompt, prompt.cache_key, kwargs)
+            latency = (time.perf_counter() - started) * 1000
+            rows[mode].append((prompt.estimated_tokens(), _response_tokens(response),
+                               prompt.max_output_tokens, latency))
+    await llm_service.close_http_client()
+    return rows
+
+
+def report(rows: dict, label: str) -> None:
+    print(f"\n== {label}: {len(rows['full'])} explanations per mode ==")
+    print(f"{'mode':8} {'prompt tok':>11} {'response tok':>13} {'max out':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for mode, entries in rows.items():
+        prompt_tokens, response_tokens, max_out, latency = zip(*entries)
+        print(
+            f"{mode:8} {statistics.mean(prompt_tokens):11.0f} {statistics.mean(response_tokens):13.0f} "
+            f"{max_out[0]:8d} {_percentile(latency, 0.5):9.0f} {_percentile(latency, 0.95):9.0f}"
+        )
+    print(f"compact preamble (static, sent as system instruction): "
+          f"{llm_service.estimate_tokens(llm_service.COMPACT_PREAMBLE)} tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="Call the configured provider")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N plan entries")
+    parser.add_argument("--overhead-ms", type=float, default=150.0, help="Per-request latency (model)")
+    parser.add_argument("--prefill-ms", type=float, default=0.2, help="Per prompt token (model)")
+    parser.add_argument("--decode-ms", type=float, default=4.0, help="Per response token (model)")
+    args = parser.parse_args()
+
+    plan = warmup.build_warmup_plan()
+    if args.limit:
+        plan = plan[:args.limit]
+
+    if args.live:
+        if not llm_service.has_llm_provider():
+            sys.exit("--live needs GEMINI_API_KEY or GROQ_API_KEY")
+        report(asyncio.run(run_live(plan)), "live provider")
+    else:
+        report(run_offline(plan, args), "recorded/mock responses, modelled latency")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+PharmaGuard Startup Benchmark
+Measures what a cold instance pays before it can serve /analyze:
+  1. import cost of main.py (python -X importtime), with the heaviest modules
+  2. time from process spawn to the first successful GET /
+  3. latency of the first POST /analyze (includes process-pool spawn, if any)
+
+Usage (from backend/):
+    python bench_startup.py                  # default vs FAST_STARTUP=1
+    python bench_startup.py --runs 5 --top 15
+"""
+
+import argparse
+import glob
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_VCF = sorted(glob.glob(os.path.join(HERE, "..", "sample_vcf", "*.vcf")))
+
+
+def import_profile(env: dict, top: int):
+    """Cumulative import time of main (ms) and the `top` heaviest imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=HERE, env=env, capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    total = next((cumulative for cumulative, _, name in rows if name == "main"), None)
+    heaviest = sorted((r for r in rows if r[2] != "main"), reverse=True)[:top]
+    return (total or 0) / 1000, heaviest
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _multipart(vcf_path: str, drugs: str):
+    boundary = uuid.uuid4().hex
+    with open(vcf_path, "rb") as f:
+        content = f.read()
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"drugs\"\r\n\r\n{drugs}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"vcf_file\"; filename=\"sample.vcf\"\r\n"
+        f"Content-Type: text/plain\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def time_to_first_request(env: dict, timeout: float = 30.0):
+    """Seconds until GET / answers, then seconds for the first /analyze."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready = None
+        while time.perf_counter() - started < timeout:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+                ready = time.perf_counter() - started
+                break
+            except OSError:
+                time.sleep(0.005)
+        if ready is None or not SAMPLE_VCF:
+            return ready, None
+
+        body, content_type = _multipart(SAMPLE_VCF[0], "CODEINE,WARFARIN")
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/analyze", data=body, headers={"Content-Type": content_type}
+        )
+        analyze_start = time.perf_counter()
+        urllib.request.urlopen(request, timeout=timeout).read()
+        return ready, time.perf_counter() - analyze_start
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    modes = {"default": {}, "fast-startup": {"FAST_STARTUP": "1"}}
+    for label, overrides in modes.items():
+        # Throwaway data dir and no API keys: measure startup, not provider latency
+        env = {**os.environ, "GENRX_DATA_DIR": os.path.join(HERE, "data", "bench"),
+               "GEMINI_API_KEY": "", "GROQ_API_KEY": "", "WARMUP_ENABLED": "0",
+               "PIPELINE_CACHE_ENABLED": "0", **overrides}
+        import_ms, heaviest = import_profile(env, args.top)
+        ready, first = [], []
+        for _ in range(args.runs):
+            r, f = time_to_first_request(env)
+            if r is not None:
+                ready.append(r * 1000)
+            if f is not None:
+                first.append(f * 1000)
+
+        print(f"\n== {label} ==")
+        print(f"import main:              {import_ms:8.1f} ms")
+        if ready:
+            print(f"spawn → first GET /:      {statistics.median(ready):8.1f} ms (median of {len(ready)})")
+        if first:
+            print(f"first POST /analyze:      {statistics.median(first):8.1f} ms (median of {len(first)})")
+        print("heaviest imports (cumulative ms):")
+        for cumulative, _, name in heaviest:
+            print(f"  {cumulative / 1000:8.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,51 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
-from models.models import (
-    AnalysisResult, RiskAssessment, PharmacogenomicProfile, 
-    ClinicalRecommendation, LLMExplanation, QualityMetrics, 
-    RiskLabel, Severity, Phenotype, DetectedVariant
-)
-from services import vcf_parser, risk_engine, llm_service
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from typing import Awaitable, List, Optional
+from contextlib import ExitStack, asynccontextmanager
 from dotenv import load_dotenv
-import time
+import asyncio
+import json
+import math
 import os
-import uuid
 
-# Load environment variables
+# Load environment variables (before services read their configuration)
 load_dotenv()
 
-app = FastAPI(title="GenRx AI API", version="1.1.0")
+from models.models import (
+    AnalysisResult, JobStatus, PatientAnalysesPage, GenotypeProfile, GeneProfileSummary,
+    ChatRequest, ChatResponse, DependentAnalysis, KnowledgeBaseStatus, ReevaluationStatus
+)
+# services.batch (zip/tar handling) is imported on first use to keep cold start short
+from services import (
+    chat_service, deadline, executor, knowledge_base, llm_service, metrics, orchestrator,
+    reevaluation, serialization, tracing, uploads, warmup
+)
+from services.analysis_store import analysis_store
+from services.jobs import job_manager
+from services.profile_store import profile_store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Optional background warm-up of the explanation cache (WARMUP_ENABLED=1)
+    warmup_task = None
+    if warmup.WARMUP_ENABLED and not executor.FAST_STARTUP:
+        warmup_task = asyncio.create_task(warmup.run_warmup())
+    analysis_store.start()
+    job_manager.start()
+    # Re-evaluate results made stale by a knowledge-base change in this deploy
+    if reevaluation.REEVALUATION_ON_STARTUP and not executor.FAST_STARTUP:
+        reevaluation.start()
+    yield
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await reevaluation.stop()
+    await job_manager.stop()
+    await analysis_store.stop()
+    await llm_service.close_http_client()
+    executor.shutdown()
+
+app = FastAPI(title="GenRx AI API", version="1.1.0", lifespan=lifespan)
 
 # Configure CORS for frontend access
 app.add_middleware(
@@ -34,131 +64,469 @@ async def root():
         "service": "GenRx AI Backend"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage latency histograms and pipeline counters (Prometheus text format)."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/drugs")
 async def get_supported_drugs():
     """Returns a list of drugs supported by the risk engine."""
     from services.risk_engine import DRUG_GENE_RULES
     return list(DRUG_GENE_RULES.keys())
 
+@app.get("/pgx-regions")
+async def get_pgx_regions(
+    build: Optional[str] = Query(None, description="GRCh37 or GRCh38; both when omitted"),
+):
+    """
+    What a client must keep when it pre-extracts PGx lines from a large VCF
+    before upload: every line the parser could match, nothing else.
+    Regions cover both supported genome builds unless `build` narrows them,
+    so a client need not know which build a file is on.
+    Upload the reduced file with a ##genrx_original_variant_count=<n> meta line,
+    counting data lines as the parser does (no gVCF reference blocks).
+    """
+    from services.vcf_parser import (
+        CHROM_ALIASES, COORDINATE_INDEX, GENE_CHROMOSOMES, GENOME_BUILDS, GVCF_SYMBOLIC_ALTS,
+        ORIGINAL_VARIANT_COUNT_META, PHARMACO_VARIANTS_DB,
+    )
+    if build is not None and build not in COORDINATE_INDEX:
+        raise HTTPException(status_code=400, detail=f"Unknown genome build '{build}'. Use one of: {', '.join(GENOME_BUILDS)}")
+    builds = [build] if build else list(GENOME_BUILDS)
+    regions = [
+        {"build": b, "gene": gene, "chrom": chrom, "start": start, "end": end}
+        for b in builds
+        for chrom, start, end, gene in COORDINATE_INDEX[b].regions
+    ]
+    chroms = {r["chrom"] for r in regions}
+    return {
+        "builds": builds,
+        "regions": regions,
+        # Spellings of the region chromosomes (chr22, NC_000022.11, ...) → region "chrom"
+        "chrom_aliases": {alias: chrom for alias, chrom in CHROM_ALIASES.items() if chrom in chroms},
+        "rsids": sorted(PHARMACO_VARIANTS_DB),
+        # INFO-based matches: an RS=/GENE+STAR tag, or a gene symbol in ANN/CSQ
+        "gene_symbols": list(GENE_CHROMOSOMES),
+        "info_tags": ["RS", "GENE", "STAR", "ANN", "CSQ"],
+        "original_count_meta": ORIGINAL_VARIANT_COUNT_META,
+        # ALTs marking gVCF reference blocks, which the count must leave out
+        "gvcf_reference_alts": list(GVCF_SYMBOLIC_ALTS),
+    }
+
+def _debug_requested(request: Request, debug: bool, profile: bool) -> bool:
+    """Debug tracing is off unless asked for by query flag or header."""
+    header = request.headers.get("x-genrx-debug", "").lower()
+    profile_header = request.headers.get("x-genrx-profile", "").lower()
+    profile = profile or profile_header in ("1", "true")
+    if debug or profile or header in ("1", "true"):
+        tracing.start_trace(profile=profile)
+        return True
+    return False
+
+# How often a long request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+async def _unless_disconnected(request: Request, work: Awaitable):
+    """
+    Await `work`, cancelling it (parse tasks, pending LLM calls) as soon as the
+    client disconnects — nobody would read the result.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                metrics.CANCELLED_WORK.inc(kind="request")
+                tracing.event("client_disconnected")
+                await asyncio.wait({task})
+                # nginx's "client closed request"; the client never sees it
+                raise HTTPException(status_code=499, detail="Client closed request")
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+def _start_deadline(request: Request, seconds: Optional[float]) -> None:
+    """Per-request latency budget: ?deadline= or X-GenRx-Deadline (seconds), else the default."""
+    header = request.headers.get("x-genrx-deadline")
+    if seconds is None and header:
+        try:
+            seconds = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-GenRx-Deadline must be a number of seconds")
+    if seconds is not None and not (math.isfinite(seconds) and seconds >= 0):
+        raise HTTPException(status_code=400, detail="Deadline must be a finite, non-negative number of seconds")
+    deadline.start(seconds)
+
+def _render_outcome(outcome: orchestrator.AnalysisOutcome, format: str):
+    """Shape an outcome into the requested response format."""
+    trace = tracing.current()
+    with tracing.stage("serialize"):
+        if format == "compact":
+            compact = serialization.build_compact_response(outcome)
+            if trace is None:
+                # Bypasses response_model: the compact body is already serialized
+                return Response(content=serialization.dumps(compact), media_type="application/json")
+            body = compact.model_dump(mode="json")
+        else:
+            results = orchestrator.build_analysis_results(outcome)
+            if trace is None:
+                # Encoded here rather than by response_model, so the stage
+                # measures the whole cost of producing the response body
+                return Response(content=serialization.dumps(results), media_type="application/json")
+            body = [r.model_dump(mode="json") for r in results]
+    # Debug mode: wrap the normal body together with the request trace
+    return JSONResponse({"data": body, "debug_trace": trace.to_dict()})
+
 @app.post("/analyze", response_model=List[AnalysisResult])
 async def analyze_vcf(
+    request: Request,
     vcf_file: UploadFile = File(...),
     drugs: str = Form(...),
-    patient_id: Optional[str] = Form(None)
+    patient_id: Optional[str] = Form(None),
+    format: str = Query("full", description="'full' (List[AnalysisResult]) or 'compact'"),
+    debug: bool = Query(False, description="Attach a per-stage debug trace"),
+    profile: bool = Query(False, description="Attach a cProfile report (implies debug)"),
+    deadline_seconds: Optional[float] = Query(
+        None, alias="deadline", gt=0, description="Latency budget in seconds (explanations degrade to rule-based when spent)"
+    )
 ):
     """
     Main orchestration endpoint (Person 3 Responsibility)
     Integrates VCF parsing, Risk assessment, and LLM explanations.
     """
+    _debug_requested(request, debug, profile)
     try:
-        # 1. Read and Parse VCF (vcf_parser.py)
-        vcf_content = await vcf_file.read()
-        vcf_text = vcf_content.decode("utf-8")
-        
-        parse_result = vcf_parser.parse_vcf(vcf_text)
-        if not parse_result.success:
-            raise HTTPException(status_code=400, detail="Failed to parse VCF file. Ensure it is a valid VCF v4.2 format.")
-
-        drug_list = [d.strip().upper() for d in drugs.split(",") if d.strip()]
+        _start_deadline(request, deadline_seconds)
+        if format not in serialization.RESPONSE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unknown format '{format}'")
+        drug_list = orchestrator.parse_drug_list(drugs)
         if not drug_list:
             raise HTTPException(status_code=400, detail="No drugs provided")
 
-        analysis_id = str(uuid.uuid4())
-        all_results = []
-        
-        for drug in drug_list:
-            # 2. Map Genetics to Risk (risk_engine.py)
-            risk_result = risk_engine.assess_drug_risk(drug, parse_result.gene_profiles)
-            
-            # 3. Generate LLM explanations (llm_service.py) - ASYNC
-            explanation_data = await llm_service.generate_clinical_explanation(
-                drug=drug,
-                risk_label=risk_result.risk_label,
-                phenotype=risk_result.phenotype,
-                diplotype=risk_result.diplotype,
-                gene=risk_result.primary_gene,
-                variants=risk_result.detected_variants,
-                action=risk_result.action,
-                severity=risk_result.severity,
-                alternatives=risk_result.alternatives
-            )
-
-            # Map raw strings to Enums for Pydantic validation
-            try:
-                risk_enum = RiskLabel(risk_result.risk_label)
-            except ValueError:
-                risk_enum = RiskLabel.UNKNOWN
-
-            try:
-                severity_enum = Severity(risk_result.severity)
-            except ValueError:
-                severity_enum = Severity.NONE
-
-            try:
-                phenotype_enum = Phenotype(risk_result.phenotype)
-            except ValueError:
-                phenotype_enum = Phenotype.UNKNOWN
-            
-            # Convert detected variants to Pydantic models
-            pydantic_variants = [
-                DetectedVariant(**v) for v in risk_result.detected_variants
-            ]
-
-            # 4. Construct Final Mandatory JSON
-            result = AnalysisResult(
-                patient_id=patient_id or parse_result.patient_id,
-                drug=drug,
-                timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                risk_assessment=RiskAssessment(
-                    risk_label=risk_enum,
-                    confidence_score=risk_result.confidence_score,
-                    severity=severity_enum
-                ),
-                pharmacogenomic_profile=PharmacogenomicProfile(
-                    primary_gene=risk_result.primary_gene,
-                    diplotype=risk_result.diplotype,
-                    phenotype=phenotype_enum,
-                    phenotype_description=risk_result.phenotype_description,
-                    detected_variants=pydantic_variants
-                ),
-                clinical_recommendation=ClinicalRecommendation(
-                    action=risk_result.action,
-                    dose_modifier=risk_result.dose_modifier,
-                    cpic_level=risk_result.cpic_level,
-                    alternative_drugs=risk_result.alternatives,
-                    monitoring_parameters=risk_result.monitoring
-                ),
-                llm_generated_explanation=LLMExplanation(
-                    summary=explanation_data.get("summary", ""),
-                    mechanism=explanation_data.get("mechanism", ""),
-                    variant_significance=explanation_data.get("variant_significance", ""),
-                    clinical_implication=explanation_data.get("clinical_implication", ""),
-                    population_context=explanation_data.get("population_context", ""),
-                    risk_rationale=explanation_data.get("risk_rationale", ""),
-                    alternatives_note=explanation_data.get("alternatives_note", ""),
-                    generated_by=explanation_data.get("generated_by", "rule-based")
-                ),
-                quality_metrics=QualityMetrics(
-                    vcf_parsing_success=parse_result.success,
-                    vcf_version=parse_result.vcf_version,
-                    total_variants_parsed=parse_result.total_variants,
-                    pharmacogenomic_variants_found=len(parse_result.pharmaco_variants),
-                    genes_analyzed=list(parse_result.gene_profiles.keys()),
-                    parsing_errors=parse_result.parsing_errors,
-                    analysis_id=analysis_id
-                )
+        with tracing.stage("upload_read"):
+            vcf = await uploads.spool_upload(vcf_file)
+        try:
+            outcome = await _unless_disconnected(
+                request, orchestrator.analyze(vcf, drug_list, patient_id)
             )
-            all_results.append(result)
-            
-        return all_results
+        finally:
+            vcf.remove()
+        analysis_store.enqueue(outcome)
+        return _render_outcome(outcome, format)
 
+    except HTTPException:
+        raise
+    except orchestrator.VCFParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze/batch")
+async def analyze_batch(
+    vcf_files: List[UploadFile] = File(...),
+    drugs: str = Form(...)
+):
+    """
+    Analyze many patient VCFs (or zip/tar archives of VCFs) against one drug
+    panel. Streams one NDJSON line per patient as soon as it completes.
+    """
+    import tarfile
+    import zipfile
+    from services import batch
+
+    drug_list = orchestrator.parse_drug_list(drugs)
+    if not drug_list:
+        raise HTTPException(status_code=400, detail="No drugs provided")
+    stack = ExitStack()
+    try:
+        sources = await batch.expand_uploads(vcf_files, stack)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        stack.close()
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {e}")
+    if not sources:
+        stack.close()
+        raise HTTPException(status_code=400, detail="No VCF files found in upload")
+
+    async def stream():
+        with stack:
+            async for record in batch.run_batch(sources, drug_list):
+                yield json.dumps(record) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# ─────────────────────────────────────────────────────────────────────────────
+# GENOTYPE PROFILES — parse once, assess any number of drugs later
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _profile_response(record: dict) -> GenotypeProfile:
+    pipeline = record["pipeline"]
+    return GenotypeProfile(
+        profile_id=record["profile_id"],
+        patient_id=record["patient_id"],
+        created_at=record["created_at"],
+        vcf_version=pipeline["vcf_version"],
+        genome_build=pipeline.get("genome_build") or None,
+        total_variants_parsed=pipeline["total_variants"],
+        pharmacogenomic_variants_found=pipeline["pharmaco_variant_count"],
+        parsing_errors=pipeline["parsing_errors"],
+        pgx_coverage=orchestrator.coverage_summary(pipeline.get("coverage", {})),
+        gene_profiles=[
+            GeneProfileSummary(
+                gene=gene,
+                diplotype=p["diplotype"],
+                phenotype=p["phenotype"],
+                activity_score=p["activity_score"],
+                star_alleles=p["star_alleles"],
+                variant_count=len(p["variants"]),
+            )
+            for gene, p in pipeline["gene_profiles"].items()
+        ],
+    )
+
+@app.post("/profiles", response_model=GenotypeProfile, status_code=201)
+async def create_profile(
+    request: Request,
+    vcf_file: UploadFile = File(...),
+    patient_id: Optional[str] = Form(None)
+):
+    """Parse a VCF once and keep only its compact per-gene profiles."""
+    with tracing.stage("upload_read"):
+        vcf = await uploads.spool_upload(vcf_file)
+    try:
+        pipeline = await _unless_disconnected(
+            request, executor.run_analysis_pipeline(vcf, [], include_profiles=True)
+        )
+    finally:
+        vcf.remove()
+    if not pipeline.success:
+        raise HTTPException(status_code=400, detail="Failed to parse VCF file. Ensure it is a valid VCF v4.2 format.")
+    return _profile_response(profile_store.save(pipeline, patient_id))
+
+@app.get("/profiles/{profile_id}", response_model=GenotypeProfile)
+async def get_profile(profile_id: str):
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return _profile_response(record)
+
+@app.post("/profiles/{profile_id}/assess", response_model=List[AnalysisResult])
+async def assess_profile(
+    request: Request,
+    profile_id: str,
+    drugs: str = Query(...),
+    format: str = Query("full", description="'full' (List[AnalysisResult]) or 'compact'"),
+    debug: bool = Query(False, description="Attach a per-stage debug trace"),
+    deadline_seconds: Optional[float] = Query(
+        None, alias="deadline", gt=0, description="Latency budget in seconds (explanations degrade to rule-based when spent)"
+    )
+):
+    """Assess drugs against a stored profile — no upload, no re-parse."""
+    _debug_requested(request, debug, False)
+    _start_deadline(request, deadline_seconds)
+    if format not in serialization.RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'")
+    drug_list = orchestrator.parse_drug_list(drugs)
+    if not drug_list:
+        raise HTTPException(status_code=400, detail="No drugs provided")
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    pipeline = profile_store.assess(record, drug_list)
+    outcome = await _unless_disconnected(
+        request, orchestrator.explain_pipeline(pipeline, drug_list, record["patient_id"])
+    )
+    analysis_store.enqueue(outcome)
+    return _render_outcome(outcome, format)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# STORED ANALYSES — reopen or export a report without re-uploading the VCF
+# ─────────────────────────────────────────────────────────────────────────────
+
+@app.get("/analyses/export")
+async def export_analyses(
+    format: str = Query("ndjson", description="'ndjson', 'csv', 'parquet' or 'arrow' (IPC stream)"),
+    patient_id: Optional[str] = Query(None),
+    drug: Optional[str] = Query(None),
+    risk_label: Optional[str] = Query(None, description="e.g. 'Toxic' or 'Adjust Dosage'"),
+    since: Optional[str] = Query(None, description="Inclusive ISO timestamp, e.g. 2025-01-01"),
+    until: Optional[str] = Query(None, description="Exclusive ISO timestamp")
+):
+    """
+    Stream every stored result matching the filters, one row per
+    (analysis, drug). Constant memory for any cohort size; bytes start
+    flowing as soon as the first batch is encoded.
+    """
+    from services import export
+
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'")
+    if format in export.COLUMNAR_FORMATS and not export.columnar_available():
+        raise HTTPException(status_code=501, detail="Columnar export requires pyarrow (pip install pyarrow)")
+    media_type, extension = export.EXPORT_FORMATS[format]
+    stream = export.export_stream(
+        format, patient_id=patient_id, drug=drug.upper() if drug else None,
+        risk_label=risk_label, since=since, until=until,
+    )
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="genrx_analyses.{extension}"'},
+    )
+
+@app.get("/analyses/{analysis_id}", response_model=List[AnalysisResult])
+async def get_analysis(analysis_id: str):
+    """Return a previously computed analysis by its analysis_id."""
+    results = analysis_store.get_analysis(analysis_id)
+    if not results:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return results
+
+@app.get("/patients/{patient_id}/analyses", response_model=PatientAnalysesPage)
+async def list_patient_analyses(
+    patient_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Newest-first, paginated history of a patient's analyses."""
+    total, analyses = analysis_store.list_patient_analyses(patient_id, limit, offset)
+    return PatientAnalysesPage(
+        patient_id=patient_id, total=total, limit=limit, offset=offset, analyses=analyses
+    )
+
+# ─────────────────────────────────────────────────────────────────────────────
+# KNOWLEDGE BASE — versioning, dependency index, re-evaluation of stored results
+# ─────────────────────────────────────────────────────────────────────────────
+
+@app.get("/knowledge-base", response_model=KnowledgeBaseStatus)
+async def get_knowledge_base():
+    """Current knowledge-base version and the state of the last re-evaluation."""
+    from services.risk_engine import DRUG_GENE_RULES
+    from services.vcf_parser import PHARMACO_VARIANTS_DB
+    return KnowledgeBaseStatus(
+        version=knowledge_base.KB_VERSION,
+        rules=len(DRUG_GENE_RULES),
+        variants=len(PHARMACO_VARIANTS_DB),
+        untracked_results=analysis_store.untracked_count(),
+        reevaluation=reevaluation.status(),
+    )
+
+@app.get("/knowledge-base/dependents", response_model=List[DependentAnalysis])
+async def get_dependents(
+    rule: Optional[str] = Query(None, description="Drug whose rule was used, e.g. CODEINE"),
+    variant: Optional[str] = Query(None, description="Variant entry that was used, e.g. rs4244285")
+):
+    """Stored results that depended on a drug rule or a variant entry."""
+    if bool(rule) == bool(variant):
+        raise HTTPException(status_code=400, detail="Provide exactly one of rule or variant")
+    dependency = knowledge_base.rule_key(rule.upper()) if rule else knowledge_base.variant_key(variant)
+    return analysis_store.dependents(dependency)
+
+@app.post("/knowledge-base/reevaluate", response_model=ReevaluationStatus, status_code=202)
+async def reevaluate_stored_results():
+    """Recompute stored results whose rules or variant entries changed (background)."""
+    return reevaluation.start()
+
+# ─────────────────────────────────────────────────────────────────────────────
+# GENOME CHAT — session per analysis_id, condensed context, SSE streaming
+# ─────────────────────────────────────────────────────────────────────────────
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(body: ChatRequest, request: Request):
+    """
+    Answer a question about an analysis. The session (and its condensed
+    context summary) is created on the first turn and reused afterwards.
+    Streams tokens as Server-Sent Events when `stream` is true or the client
+    accepts text/event-stream.
+    """
+    analysis_id = body.analysis_id
+    if not analysis_id and body.context:
+        analysis_id = body.context[0].quality_metrics.analysis_id
+    if not analysis_id:
+        raise HTTPException(status_code=400, detail="analysis_id or context is required")
+
+    session = chat_service.chat_sessions.get(analysis_id)
+    if session is None:
+        results = body.context or analysis_store.get_analysis(analysis_id)
+        if not results:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        session = chat_service.chat_sessions.create(analysis_id, results)
+
+    wants_stream = body.stream or "text/event-stream" in request.headers.get("accept", "")
+    if not wants_stream:
+        async def collect() -> str:
+            return "".join([token async for token in chat_service.stream_reply(session, body.query)])
+        reply = await _unless_disconnected(request, collect())
+        return ChatResponse(
+            response=reply,
+            suggested_follow_ups=chat_service.suggested_follow_ups(session),
+            analysis_id=analysis_id,
+        )
+
+    async def events():
+        async for token in chat_service.stream_reply(session, body.query):
+            yield f"event: token\ndata: {json.dumps({'text': token})}\n\n"
+        done = {
+            "analysis_id": analysis_id,
+            "suggested_follow_ups": chat_service.suggested_follow_ups(session),
+        }
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ASYNCHRONOUS JOBS — for analyses that outlive proxy timeouts
+# ─────────────────────────────────────────────────────────────────────────────
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(
+    vcf_file: UploadFile = File(...),
+    drugs: str = Form(...),
+    patient_id: Optional[str] = Form(None)
+):
+    """Queue an analysis and return its job id immediately."""
+    drug_list = orchestrator.parse_drug_list(drugs)
+    if not drug_list:
+        raise HTTPException(status_code=400, detail="No drugs provided")
+    with tracing.stage("upload_read"):
+        return await job_manager.submit(vcf_file, drug_list, patient_id)
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Status, progress and (once completed) the List[AnalysisResult]."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/jobs/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # WEB_CONCURRENCY > 1 starts that many worker processes; they share the
+    # job queue, analysis store and caches through the SQLite files in GENRX_DATA_DIR
+    workers = executor.WEB_CONCURRENCY
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    if workers > 1:
+        uvicorn.run("main:app", host=host, port=port, workers=workers)
+    else:
+        uvicorn.run(app, host=host, port=port)
\ No newline at end of file
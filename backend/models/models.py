@@ -66,14 +66,32 @@ class LLMExplanation(BaseModel):
     alternatives_note: Optional[str] = None
     generated_by: Optional[str] = None
 
+class PGxSiteCoverage(BaseModel):
+    """gVCF only: how each curated PGx site of a gene was covered."""
+    gene: str
+    sites: int
+    variant: List[str]
+    hom_ref: List[str]
+    no_call: List[str]
+    absent: List[str]
+    # Knowledge-base variants without curated coordinates (never checked)
+    uncurated: List[str] = []
+    # Every knowledge-base site called homozygous reference: a *1/*1 default is confirmed
+    reference_confirmed: bool
+
 class QualityMetrics(BaseModel):
     vcf_parsing_success: bool
     vcf_version: Optional[str] = None
+    # Reference build the VCF positions were read as (GRCh37 / GRCh38)
+    genome_build: Optional[str] = None
     total_variants_parsed: int
     pharmacogenomic_variants_found: int
     genes_analyzed: List[str]
     parsing_errors: List[str]
     analysis_id: str
+    pgx_coverage: Optional[List[PGxSiteCoverage]] = None
+    # Knowledge-base version (rules + variant table) the result was computed with
+    knowledge_base_version: Optional[str] = None
 
 class AnalysisResult(BaseModel):
     patient_id: str
@@ -86,3 +104,119 @@ class AnalysisResult(BaseModel):
     quality_metrics: QualityMetrics
 
 
+
+class StoredAnalysis(BaseModel):
+    analysis_id: str
+    patient_id: str
+    timestamp: str
+    results: List[AnalysisResult]
+
+class PatientAnalysesPage(BaseModel):
+    patient_id: str
+    total: int
+    limit: int
+    offset: int
+    analyses: List[StoredAnalysis]
+
+class GeneProfileSummary(BaseModel):
+    gene: str
+    diplotype: str
+    phenotype: str
+    activity_score: float
+    star_alleles: List[str]
+    variant_count: int
+
+class GenotypeProfile(BaseModel):
+    profile_id: str
+    patient_id: str
+    created_at: str
+    vcf_version: Optional[str] = None
+    genome_build: Optional[str] = None
+    total_variants_parsed: int
+    pharmacogenomic_variants_found: int
+    parsing_errors: List[str]
+    gene_profiles: List[GeneProfileSummary]
+    pgx_coverage: Optional[List[PGxSiteCoverage]] = None
+
+class ChatRequest(BaseModel):
+    query: str
+    analysis_id: Optional[str] = None
+    # Only needed to open a session for an analysis the server has not stored
+    context: Optional[List[AnalysisResult]] = None
+    stream: bool = False
+
+class ChatResponse(BaseModel):
+    response: str
+    suggested_follow_ups: List[str]
+    analysis_id: str
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: JobState
+    progress: float = Field(..., ge=0, le=1)
+    drugs: List[str]
+    patient_id: Optional[str] = None
+    created_at: str
+    updated_at: str
+    error: Optional[str] = None
+    results: Optional[List[AnalysisResult]] = None
+
+class DependentAnalysis(BaseModel):
+    analysis_id: str
+    drug: str
+    fingerprint: str
+    # Computed from an older version of the entry; awaiting re-evaluation
+    stale: bool
+
+class ReevaluationStatus(BaseModel):
+    running: bool
+    knowledge_base_version: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    stale_results: int = 0
+    recomputed: int = 0
+    # Results whose risk, phenotype or recommendation actually changed
+    changed: int = 0
+    explanations_reused: int = 0
+    failed: int = 0
+
+class KnowledgeBaseStatus(BaseModel):
+    version: str
+    rules: int
+    variants: int
+    # Stored before dependency tracking; cannot be re-evaluated
+    untracked_results: int
+    reevaluation: Optional[ReevaluationStatus] = None
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Compact response (format=compact): patient/quality block once, variants
+# table referenced by index, one lean entry per drug
+# ─────────────────────────────────────────────────────────────────────────────
+
+class CompactPharmacogenomicProfile(BaseModel):
+    primary_gene: str
+    diplotype: str
+    phenotype: Phenotype
+    phenotype_description: Optional[str] = None
+    variant_indices: List[int]
+
+class CompactDrugResult(BaseModel):
+    drug: str
+    risk_assessment: RiskAssessment
+    pharmacogenomic_profile: CompactPharmacogenomicProfile
+    clinical_recommendation: ClinicalRecommendation
+    llm_generated_explanation: LLMExplanation
+
+class CompactAnalysisResponse(BaseModel):
+    patient_id: str
+    timestamp: str
+    quality_metrics: QualityMetrics
+    variants: List[DetectedVariant]
+    results: List[CompactDrugResult]
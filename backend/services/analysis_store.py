@@ -0,0 +1,388 @@
+"""
+PharmaGuard Analysis Store
+Embedded SQLite (WAL) store of every completed analysis, indexed by
+analysis_id, patient_id, drug and timestamp. Writes are queued and flushed
+in batches by a background task, so persistence stays off the request path.
+Each analysis also keeps its genotype and, per drug, the knowledge-base
+entries the result depended on, so results can be re-evaluated in place
+when those entries change (see reevaluation.py).
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from models.models import AnalysisResult, StoredAnalysis
+from services import knowledge_base, orchestrator
+from services.db import connect
+from services.profile_store import compact_pipeline
+
+ANALYSIS_STORE_ENABLED = os.getenv("ANALYSIS_STORE_ENABLED", "1") != "0"
+# Flush when this many analyses are queued or after this many seconds
+STORE_BATCH_SIZE = int(os.getenv("STORE_BATCH_SIZE", "50"))
+STORE_FLUSH_SECONDS = float(os.getenv("STORE_FLUSH_SECONDS", "0.25"))
+ANALYSES_DB = "analyses.db"
+
+
+class AnalysisStore:
+    def __init__(self):
+        self._read_conn = None
+        self._write_conn = None
+        # The batch writer and re-evaluation both write from worker threads
+        self._write_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        # Queued but not yet committed — served to readers meanwhile
+        self._pending: Dict[str, orchestrator.AnalysisOutcome] = {}
+
+    # ── storage ──────────────────────────────────────────────────────────────
+
+    def _init_schema(self, conn) -> None:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_results (
+                analysis_id TEXT NOT NULL,
+                patient_id  TEXT NOT NULL,
+                drug        TEXT NOT NULL,
+                timestamp   TEXT NOT NULL,
+                risk_label  TEXT NOT NULL,
+                payload     TEXT NOT NULL,
+                kb_version  TEXT,
+                PRIMARY KEY (analysis_id, drug)
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_patient ON analysis_results (patient_id, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_results_drug ON analysis_results (drug, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_results_timestamp ON analysis_results (timestamp);
+
+            -- Dependency index: which results used which rule / variant entry
+            CREATE TABLE IF NOT EXISTS analysis_dependencies (
+                analysis_id TEXT NOT NULL,
+                drug        TEXT NOT NULL,
+                dependency  TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (analysis_id, drug, dependency)
+            );
+            CREATE INDEX IF NOT EXISTS idx_dependencies ON analysis_dependencies (dependency, fingerprint);
+
+            -- Genotype (compact pipeline) each analysis was computed from
+            CREATE TABLE IF NOT EXISTS analysis_genotypes (
+                analysis_id TEXT PRIMARY KEY,
+                pipeline    TEXT NOT NULL
+            );
+            """
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(analysis_results)")}
+        if "kb_version" not in columns:
+            conn.execute("ALTER TABLE analysis_results ADD COLUMN kb_version TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_kb_version ON analysis_results (kb_version)")
+        conn.commit()
+
+    def _reader(self):
+        if self._read_conn is None:
+            self._read_conn = connect(ANALYSES_DB)
+            self._init_schema(self._read_conn)
+        return self._read_conn
+
+    def _writer_conn(self):
+        if self._write_conn is None:
+            self._write_conn = connect(ANALYSES_DB)
+            self._init_schema(self._write_conn)
+        return self._write_conn
+
+    def _write(self, outcomes: List[orchestrator.AnalysisOutcome]) -> None:
+        """Validate and commit a batch of outcomes. Runs in a worker thread."""
+        rows = []
+        dependencies = []
+        genotypes = []
+        for outcome in outcomes:
+            genotypes.append((outcome.analysis_id, json.dumps(compact_pipeline(outcome.pipeline))))
+            results = orchestrator.build_analysis_results(outcome)
+            for result, (drug, risk_result, _) in zip(results, outcome.drugs):
+                rows.append((
+                    outcome.analysis_id,
+                    result.patient_id,
+                    result.drug,
+                    result.timestamp,
+                    result.risk_assessment.risk_label.value,
+                    result.model_dump_json(),
+                    knowledge_base.KB_VERSION,
+                ))
+                dependencies.extend(
+                    (outcome.analysis_id, result.drug, key, fingerprint)
+                    for key, fingerprint in knowledge_base.dependencies(risk_result).items()
+                )
+        with self._write_lock:
+            conn = self._writer_conn()
+            conn.executemany(
+                "INSERT OR REPLACE INTO analysis_results "
+                "(analysis_id, patient_id, drug, timestamp, risk_label, payload, kb_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO analysis_dependencies (analysis_id, drug, dependency, fingerprint) "
+                "VALUES (?, ?, ?, ?)",
+                dependencies,
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO analysis_genotypes (analysis_id, pipeline) VALUES (?, ?)",
+                genotypes,
+            )
+            conn.commit()
+
+    # ── background writer ────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if not ANALYSIS_STORE_ENABLED:
+            return
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._run_writer())
+
+    async def stop(self) -> None:
+        """Stop the writer and flush whatever is still queued."""
+        if self._writer is None:
+            return
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+        remaining = list(self._pending.values())
+        if remaining:
+            await asyncio.to_thread(self._write, remaining)
+            self._pending.clear()
+
+    async def _run_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + STORE_FLUSH_SECONDS
+            while len(batch) < STORE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                print(f"[STORE] Failed to persist {len(batch)} analyses: {e}")
+            for outcome in batch:
+                self._pending.pop(outcome.analysis_id, None)
+
+    def enqueue(self, outcome: orchestrator.AnalysisOutcome) -> None:
+        """Schedule an analysis for persistence. Never blocks the caller."""
+        if self._queue is None:
+            return
+        self._pending[outcome.analysis_id] = outcome
+        self._queue.put_nowait(outcome)
+
+    # ── retrieval ────────────────────────────────────────────────────────────
+
+    def get_analysis(self, analysis_id: str) -> List[AnalysisResult]:
+        """All per-drug results of one analysis (empty if unknown)."""
+        pending = self._pending.get(analysis_id)
+        if pending is not None:
+            return orchestrator.build_analysis_results(pending)
+        rows = self._reader().execute(
+            "SELECT payload FROM analysis_results WHERE analysis_id = ? ORDER BY rowid",
+            (analysis_id,),
+        ).fetchall()
+        return [AnalysisResult.model_validate_json(row["payload"]) for row in rows]
+
+    def list_patient_analyses(self, patient_id: str, limit: int, offset: int) -> Tuple[int, List[StoredAnalysis]]:
+        """
+        Newest-first page of a patient's analyses, plus the total count.
+        Queued analyses are merged in, so a result just returned by /analyze
+        is listed before the writer flushes it.
+        """
+        pending = {
+            analysis_id: outcome for analysis_id, outcome in list(self._pending.items())
+            if outcome.patient_id == patient_id
+        }
+        # A pending analysis may already be committed: the queued copy wins
+        exclude = f"AND analysis_id NOT IN ({', '.join('?' for _ in pending)}) " if pending else ""
+        conn = self._reader()
+        total = conn.execute(
+            f"SELECT COUNT(DISTINCT analysis_id) FROM analysis_results WHERE patient_id = ? {exclude}",
+            (patient_id, *pending),
+        ).fetchone()[0] + len(pending)
+
+        # Without pending entries the page is cut in SQL; with them, the
+        # committed ids up to the page end are merged with the pending ones
+        committed_limit, committed_offset = (offset + limit, 0) if pending else (limit, offset)
+        page = [
+            (row["ts"], row["analysis_id"])
+            for row in conn.execute(
+                "SELECT analysis_id, MIN(timestamp) AS ts FROM analysis_results "
+                f"WHERE patient_id = ? {exclude}"
+                "GROUP BY analysis_id ORDER BY ts DESC LIMIT ? OFFSET ?",
+                (patient_id, *pending, committed_limit, committed_offset),
+            )
+        ]
+        if pending:
+            page.extend((outcome.timestamp, analysis_id) for analysis_id, outcome in pending.items())
+            page.sort(reverse=True)
+            page = page[offset:offset + limit]
+
+        # Every committed result of the page in one query
+        committed_ids = [analysis_id for _, analysis_id in page if analysis_id not in pending]
+        results: Dict[str, List[AnalysisResult]] = {analysis_id: [] for analysis_id in committed_ids}
+        if committed_ids:
+            for row in conn.execute(
+                "SELECT analysis_id, payload FROM analysis_results "
+                f"WHERE analysis_id IN ({', '.join('?' for _ in committed_ids)}) ORDER BY rowid",
+                committed_ids,
+            ):
+                results[row["analysis_id"]].append(AnalysisResult.model_validate_json(row["payload"]))
+
+        analyses = [
+            StoredAnalysis(
+                analysis_id=analysis_id,
+                patient_id=patient_id,
+                timestamp=timestamp,
+                results=(
+                    orchestrator.build_analysis_results(pending[analysis_id])
+                    if analysis_id in pending else results[analysis_id]
+                ),
+            )
+            for timestamp, analysis_id in page
+        ]
+        return total, analyses
+
+    def iter_result_batches(
+        self,
+        batch_size: int,
+        patient_id: Optional[str] = None,
+        drug: Optional[str] = None,
+        risk_label: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+    ) -> Iterator[list]:
+        """
+        Stored results matching the filters, oldest first, `batch_size` rows at
+        a time. Uses its own connection and cursor so a long export neither
+        holds the shared reader nor loads the whole result set.
+        """
+        clauses, params = [], []
+        for column, op, value in (
+            ("patient_id", "=", patient_id), ("drug", "=", drug), ("risk_label", "=", risk_label),
+            ("timestamp", ">=", since), ("timestamp", "<", until),
+        ):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        conn = connect(ANALYSES_DB)
+        try:
+            self._init_schema(conn)
+            cursor = conn.execute(
+                "SELECT analysis_id, patient_id, drug, timestamp, risk_label, payload, kb_version "
+                f"FROM analysis_results {where}ORDER BY timestamp, analysis_id, drug",
+                params,
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    # ── knowledge-base dependencies ──────────────────────────────────────────
+
+    def dependents(self, dependency: str) -> List[dict]:
+        """Stored results that used a knowledge-base entry ("rule:CODEINE", "variant:rs4244285")."""
+        rows = self._reader().execute(
+            "SELECT analysis_id, drug, fingerprint FROM analysis_dependencies WHERE dependency = ? "
+            "ORDER BY analysis_id, drug",
+            (dependency,),
+        ).fetchall()
+        current = knowledge_base.current_fingerprint(dependency)
+        return [
+            {
+                "analysis_id": row["analysis_id"],
+                "drug": row["drug"],
+                "fingerprint": row["fingerprint"],
+                "stale": row["fingerprint"] != current,
+            }
+            for row in rows
+        ]
+
+    def stale_results(self) -> List[Tuple[str, str]]:
+        """
+        (analysis_id, drug) pairs computed from an entry that has since changed.
+        Only the distinct (entry, fingerprint) pairs are compared with the
+        current knowledge base, not every stored result.
+        """
+        conn = self._reader()
+        changed = [
+            (row["dependency"], row["fingerprint"])
+            for row in conn.execute("SELECT DISTINCT dependency, fingerprint FROM analysis_dependencies")
+            if knowledge_base.current_fingerprint(row["dependency"]) != row["fingerprint"]
+        ]
+        stale: Set[Tuple[str, str]] = set()
+        for dependency, fingerprint in changed:
+            stale.update(
+                (row["analysis_id"], row["drug"])
+                for row in conn.execute(
+                    "SELECT analysis_id, drug FROM analysis_dependencies WHERE dependency = ? AND fingerprint = ?",
+                    (dependency, fingerprint),
+                )
+            )
+        return sorted(stale)
+
+    def untracked_count(self) -> int:
+        """Results stored before dependencies were recorded; they cannot be re-evaluated."""
+        return self._reader().execute(
+            "SELECT COUNT(*) FROM analysis_results WHERE kb_version IS NULL"
+        ).fetchone()[0]
+
+    def get_genotype(self, analysis_id: str) -> Optional[dict]:
+        """The compact pipeline an analysis was computed from (None for legacy rows)."""
+        row = self._reader().execute(
+            "SELECT pipeline FROM analysis_genotypes WHERE analysis_id = ?", (analysis_id,)
+        ).fetchone()
+        return json.loads(row["pipeline"]) if row else None
+
+    def apply_revisions(self, revisions: List[Tuple[str, AnalysisResult, Dict[str, str]]]) -> None:
+        """Replace re-evaluated results and their dependencies. Runs in a worker thread."""
+        with self._write_lock:
+            conn = self._writer_conn()
+            for analysis_id, result, dependencies in revisions:
+                conn.execute(
+                    "UPDATE analysis_results SET risk_label = ?, payload = ?, kb_version = ? "
+                    "WHERE analysis_id = ? AND drug = ?",
+                    (result.risk_assessment.risk_label.value, result.model_dump_json(),
+                     knowledge_base.KB_VERSION, analysis_id, result.drug),
+                )
+                conn.execute(
+                    "DELETE FROM analysis_dependencies WHERE analysis_id = ? AND drug = ?",
+                    (analysis_id, result.drug),
+                )
+                conn.executemany(
+                    "INSERT INTO analysis_dependencies (analysis_id, drug, dependency, fingerprint) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(analysis_id, result.drug, key, fp) for key, fp in dependencies.items()],
+                )
+            conn.commit()
+
+    def retag(self) -> int:
+        """
+        Mark every tracked result as valid under the current KB_VERSION. Only
+        called once no stale result remains: unaffected results keep their
+        payload (and the version they were computed with) but are current.
+        """
+        with self._write_lock:
+            conn = self._writer_conn()
+            cur = conn.execute(
+                "UPDATE analysis_results SET kb_version = ? WHERE kb_version IS NOT NULL AND kb_version != ?",
+                (knowledge_base.KB_VERSION, knowledge_base.KB_VERSION),
+            )
+            conn.commit()
+        return cur.rowcount
+
+
+analysis_store = AnalysisStore()
@@ -0,0 +1,102 @@
+"""
+PharmaGuard Annotation Decoder
+Decodes SnpEff `ANN` and Ensembl VEP `CSQ` INFO fields, but only for lines
+whose INFO passes a single-pass prefilter: one compiled alternation over all
+pharmacogene symbols (the regex engine matches every pattern in one scan of
+the string). Annotated WGS/exome lines are kilobytes long and almost never
+mention a pharmacogene, so they are rejected without being split. Lines that
+pass are decoded entry by entry, the gene symbol field is compared exactly
+(no substring hits such as TPMT inside "TPMT-AS1"), and every entry is
+attributed to its ALT allele so multi-allelic records can be split.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+# SnpEff ANN: Allele | Annotation | Annotation_Impact | Gene_Name | Gene_ID | ...
+ANN_FIELDS = ["Allele", "Annotation", "Annotation_Impact", "Gene_Name", "Gene_ID"]
+# VEP's default CSQ layout; the real one is read from the ##INFO=<ID=CSQ header
+DEFAULT_CSQ_FIELDS = ["Allele", "Consequence", "IMPACT", "SYMBOL", "Gene"]
+
+_CSQ_FORMAT = re.compile(r'Format:\s*([^"]+)"')
+
+
+class AnnotationDecoder:
+    """Per-file decoder: knows the CSQ layout and the gene symbols to look for."""
+
+    def __init__(self, genes: Iterable[str], csq_fields: Optional[List[str]] = None):
+        self.genes = frozenset(genes)
+        # Longest first so CYP2C19 is not shadowed by a shorter symbol
+        alternation = "|".join(re.escape(g) for g in sorted(self.genes, key=len, reverse=True))
+        self._prefilter = re.compile(rf"(?<![A-Za-z0-9])(?:{alternation})(?![A-Za-z0-9])")
+        self.set_csq_fields(csq_fields or DEFAULT_CSQ_FIELDS)
+
+    def set_csq_fields(self, fields: List[str]) -> None:
+        self._csq_allele = fields.index("Allele") if "Allele" in fields else 0
+        self._csq_symbol = fields.index("SYMBOL") if "SYMBOL" in fields else 3
+        self._csq_allele_num = fields.index("ALLELE_NUM") if "ALLELE_NUM" in fields else None
+
+    def read_header(self, line: str) -> None:
+        """Pick up the CSQ field order from its ##INFO header line."""
+        if line.startswith("##INFO=<ID=CSQ"):
+            match = _CSQ_FORMAT.search(line)
+            if match:
+                self.set_csq_fields(match.group(1).strip().split("|"))
+
+    def genes_by_allele(self, info: str, alts: List[str]) -> Dict[int, str]:
+        """
+        Map ALT allele index (1-based) → first pharmacogene annotated on it.
+        Index 0 means the entry could not be tied to a specific allele.
+        """
+        if "ANN=" not in info and "CSQ=" not in info:
+            return {}
+        if self._prefilter.search(info) is None:
+            return {}
+
+        found: Dict[int, str] = {}
+        for field in info.split(";"):
+            if field.startswith("ANN="):
+                entries, allele_idx, symbol_idx, num_idx = field[4:], 0, 3, None
+            elif field.startswith("CSQ="):
+                entries, allele_idx, symbol_idx, num_idx = (
+                    field[4:], self._csq_allele, self._csq_symbol, self._csq_allele_num
+                )
+            else:
+                continue
+            for entry in entries.split(","):
+                values = entry.split("|")
+                if len(values) <= symbol_idx or values[symbol_idx] not in self.genes:
+                    continue
+                index = _allele_index(values, allele_idx, num_idx, alts)
+                found.setdefault(index, values[symbol_idx])
+        return found
+
+
+def _allele_index(values: List[str], allele_idx: int, num_idx: Optional[int], alts: List[str]) -> int:
+    if num_idx is not None and num_idx < len(values) and values[num_idx].isdigit():
+        return int(values[num_idx])
+    allele = values[allele_idx] if allele_idx < len(values) else ""
+    for i, alt in enumerate(alts, start=1):
+        if allele == alt:
+            return i
+    # VEP trims the shared first base of indels; match on the trimmed form too
+    for i, alt in enumerate(alts, start=1):
+        if len(alt) > 1 and allele == alt[1:]:
+            return i
+    return 0
+
+
+def carried_alleles(alts: List[str], alleles: tuple, zygosity: str) -> List[tuple]:
+    """
+    Split a record into (allele index, ALT, zygosity) per ALT allele the sample
+    carries. Biallelic records, and records without a usable genotype, stay
+    a single entry with the full ALT string (index 0 = not split).
+    """
+    if len(alts) < 2 or zygosity in ("unknown", "homozygous_ref"):
+        return [(0, ",".join(alts), zygosity)]
+    split = []
+    for i, alt in enumerate(alts, start=1):
+        copies = alleles.count(i)
+        if copies:
+            split.append((i, alt, "homozygous_alt" if copies == 2 else "heterozygous"))
+    return split or [(0, ",".join(alts), zygosity)]
@@ -0,0 +1,128 @@
+"""
+PharmaGuard Batch Analysis
+Runs many patient VCFs against one drug panel in a single request.
+Parsing fans out over the process pool, explanations are deduplicated
+across the whole batch, and results are yielded per patient as they finish.
+"""
+
+import asyncio
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from contextlib import ExitStack
+from typing import AsyncIterator, Awaitable, Callable, List, Tuple
+
+from services import orchestrator, uploads
+from services.analysis_store import analysis_store
+from services.uploads import SpooledVCF
+
+# Patients processed concurrently (parsing is further bounded by the process pool)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+VCF_SUFFIXES = (".vcf",)
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz")
+
+# (display name, loader spooling the VCF to disk; the caller removes the spool)
+BatchSource = Tuple[str, Callable[[], Awaitable[SpooledVCF]]]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INPUT EXPANSION — plain VCF uploads and zip/tar archives of VCFs
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _archive_sources(filename: str, fileobj) -> List[BatchSource]:
+    """One lazy source per .vcf member; members are only read when processed."""
+    sources = []
+    lower = filename.lower()
+    if lower.endswith(ZIP_SUFFIXES):
+        archive = zipfile.ZipFile(fileobj)
+
+        def read_zip_member(name: str) -> SpooledVCF:
+            with archive.open(name) as member:
+                return uploads.spool(member)
+
+        for name in archive.namelist():
+            if name.lower().endswith(VCF_SUFFIXES):
+                sources.append((name, lambda n=name: asyncio.to_thread(read_zip_member, n)))
+    else:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+        # Tar members share one file position, so reads must not interleave
+        lock = threading.Lock()
+
+        def read_member(member) -> SpooledVCF:
+            with lock:
+                return uploads.spool(archive.extractfile(member))
+
+        for member in archive.getmembers():
+            if member.isfile() and member.name.lower().endswith(VCF_SUFFIXES):
+                sources.append((member.name, lambda m=member: asyncio.to_thread(read_member, m)))
+    return sources
+
+
+async def _spooled(vcf: SpooledVCF) -> SpooledVCF:
+    return vcf
+
+
+async def expand_uploads(upload_files: list, stack: ExitStack) -> List[BatchSource]:
+    """
+    Turn the uploaded files (VCFs and/or archives) into a flat list of sources.
+    Uploads are copied to disk (archives to temp files owned by `stack`),
+    because the framework closes request files before a streaming response
+    is consumed.
+    """
+    sources = []
+    for upload in upload_files:
+        filename = upload.filename or "upload.vcf"
+        if filename.lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES):
+            spooled = stack.enter_context(tempfile.TemporaryFile())
+            await asyncio.to_thread(shutil.copyfileobj, upload.file, spooled)
+            spooled.seek(0)
+            sources.extend(_archive_sources(filename, spooled))
+        else:
+            vcf = await uploads.spool_upload(upload)
+            # Removed after analysis, or here if the batch never reaches it
+            stack.callback(vcf.remove)
+            sources.append((filename, lambda v=vcf: _spooled(v)))
+    return sources
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# EXECUTION
+# ─────────────────────────────────────────────────────────────────────────────
+
+async def run_batch(sources: List[BatchSource], drug_list: list) -> AsyncIterator[dict]:
+    """
+    Analyze every source and yield one record per patient in completion order:
+    {"file", "patient_id", "results"} on success or {"file", "error"} on failure.
+    """
+    semaphore = asyncio.Semaphore(max(BATCH_CONCURRENCY, 1))
+
+    async def analyze_one(name: str, load: Callable[[], Awaitable[SpooledVCF]]) -> dict:
+        async with semaphore:
+            try:
+                vcf = await load()
+                try:
+                    outcome = await orchestrator.analyze(vcf, drug_list)
+                finally:
+                    vcf.remove()
+                analysis_store.enqueue(outcome)
+                results = orchestrator.build_analysis_results(outcome)
+                return {
+                    "file": name,
+                    "patient_id": results[0].patient_id if results else None,
+                    "results": [r.model_dump(mode="json") for r in results],
+                }
+            except Exception as e:
+                return {"file": name, "error": str(e)}
+
+    tasks = [asyncio.create_task(analyze_one(name, load)) for name, load in sources]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
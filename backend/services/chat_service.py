@@ -0,0 +1,185 @@
+"""
+PharmaGuard Genome Chat
+Server-side chat sessions keyed by analysis_id. The multi-drug analysis is
+condensed into a short context summary once per session; every follow-up
+question reuses it (a stable system prefix that providers can cache) instead
+of resending and re-tokenizing the full AnalysisResult list.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, List, Optional
+
+from models.models import AnalysisResult
+from services import llm_service, shared_cache
+
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "500"))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600"))
+# Previous turns (question + answer pairs) replayed to the model
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "4"))
+
+NON_SAFE_LABELS = ("Toxic", "Ineffective", "Adjust Dosage")
+
+
+@dataclass
+class ChatSession:
+    analysis_id: str
+    summary: str
+    drugs: List[str]
+    flagged: List[str]
+    history: list = field(default_factory=list)
+    last_used: float = field(default_factory=time.time)
+    # Bumped on every save, so a worker can tell its local copy is behind
+    version: int = 0
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CONTEXT SUMMARY — built once per session
+# ─────────────────────────────────────────────────────────────────────────────
+
+def build_context_summary(results: List[AnalysisResult]) -> str:
+    """Condense an analysis into one line per drug."""
+    if not results:
+        return "No analysis results are available."
+    lines = [f"Patient {results[0].patient_id} — pharmacogenomic results:"]
+    for r in results:
+        profile = r.pharmacogenomic_profile
+        rsids = ", ".join(v.rsid for v in profile.detected_variants[:3]) or "no variants"
+        lines.append(
+            f"- {r.drug}: {profile.primary_gene} {profile.diplotype} ({profile.phenotype.value}), "
+            f"risk {r.risk_assessment.risk_label.value} / {r.risk_assessment.severity.value}; "
+            f"variants {rsids}; action: {r.clinical_recommendation.action[:160]}"
+        )
+    return "\n".join(lines)
+
+
+def _system_prompt(summary: str) -> str:
+    return (
+        "You are a clinical pharmacogenomics assistant answering questions about one "
+        "patient's report. Answer concisely in plain text (no markdown), cite genes, "
+        "diplotypes and CPIC actions from the report, and say so when the report does "
+        "not contain the answer.\n\nREPORT:\n" + summary
+    )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SESSIONS
+# ─────────────────────────────────────────────────────────────────────────────
+
+class ChatSessions:
+    def __init__(self):
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def _evict(self) -> None:
+        cutoff = time.time() - CHAT_SESSION_TTL_SECONDS
+        for key in [k for k, s in self._sessions.items() if s.last_used < cutoff]:
+            del self._sessions[key]
+        while len(self._sessions) > CHAT_MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+
+    def _load_shared(self, analysis_id: str) -> Optional[ChatSession]:
+        stored = shared_cache.get("chat", analysis_id)
+        return ChatSession(**json.loads(stored)) if stored is not None else None
+
+    def get(self, analysis_id: str) -> Optional[ChatSession]:
+        """
+        The latest copy of a session. Turns may have been served by another
+        API worker, so the shared copy is read every time and replaces a
+        local copy that is behind it.
+        """
+        session = self._sessions.get(analysis_id)
+        shared = self._load_shared(analysis_id)
+        if shared is not None and (session is None or shared.version > session.version):
+            session = shared
+            self._sessions[analysis_id] = session
+            self._evict()
+        if session is None:
+            return None
+        session.last_used = time.time()
+        self._sessions.move_to_end(analysis_id)
+        return session
+
+    def save(self, session: ChatSession) -> None:
+        """Publish the session so any worker can continue the conversation."""
+        session.version += 1
+        shared_cache.put(
+            "chat", session.analysis_id, json.dumps(asdict(session)).encode("utf-8"),
+            ttl=CHAT_SESSION_TTL_SECONDS,
+        )
+
+    def record_turn(self, session: ChatSession, question: str, answer: str) -> None:
+        """
+        Append a turn to the latest shared history (another worker may have
+        answered a turn while this one streamed) and publish it.
+        """
+        shared = self._load_shared(session.analysis_id)
+        if shared is not None and shared.version > session.version:
+            session.history, session.version = shared.history, shared.version
+        session.history.append((question, answer))
+        self.save(session)
+
+    def create(self, analysis_id: str, results: List[AnalysisResult]) -> ChatSession:
+        session = ChatSession(
+            analysis_id=analysis_id,
+            summary=build_context_summary(results),
+            drugs=[r.drug for r in results],
+            flagged=[r.drug for r in results if r.risk_assessment.risk_label.value in NON_SAFE_LABELS],
+        )
+        self._sessions[analysis_id] = session
+        self._evict()
+        self.save(session)
+        return session
+
+
+chat_sessions = ChatSessions()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# REPLIES
+# ─────────────────────────────────────────────────────────────────────────────
+
+def suggested_follow_ups(session: ChatSession) -> List[str]:
+    suggestions = [f"What are safer alternatives to {drug}?" for drug in session.flagged[:2]]
+    if session.flagged:
+        suggestions.append(f"Why is {session.flagged[0]} flagged for this patient?")
+    suggestions.append("Which of my results need monitoring?")
+    return suggestions[:3]
+
+
+def _fallback_reply(session: ChatSession, query: str) -> str:
+    """Rule-based answer when no LLM provider is configured."""
+    query_upper = query.upper()
+    mentioned = [line for line in session.summary.split("\n")[1:]
+                 if line[2:].split(":")[0] in query_upper]
+    relevant = mentioned or session.summary.split("\n")[1:]
+    return "Based on your report:\n" + "\n".join(relevant)
+
+
+async def stream_reply(session: ChatSession, query: str) -> AsyncIterator[str]:
+    """Stream the assistant's reply and record the turn in the session."""
+    messages = []
+    for question, answer in session.history[-CHAT_HISTORY_TURNS:]:
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": answer})
+    messages.append({"role": "user", "content": query})
+
+    parts = []
+    if llm_service.has_llm_provider():
+        try:
+            async for token in llm_service.stream_chat_reply(_system_prompt(session.summary), messages):
+                parts.append(token)
+                yield token
+        except RuntimeError:
+            pass
+
+    if not parts:
+        reply = _fallback_reply(session, query)
+        for word in reply.split(" "):
+            token = word if not parts else " " + word
+            parts.append(token)
+            yield token
+
+    chat_sessions.record_turn(session, query, "".join(parts))
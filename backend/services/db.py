@@ -0,0 +1,37 @@
+"""
+PharmaGuard Local Storage
+Shared SQLite connection helper for the embedded stores (explanation cache,
+job queue, analysis store). All databases live under GENRX_DATA_DIR.
+"""
+
+import os
+import sqlite3
+
+# ─────────────────────────────────────────────────────────────────────────────
+# STORAGE LOCATION
+# ─────────────────────────────────────────────────────────────────────────────
+
+DATA_DIR = os.getenv(
+    "GENRX_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"),
+)
+
+
+def db_path(name: str) -> str:
+    """Absolute path of a named database file inside DATA_DIR."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """
+    Open a SQLite database in WAL mode.
+    WAL lets readers proceed while a single writer commits, which is what
+    the API needs: many concurrent lookups, occasional small writes.
+    """
+    conn = sqlite3.connect(db_path(name), timeout=10, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=10000")
+    return conn
@@ -0,0 +1,77 @@
+"""
+PharmaGuard Request Deadlines
+An end-to-end latency budget for /analyze, carried in a ContextVar so every
+stage (and every task spawned from the request) can ask how much time is
+left. LLM attempts are capped at the remaining budget; once it is nearly
+spent, explanations degrade to the cache or the rule-based fallback.
+Work shared by several requests runs under a SharedBudget: the latest of
+its callers' deadlines.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional, Union
+
+# Default budget for one /analyze request; clients may ask for less or more
+ANALYZE_DEADLINE_SECONDS = float(os.getenv("ANALYZE_DEADLINE_SECONDS", "20"))
+# Upper bound on a client-requested budget
+ANALYZE_DEADLINE_MAX_SECONDS = float(os.getenv("ANALYZE_DEADLINE_MAX_SECONDS", "120"))
+# An LLM attempt is not started with less budget than this
+DEADLINE_RESERVE_SECONDS = float(os.getenv("DEADLINE_RESERVE_SECONDS", "1.0"))
+
+class SharedBudget:
+    """
+    Budget of work coalesced across requests (a single-flight LLM call).
+    Starts at the first caller's deadline and is extended as callers join;
+    `at` None means unbounded (a caller without a deadline, e.g. a job).
+    """
+
+    def __init__(self, at: Optional[float]):
+        self.at = at
+
+    def extend(self, at: Optional[float]) -> None:
+        if self.at is not None:
+            self.at = None if at is None else max(self.at, at)
+
+
+_deadline: ContextVar[Union[float, SharedBudget, None]] = ContextVar("genrx_deadline", default=None)
+
+
+def start(seconds: Optional[float] = None) -> float:
+    """Set the budget for the current request; returns the budget in seconds."""
+    budget = ANALYZE_DEADLINE_SECONDS if seconds is None else seconds
+    budget = min(max(budget, 0.0), ANALYZE_DEADLINE_MAX_SECONDS)
+    _deadline.set(time.monotonic() + budget)
+    return budget
+
+
+def current() -> Optional[float]:
+    """The current context's deadline (time.monotonic() value), or None."""
+    value = _deadline.get()
+    return value.at if isinstance(value, SharedBudget) else value
+
+
+def share(budget: SharedBudget) -> None:
+    """Run the current context (the shared work's own task) under `budget`."""
+    _deadline.set(budget)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None when no deadline applies (jobs, warm-up)."""
+    deadline = current()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def nearly_expired() -> bool:
+    """True when there is not enough budget left to start another LLM attempt."""
+    left = remaining()
+    return left is not None and left < DEADLINE_RESERVE_SECONDS
+
+
+def attempt_timeout(default: float) -> float:
+    """Timeout for one provider attempt: the provider default, capped by the budget."""
+    left = remaining()
+    return default if left is None else min(default, left)
@@ -0,0 +1,255 @@
+"""
+PharmaGuard Analysis Executor
+Runs the CPU-bound pipeline stages (VCF decode + parse, risk assessment)
+in a process pool so the asyncio event loop stays free for health checks
+and in-flight LLM calls while a large VCF is being parsed. Uploads reach
+the pool as a spooled file path (services/uploads.py), never as bytes.
+"""
+
+import asyncio
+import cProfile
+import hashlib
+import io
+import os
+import pickle
+import pstats
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from services import knowledge_base, metrics, shared_cache, tracing, vcf_parser, risk_engine
+from services.db import db_path
+from services.singleflight import SingleFlight
+from services.uploads import SpooledVCF
+
+# Startup-optimized mode for scale-to-zero deployments: no process pool to
+# spawn (small instances rarely have spare cores) and no startup warm-up
+FAST_STARTUP = os.getenv("FAST_STARTUP", "0") == "1"
+# API worker processes on this host (uvicorn --workers); the parsing pool is
+# split between them so N workers do not each start cpu_count processes
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+# Worker processes for parsing; 0 runs the pipeline in a thread of the API process
+ANALYSIS_WORKERS = int(os.getenv(
+    "ANALYSIS_WORKERS",
+    "0" if FAST_STARTUP else str(max((os.cpu_count() or 1) // WEB_CONCURRENCY, 1)),
+))
+# Parsed + assessed pipelines, shared by all workers via the host cache
+PIPELINE_CACHE_ENABLED = os.getenv("PIPELINE_CACHE_ENABLED", "1") != "0"
+PIPELINE_CACHE_TTL_SECONDS = float(os.getenv("PIPELINE_CACHE_TTL_SECONDS", "86400"))
+
+
+@dataclass
+class PipelineResult:
+    """Compact, picklable outcome of the CPU-bound stages for one VCF."""
+    patient_id: str
+    vcf_version: str
+    success: bool
+    total_variants: int
+    pharmaco_variant_count: int
+    genes_analyzed: list
+    parsing_errors: list
+    # Genome build positions were matched on (vcf_parser.detect_build)
+    genome_build: str = ""
+    risk_results: list = field(default_factory=list)
+    # Serialized gene profiles, only filled when a reusable profile is requested
+    gene_profiles: dict = field(default_factory=dict)
+    # gVCF only: gene → PGx site coverage (vcf_parser.summarize_coverage)
+    coverage: dict = field(default_factory=dict)
+    # Stage name → seconds, measured where the stage ran
+    stage_seconds: dict = field(default_factory=dict)
+    # Parser diagnostics (lines scanned / rejected per matching method)
+    parse_stats: dict = field(default_factory=dict)
+    # cProfile report of this pipeline, only when profiling was requested
+    profile_report: Optional[str] = None
+
+
+def assess_profiles(pipeline: PipelineResult, gene_profiles: dict, drugs: list) -> PipelineResult:
+    """Attach risk assessments for `drugs` to a parsed (or stored) pipeline."""
+    start = time.perf_counter()
+    pipeline.risk_results = [
+        risk_engine.assess_drug_risk(drug, gene_profiles, pipeline.coverage) for drug in drugs
+    ]
+    pipeline.stage_seconds["assess_drug_risk"] = time.perf_counter() - start
+    return pipeline
+
+
+def _profiled_pipeline(vcf_path: str, drugs: list, include_profiles: bool,
+                       cancel_path: Optional[str] = None) -> PipelineResult:
+    profiler = cProfile.Profile()
+    pipeline = profiler.runcall(run_pipeline, vcf_path, drugs, include_profiles, cancel_path)
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(25)
+    pipeline.profile_report = report.getvalue()
+    return pipeline
+
+
+def run_pipeline(vcf_path: str, drugs: list, include_profiles: bool = False,
+                 cancel_path: Optional[str] = None) -> PipelineResult:
+    """
+    Decode, parse and assess the VCF at `vcf_path`. Runs inside a worker process.
+    The file is decoded line by line as it is parsed, so the worker never
+    holds the whole upload. The serving process cancels a running parse by
+    creating `cancel_path`.
+    """
+    cancel_check = (lambda: os.path.exists(cancel_path)) if cancel_path else None
+    parse_start = time.perf_counter()
+    parse_stats = {}
+    # newline="\n": split lines exactly as the parser always has (a stray \r is stripped)
+    with open(vcf_path, encoding="utf-8", newline="\n") as vcf_lines:
+        parse_result = vcf_parser.parse_vcf(vcf_lines, parse_stats, cancel_check)
+    parse_end = time.perf_counter()
+
+    pipeline = PipelineResult(
+        patient_id=parse_result.patient_id,
+        vcf_version=parse_result.vcf_version,
+        success=parse_result.success,
+        total_variants=parse_result.total_variants,
+        pharmaco_variant_count=len(parse_result.pharmaco_variants),
+        genes_analyzed=list(parse_result.gene_profiles.keys()),
+        parsing_errors=parse_result.parsing_errors,
+        genome_build=parse_result.genome_build,
+        coverage=parse_result.coverage,
+        stage_seconds={
+            # Includes decoding, which now happens line by line during the parse
+            "parse_vcf": parse_end - parse_start,
+            "build_gene_profiles": parse_stats.pop("build_gene_profiles_seconds", 0.0),
+        },
+        parse_stats=parse_stats,
+    )
+    if parse_result.success:
+        assess_profiles(pipeline, parse_result.gene_profiles, drugs)
+        if include_profiles:
+            pipeline.gene_profiles = vcf_parser.gene_profiles_to_dict(parse_result.gene_profiles)
+    return pipeline
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PROCESS POOL
+# ─────────────────────────────────────────────────────────────────────────────
+
+_pool: Optional[Executor] = None
+
+
+def get_pool() -> Executor:
+    """
+    The parsing pool. With ANALYSIS_WORKERS <= 0 (the FAST_STARTUP default)
+    no processes are spawned, but the parse still runs off the event loop,
+    in a thread of this process.
+    """
+    global _pool
+    if _pool is None:
+        if ANALYSIS_WORKERS <= 0:
+            _pool = ThreadPoolExecutor(thread_name_prefix="pipeline")
+        else:
+            _pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PIPELINE CACHE — identical uploads are parsed once per host
+# ─────────────────────────────────────────────────────────────────────────────
+
+def pipeline_cache_key(vcf_sha256: str, drugs: list, include_profiles: bool) -> str:
+    """Key from the upload's digest, computed while it was spooled (never re-hashed here)."""
+    digest = hashlib.sha256(vcf_sha256.encode("ascii"))
+    # Cached risk results are only valid for the knowledge base they were assessed with
+    digest.update(("|".join(drugs) + f"|{int(include_profiles)}|{knowledge_base.KB_VERSION}").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _cached_pipeline(key: str) -> Optional[PipelineResult]:
+    value = shared_cache.get("pipeline", key)
+    metrics.CACHE_REQUESTS.inc(cache="pipeline", result="hit" if value is not None else "miss")
+    return pickle.loads(value) if value is not None else None
+
+
+def _store_pipeline(key: str, pipeline: PipelineResult) -> None:
+    # Per-request diagnostics are not part of the cached result
+    cached = replace(pipeline, stage_seconds={}, profile_report=None)
+    shared_cache.put("pipeline", key, pickle.dumps(cached), ttl=PIPELINE_CACHE_TTL_SECONDS)
+
+
+async def _run_in_pool(target, vcf: SpooledVCF, drugs: list, include_profiles: bool) -> PipelineResult:
+    """
+    Run `target` in the pool. If the awaiting request is cancelled, a queued
+    task is dropped and a running one is told to stop via its cancel file.
+    """
+    cancel_path = db_path(f"cancel_{uuid.uuid4().hex}.flag")
+    # Coalesced followers may still wait on this run after the request that
+    # spooled the upload has finished and removed it, so the worker reads a
+    # hard link owned by the run
+    run_path = db_path(f"run_{uuid.uuid4().hex}.vcf")
+    os.link(vcf.path, run_path)
+    future = get_pool().submit(target, run_path, drugs, include_profiles, cancel_path)
+    future.add_done_callback(lambda _: _remove_quietly(run_path))
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        if not future.cancel():
+            metrics.CANCELLED_WORK.inc(kind="pool_task")
+            open(cancel_path, "w").close()
+            future.add_done_callback(lambda _: _remove_quietly(cancel_path))
+        raise
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_pipeline_flight = SingleFlight("pipeline")
+
+
+async def run_analysis_pipeline(vcf: SpooledVCF, drugs: list, include_profiles: bool = False) -> PipelineResult:
+    """
+    Dispatch the CPU-bound stages to the process pool and await the result.
+    Concurrent requests for the same bytes and drug panel share one run.
+    The caller keeps ownership of (and removes) the spooled upload.
+    """
+    trace = tracing.current()
+    if trace is not None and trace.profile:
+        # A profile must measure a real run, so it is never shared or cached
+        return await _compute_pipeline(vcf, drugs, include_profiles, None)
+
+    key = pipeline_cache_key(vcf.sha256, drugs, include_profiles)
+    pipeline = await _pipeline_flight.do(
+        key, lambda: _compute_pipeline(vcf, drugs, include_profiles, key)
+    )
+    if trace is not None:
+        trace.parse_stats = pipeline.parse_stats
+    return pipeline
+
+
+async def _compute_pipeline(vcf: SpooledVCF, drugs: list, include_profiles: bool,
+                            key: Optional[str]) -> PipelineResult:
+    use_cache = PIPELINE_CACHE_ENABLED and key is not None
+    pipeline = _cached_pipeline(key) if use_cache else None
+    if pipeline is not None:
+        tracing.event("pipeline_cache_hit", key=key[:16])
+        return pipeline
+
+    trace = tracing.current()
+    target = _profiled_pipeline if key is None else run_pipeline
+    pipeline = await _run_in_pool(target, vcf, drugs, include_profiles)
+    if use_cache and pipeline.success:
+        _store_pipeline(key, pipeline)
+
+    # Worker-process timings are recorded here, in the serving process
+    tracing.record_stages(pipeline.stage_seconds)
+    metrics.VARIANTS_PARSED.inc(pipeline.total_variants)
+    metrics.PGX_HITS.inc(pipeline.pharmaco_variant_count)
+    if trace is not None:
+        trace.parse_stats = pipeline.parse_stats
+        trace.profile_report = pipeline.profile_report
+    return pipeline
@@ -0,0 +1,128 @@
+"""
+PharmaGuard Explanation Cache
+Persists LLM clinical explanations keyed by a hash of the prompt, so any
+repeated (drug, gene, diplotype, phenotype, variants) combination is served
+without a provider call. Recently used entries are also kept in a bounded
+in-process LRU; async callers (lookup/store) do the SQLite I/O in a thread.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from services.db import connect
+
+CACHE_ENABLED = os.getenv("EXPLANATION_CACHE_ENABLED", "1") != "0"
+CACHE_DB = "explanations.db"
+# Explanations kept in memory per process; least recently used are evicted
+CACHE_MEMORY_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MEMORY_ENTRIES", "2048"))
+
+_memory: "OrderedDict[str, dict]" = OrderedDict()
+_lock = threading.Lock()
+_conn = None
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = connect(CACHE_DB)
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS explanations (
+                key          TEXT PRIMARY KEY,
+                payload      TEXT NOT NULL,
+                generated_by TEXT,
+                created_at   REAL NOT NULL
+            )"""
+        )
+        _conn.commit()
+    return _conn
+
+
+def prompt_key(prompt: str) -> str:
+    """Stable cache key for a clinical prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, explanation: dict) -> None:
+    with _lock:
+        _memory[key] = explanation
+        _memory.move_to_end(key)
+        while len(_memory) > max(CACHE_MEMORY_ENTRIES, 0):
+            _memory.popitem(last=False)
+
+
+def _recall(key: str) -> Optional[dict]:
+    with _lock:
+        hit = _memory.get(key)
+        if hit is not None:
+            _memory.move_to_end(key)
+    return hit
+
+
+def _load(key: str) -> Optional[dict]:
+    with _lock:
+        row = _db().execute(
+            "SELECT payload FROM explanations WHERE key = ?", (key,)
+        ).fetchone()
+    return json.loads(row["payload"]) if row is not None else None
+
+
+def _save(key: str, explanation: dict) -> None:
+    with _lock:
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO explanations (key, payload, generated_by, created_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(explanation), explanation.get("generated_by"), time.time()),
+        )
+        conn.commit()
+
+
+def get(key: str) -> Optional[dict]:
+    """Return a cached explanation (as a fresh dict) or None. Blocking: async code uses lookup()."""
+    if not CACHE_ENABLED:
+        return None
+    hit = _recall(key)
+    if hit is None:
+        hit = _load(key)
+        if hit is None:
+            return None
+        _remember(key, hit)
+    return dict(hit)
+
+
+def put(key: str, explanation: dict) -> None:
+    """Store an LLM explanation. Rule-based fallbacks are never cached. Blocking: async code uses store()."""
+    if not CACHE_ENABLED:
+        return
+    _remember(key, dict(explanation))
+    _save(key, explanation)
+
+
+async def lookup(key: str) -> Optional[dict]:
+    """get() for the event loop: memory hits return at once, SQLite is read in a thread."""
+    if not CACHE_ENABLED:
+        return None
+    hit = _recall(key)
+    if hit is None:
+        hit = await asyncio.to_thread(_load, key)
+        if hit is None:
+            return None
+        _remember(key, hit)
+    return dict(hit)
+
+
+async def store(key: str, explanation: dict) -> None:
+    """put() for the event loop: the SQLite write runs in a thread."""
+    if not CACHE_ENABLED:
+        return
+    _remember(key, dict(explanation))
+    await asyncio.to_thread(_save, key, dict(explanation))
+
+
+async def contains(key: str) -> bool:
+    return await lookup(key) is not None
@@ -0,0 +1,185 @@
+"""
+PharmaGuard Cohort Export
+Streams stored analyses for pharmacy-wide reporting as NDJSON, CSV or a
+columnar file (Parquet / Arrow IPC stream, via the optional pyarrow).
+Everything is a pull-based generator pipeline: store batches → rows →
+encoded bytes → a bounded output buffer. Memory stays constant whatever
+the row count, and the first chunk leaves as soon as one batch is encoded.
+"""
+
+import csv
+import io
+import json
+import os
+from typing import Iterator, List
+
+from services.analysis_store import analysis_store
+
+# Rows fetched from the store (and written per columnar row group) at a time
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+# Output buffer: bytes are handed to the server once this much is pending
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+# Flat, one-row-per-(analysis, drug) layout shared by CSV and columnar exports
+COLUMNS = [
+    "analysis_id", "patient_id", "drug", "timestamp", "risk_label", "severity",
+    "confidence_score", "primary_gene", "diplotype", "phenotype", "variant_rsids",
+    "star_alleles", "action", "dose_modifier", "cpic_level", "alternative_drugs",
+    "explanation_source", "knowledge_base_version",
+]
+_FLOAT_COLUMNS = ("confidence_score", "dose_modifier")
+
+
+def columnar_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def flatten(row) -> dict:
+    """One store row (with its JSON payload) → the flat export columns."""
+    result = json.loads(row["payload"])
+    risk = result["risk_assessment"]
+    profile = result["pharmacogenomic_profile"]
+    recommendation = result["clinical_recommendation"]
+    variants = profile.get("detected_variants", [])
+    return {
+        "analysis_id": row["analysis_id"],
+        "patient_id": row["patient_id"],
+        "drug": row["drug"],
+        "timestamp": row["timestamp"],
+        "risk_label": row["risk_label"],
+        "severity": risk.get("severity"),
+        "confidence_score": risk.get("confidence_score"),
+        "primary_gene": profile.get("primary_gene"),
+        "diplotype": profile.get("diplotype"),
+        "phenotype": profile.get("phenotype"),
+        "variant_rsids": ";".join(v["rsid"] for v in variants if v.get("rsid")),
+        "star_alleles": ";".join(v["star_allele"] for v in variants if v.get("star_allele")),
+        "action": recommendation.get("action"),
+        "dose_modifier": recommendation.get("dose_modifier"),
+        "cpic_level": recommendation.get("cpic_level"),
+        "alternative_drugs": ";".join(recommendation.get("alternative_drugs") or []),
+        "explanation_source": result.get("llm_generated_explanation", {}).get("generated_by"),
+        "knowledge_base_version": row["kb_version"],
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ENCODERS — each turns store batches into a stream of byte pieces
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _ndjson(batches: Iterator[list]) -> Iterator[bytes]:
+    # Payloads are stored as single-line JSON: passed through, never re-encoded
+    for rows in batches:
+        for row in rows:
+            yield (row["payload"] + "\n").encode("utf-8")
+
+
+def _csv(batches: Iterator[list]) -> Iterator[bytes]:
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=COLUMNS)
+    writer.writeheader()
+    for rows in batches:
+        for row in rows:
+            writer.writerow(flatten(row))
+            if text.tell() >= EXPORT_CHUNK_BYTES:
+                yield text.getvalue().encode("utf-8")
+                text.seek(0)
+                text.truncate()
+    yield text.getvalue().encode("utf-8")
+
+
+class _Sink:
+    """Write-only file object that pyarrow writes into and the stream drains."""
+
+    def __init__(self):
+        self._pending = bytearray()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._pending += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+
+def _columnar(batches: Iterator[list], fmt: str) -> Iterator[bytes]:
+    """One Parquet row group / Arrow record batch per store batch."""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        (name, pa.float64() if name in _FLOAT_COLUMNS else pa.string()) for name in COLUMNS
+    ])
+    sink = _Sink()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for rows in batches:
+            records = [flatten(row) for row in rows]
+            table = pa.Table.from_pydict(
+                {name: [r[name] for r in records] for name in COLUMNS}, schema=schema
+            )
+            writer.write_table(table)
+            yield sink.drain()
+    # Closing writes the Parquet footer / Arrow end-of-stream marker
+    yield sink.drain()
+
+
+def _buffered(pieces: Iterator[bytes], chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """Coalesce small pieces into chunks of about `chunk_bytes` (the bounded output buffer)."""
+    pending: List[bytes] = []
+    size = 0
+    for piece in pieces:
+        if not piece:
+            continue
+        pending.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def export_stream(fmt: str, **filters) -> Iterator[bytes]:
+    """
+    Byte stream of every stored result matching `filters` (patient_id, drug,
+    risk_label, since, until) in `fmt`. A synchronous generator: the server
+    pulls it from a worker thread, so a slow client simply pauses the export.
+    """
+    batches = analysis_store.iter_result_batches(EXPORT_BATCH_ROWS, **filters)
+    if fmt == "ndjson":
+        pieces = _ndjson(batches)
+    elif fmt == "csv":
+        pieces = _csv(batches)
+    else:
+        pieces = _columnar(batches, fmt)
+    return _buffered(pieces)
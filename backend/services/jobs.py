@@ -0,0 +1,281 @@
+"""
+PharmaGuard Job Queue
+Asynchronous analysis jobs for large VCFs / long drug panels.
+Job state lives in SQLite so queued work survives a restart; a bounded set
+of runner tasks executes jobs through the shared orchestrator.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from models.models import AnalysisResult, JobState, JobStatus
+from services import orchestrator, uploads
+from services.analysis_store import analysis_store
+from services.db import connect, db_path
+
+# Maximum number of analyses executing at once in this process
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+# How often idle runners re-check the queue (jobs may be submitted elsewhere)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# A running job whose owner has not sent a heartbeat for this long is
+# considered orphaned (its worker died) and is requeued
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "30"))
+JOBS_DB = "jobs.db"
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _remove_upload(upload_path: Optional[str]) -> None:
+    if upload_path and os.path.exists(upload_path):
+        os.remove(upload_path)
+
+
+class JobManager:
+    def __init__(self):
+        self._conn = None
+        self._runners: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._owner = str(os.getpid())
+
+    # ── storage ──────────────────────────────────────────────────────────────
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(JOBS_DB)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id          TEXT PRIMARY KEY,
+                    status      TEXT NOT NULL,
+                    progress    REAL NOT NULL DEFAULT 0,
+                    drugs       TEXT NOT NULL,
+                    patient_id  TEXT,
+                    upload_path TEXT,
+                    result      TEXT,
+                    error       TEXT,
+                    created_at  TEXT NOT NULL,
+                    updated_at  TEXT NOT NULL,
+                    owner       TEXT,
+                    heartbeat   REAL,
+                    upload_sha256 TEXT
+                )"""
+            )
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL"), ("upload_sha256", "TEXT")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _update(self, job_id: str, only_if: Optional[str] = None, **fields) -> bool:
+        fields["updated_at"] = _now()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        sql = f"UPDATE jobs SET {assignments} WHERE id = ?"
+        params = list(fields.values()) + [job_id]
+        if only_if:
+            sql += " AND status = ?"
+            params.append(only_if)
+        cur = self._db().execute(sql, params)
+        self._db().commit()
+        return cur.rowcount > 0
+
+    def _to_status(self, row) -> JobStatus:
+        results = None
+        if row["result"]:
+            results = [AnalysisResult(**r) for r in json.loads(row["result"])]
+        return JobStatus(
+            job_id=row["id"],
+            status=JobState(row["status"]),
+            progress=row["progress"],
+            drugs=json.loads(row["drugs"]),
+            patient_id=row["patient_id"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            error=row["error"],
+            results=results,
+        )
+
+    # ── public API ───────────────────────────────────────────────────────────
+
+    async def submit(self, upload, drug_list: list, patient_id: Optional[str]) -> JobStatus:
+        """Stream the upload (an UploadFile) to disk off the event loop and enqueue the job."""
+        job_id = str(uuid.uuid4())
+        vcf = await uploads.spool_upload(upload, db_path(f"job_{job_id}.vcf"))
+
+        now = _now()
+        self._db().execute(
+            "INSERT INTO jobs (id, status, progress, drugs, patient_id, upload_path, upload_sha256, "
+            "created_at, updated_at) VALUES (?, ?, 0, ?, ?, ?, ?, ?, ?)",
+            (job_id, JobState.QUEUED.value, json.dumps(drug_list), patient_id, vcf.path, vcf.sha256, now, now),
+        )
+        self._db().commit()
+        if self._wakeup:
+            self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_status(row) if row else None
+
+    def cancel(self, job_id: str) -> Optional[JobStatus]:
+        """Cancel a queued or running job. Finished jobs are left untouched."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status == JobState.QUEUED and self._update(
+            job_id, only_if=JobState.QUEUED.value, status=JobState.CANCELLED.value
+        ):
+            # No runner will ever open the spooled upload
+            row = self._db().execute("SELECT upload_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            _remove_upload(row["upload_path"])
+        elif job.status in (JobState.QUEUED, JobState.RUNNING):
+            # Running, or claimed by a runner since it was read: its finally removes the upload
+            self._update(job_id, only_if=JobState.RUNNING.value, status=JobState.CANCELLED.value)
+            task = self._running.get(job_id)
+            if task:
+                task.cancel()
+        return self.get(job_id)
+
+    # ── runners ──────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        """Requeue jobs orphaned by a dead worker and launch the runner pool."""
+        self._requeue_stale()
+        self._wakeup = asyncio.Event()
+        self._runners = [
+            asyncio.create_task(self._runner()) for _ in range(max(JOB_CONCURRENCY, 1))
+        ]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        for task in self._runners + list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._runners, *self._running.values(), return_exceptions=True)
+        self._runners = []
+
+    def _requeue_stale(self) -> None:
+        """
+        Other API workers share this queue, so only running jobs whose owner
+        stopped heartbeating are requeued — never a live worker's job.
+        """
+        cur = self._db().execute(
+            "UPDATE jobs SET status = ?, progress = 0, owner = NULL "
+            "WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?)",
+            (JobState.QUEUED.value, JobState.RUNNING.value, time.time() - JOB_STALE_SECONDS),
+        )
+        self._db().commit()
+        if cur.rowcount:
+            print(f"[JOBS] Requeued {cur.rowcount} orphaned job(s)")
+
+    async def _heartbeat_loop(self) -> None:
+        """Keep this worker's jobs alive and honour cancels issued by other workers."""
+        while True:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            job_ids = list(self._running)
+            if job_ids:
+                placeholders = ", ".join("?" for _ in job_ids)
+                self._db().execute(
+                    f"UPDATE jobs SET heartbeat = ? WHERE owner = ? AND id IN ({placeholders})",
+                    [time.time(), self._owner, *job_ids],
+                )
+                self._db().commit()
+                rows = self._db().execute(
+                    f"SELECT id FROM jobs WHERE status = ? AND id IN ({placeholders})",
+                    [JobState.CANCELLED.value, *job_ids],
+                ).fetchall()
+                for row in rows:
+                    task = self._running.get(row["id"])
+                    if task:
+                        task.cancel()
+            self._requeue_stale()
+
+    def _claim_next(self) -> Optional[str]:
+        """Atomically move the oldest queued job to running."""
+        while True:
+            row = self._db().execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (JobState.QUEUED.value,),
+            ).fetchone()
+            if row is None:
+                return None
+            if self._update(
+                row["id"], only_if=JobState.QUEUED.value,
+                status=JobState.RUNNING.value, owner=self._owner, heartbeat=time.time(),
+            ):
+                return row["id"]
+
+    async def _runner(self) -> None:
+        while True:
+            job_id = self._claim_next()
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._execute(job_id))
+            self._running[job_id] = task
+            try:
+                # asyncio.wait so a cancelled job does not cancel its runner
+                await asyncio.wait({task})
+            finally:
+                self._running.pop(job_id, None)
+
+    async def _execute(self, job_id: str) -> None:
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        upload_path = row["upload_path"]
+        keep_upload = False
+        try:
+            if row["upload_sha256"]:
+                vcf = uploads.SpooledVCF(upload_path, row["upload_sha256"], os.path.getsize(upload_path))
+            else:
+                # Queued before digests were recorded
+                vcf = await asyncio.to_thread(uploads.spooled_file, upload_path)
+            outcome = await orchestrator.analyze(
+                vcf,
+                json.loads(row["drugs"]),
+                row["patient_id"],
+                on_progress=lambda fraction: self._update(
+                    job_id, only_if=JobState.RUNNING.value, progress=round(fraction, 3)
+                ),
+            )
+            analysis_store.enqueue(outcome)
+            results = orchestrator.build_analysis_results(outcome)
+            self._update(
+                job_id,
+                only_if=JobState.RUNNING.value,
+                status=JobState.COMPLETED.value,
+                progress=1.0,
+                result=json.dumps([r.model_dump(mode="json") for r in results]),
+            )
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Server shutdown, not a user cancel: resume after restart
+                keep_upload = self._update(
+                    job_id, only_if=JobState.RUNNING.value, status=JobState.QUEUED.value, progress=0
+                )
+            else:
+                self._update(job_id, only_if=JobState.RUNNING.value, status=JobState.CANCELLED.value)
+        except Exception as e:
+            print(f"[JOBS] Job {job_id} failed: {e}")
+            self._update(job_id, only_if=JobState.RUNNING.value, status=JobState.FAILED.value, error=str(e))
+        finally:
+            if not keep_upload:
+                _remove_upload(upload_path)
+
+
+job_manager = JobManager()
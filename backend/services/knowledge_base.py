@@ -0,0 +1,55 @@
+"""
+PharmaGuard Knowledge-Base Versioning
+Fingerprints every drug rule (DRUG_GENE_RULES) and every variant entry
+(PHARMACO_VARIANTS_DB) so a stored result can record exactly which entries
+it was computed from. When an entry changes, only the results that depend
+on it are stale; KB_VERSION changes with any entry and tags each report.
+"""
+
+import hashlib
+import json
+from typing import Dict
+
+from services.risk_engine import DRUG_GENE_RULES
+from services.vcf_parser import PHARMACO_VARIANTS_DB
+
+# Fingerprint recorded for an entry that did not exist (an unsupported drug,
+# a variant matched from INFO tags): adding the entry later makes it stale
+ABSENT = "absent"
+
+
+def _fingerprint(entry) -> str:
+    encoded = json.dumps(entry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def rule_key(drug: str) -> str:
+    return f"rule:{drug}"
+
+
+def variant_key(rsid: str) -> str:
+    return f"variant:{rsid}"
+
+
+# Dependency key → fingerprint of the entry as currently deployed
+FINGERPRINTS: Dict[str, str] = {
+    **{rule_key(drug): _fingerprint(rules) for drug, rules in DRUG_GENE_RULES.items()},
+    **{variant_key(rsid): _fingerprint(data) for rsid, data in PHARMACO_VARIANTS_DB.items()},
+}
+KB_VERSION = _fingerprint(FINGERPRINTS)
+
+
+def current_fingerprint(dependency: str) -> str:
+    return FINGERPRINTS.get(dependency, ABSENT)
+
+
+def dependencies(risk_result) -> Dict[str, str]:
+    """
+    Knowledge-base entries one drug result was computed from: its drug rule
+    and the variant entries behind the detected variants of its primary gene.
+    """
+    deps = {rule_key(risk_result.drug): current_fingerprint(rule_key(risk_result.drug))}
+    for variant in risk_result.detected_variants:
+        key = variant_key(variant["rsid"])
+        deps[key] = current_fingerprint(key)
+    return deps
@@ -4,14 +4,21 @@ Supports: Google Gemini API (free) and Groq API (free)
 Falls back gracefully if API keys are not set.
 """
 
+import asyncio
 import os
 import json
-import httpx
-from typing import Optional, Dict, List
-from dotenv import load_dotenv
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Dict, List
+from services import deadline, explanation_cache, metrics, tracing
+from services.singleflight import SingleFlight
 
-# Load environment variables from .env file
-load_dotenv()
+if TYPE_CHECKING:
+    import httpx
+
+# Environment comes from main.py's load_dotenv(). httpx is imported on the
+# first provider call, so rule-based deployments never pay for it at startup.
 
 # ─────────────────────────────────────────────────────────────────────────────
 # LLM CLIENT FACTORY
@@ -22,9 +29,48 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GROQ_API_KEY   = os.getenv("GROQ_API_KEY", "")
 
 
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash"
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+LLM_TIMEOUT_SECONDS = 30
+
+# "full": the original long-form prompt; "compact": token-budgeted prompt
+# with a static, reusable preamble and per-field output limits (see below)
+LLM_PROMPT_MODE = os.getenv("LLM_PROMPT_MODE", "full")
+# Compact mode: estimated tokens allowed for the variant list of one prompt
+PROMPT_VARIANT_TOKEN_BUDGET = int(os.getenv("PROMPT_VARIANT_TOKEN_BUDGET", "80"))
+FULL_MAX_OUTPUT_TOKENS = 1024
+GROQ_SYSTEM_PROMPT = "You are a clinical pharmacogenomics expert. Always respond with valid JSON only. No markdown, no explanation outside JSON."
+
+_http_client: Optional["httpx.AsyncClient"] = None
+
+
+def has_llm_provider() -> bool:
+    """True when at least one LLM provider key is configured."""
+    return bool(GEMINI_API_KEY or GROQ_API_KEY)
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """Shared, connection-pooled client for every provider call (keeps TLS warm)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+        _http_client = httpx.AsyncClient(
+            timeout=LLM_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
 async def call_gemini(prompt: str) -> str:
     """Call Google Gemini 1.5 Flash (free tier: 1500 req/day)."""
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
+    url = f"{GEMINI_BASE_URL}:generateContent?key={GEMINI_API_KEY}"
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {
@@ -37,16 +83,20 @@ async def call_gemini(prompt: str) -> str:
             {"category": "HARM_CATEGORY_MEDICAL", "threshold": "BLOCK_NONE"},
         ],
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(url, json=payload)
-        resp.raise_for_status()
-        data = resp.json()
-        return data["candidates"][0]["content"]["parts"][0]["text"]
+    resp = await get_http_client().post(url, json=payload)
+    resp.raise_for_status()
+    data = resp.json()
+    return data["candidates"][0]["content"]["parts"][0]["text"]
 
 
-async def call_groq(prompt: str) -> str:
-    """Call Groq (Llama3 70B — free tier: 14400 req/day)."""
-    url = "https://api.groq.com/openai/v1/chat/completions"
+async def call_groq(prompt: str, timeout: float = LLM_TIMEOUT_SECONDS,
+                    system: str = GROQ_SYSTEM_PROMPT, max_tokens: int = FULL_MAX_OUTPUT_TOKENS,
+                    usage: Optional[dict] = None) -> str:
+    """
+    Call Groq (Llama3 70B — free tier: 14400 req/day).
+    `usage`, when given, receives the provider's token counts.
+    """
+    url = GROQ_URL
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json",
@@ -54,21 +104,102 @@ async def call_groq(prompt: str) -> str:
     payload = {
         "model": "llama3-70b-8192",
         "messages": [
-            {
-                "role": "system",
-                "content": "You are a clinical pharmacogenomics expert. Always respond with valid JSON only. No markdown, no explanation outside JSON."
-            },
+            {"role": "system", "content": system},
             {"role": "user", "content": prompt}
         ],
         "temperature": 0.3,
-        "max_tokens": 1024,
+        "max_tokens": max_tokens,
         "response_format": {"type": "json_object"},
     }
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(url, json=payload, headers=headers)
+    resp = await get_http_client().post(url, json=payload, headers=headers, timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+    if usage is not None and "usage" in data:
+        usage.update(prompt=data["usage"].get("prompt_tokens"), response=data["usage"].get("completion_tokens"))
+    return data["choices"][0]["message"]["content"]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CHAT STREAMING — token-by-token replies for /chat
+# messages: [{"role": "user" | "assistant", "content": str}, ...]
+# ─────────────────────────────────────────────────────────────────────────────
+
+async def stream_gemini_chat(system: str, messages: list) -> AsyncIterator[str]:
+    """Stream a Gemini reply over its SSE endpoint."""
+    url = f"{GEMINI_BASE_URL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+    payload = {
+        "systemInstruction": {"parts": [{"text": system}]},
+        "contents": [
+            {"role": "user" if m["role"] == "user" else "model", "parts": [{"text": m["content"]}]}
+            for m in messages
+        ],
+        "generationConfig": {"temperature": 0.3, "maxOutputTokens": 512},
+    }
+    async with get_http_client().stream("POST", url, json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = json.loads(line[5:])
+            candidates = data.get("candidates") or [{}]
+            for part in candidates[0].get("content", {}).get("parts", []):
+                if part.get("text"):
+                    yield part["text"]
+
+
+async def stream_groq_chat(system: str, messages: list) -> AsyncIterator[str]:
+    """Stream a Groq reply (OpenAI-compatible SSE)."""
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "model": "llama3-70b-8192",
+        "messages": [{"role": "system", "content": system}] + messages,
+        "temperature": 0.3,
+        "max_tokens": 512,
+        "stream": True,
+    }
+    async with get_http_client().stream("POST", GROQ_URL, json=payload, headers=headers) as resp:
         resp.raise_for_status()
-        data = resp.json()
-        return data["choices"][0]["message"]["content"]
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            chunk = line[5:].strip()
+            if chunk == "[DONE]":
+                break
+            delta = json.loads(chunk)["choices"][0]["delta"].get("content")
+            if delta:
+                yield delta
+
+
+async def stream_chat_reply(system: str, messages: list) -> AsyncIterator[str]:
+    """
+    Stream a chat reply. Priority: Gemini → Groq.
+    A provider that fails before its first token falls through to the next;
+    raises RuntimeError when no provider produced a reply.
+    """
+    providers = []
+    if GEMINI_API_KEY:
+        providers.append(("gemini", stream_gemini_chat))
+    if GROQ_API_KEY:
+        providers.append(("groq", stream_groq_chat))
+
+    for name, stream in providers:
+        started = time.perf_counter()
+        produced = False
+        try:
+            async for token in stream(system, messages):
+                produced = True
+                yield token
+            _record_attempt(name, "success", started, "chat")
+            return
+        except Exception as e:
+            _record_attempt(name, "error", started, "chat")
+            print(f"[LLM] {name} chat stream failed: {e}")
+            if produced:
+                return
+    raise RuntimeError("No LLM provider available for chat")
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -124,6 +255,135 @@ RULES:
 - Return ONLY valid JSON, no surrounding text"""
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# COMPACT CLINICAL PROMPT (LLM_PROMPT_MODE=compact)
+# Everything that is the same for every drug lives in one static preamble,
+# sent as the system instruction: providers that cache prompt prefixes reuse
+# it, and it is built once per process. The per-drug part is a few terse
+# lines, with the variant list deduplicated and cut to a token budget.
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Output limit per field in words; the summary and clinician note get the most
+COMPACT_FIELD_WORDS = {
+    "summary": 45,
+    "mechanism": 40,
+    "variant_significance": 30,
+    "clinical_implication": 45,
+    "population_context": 20,
+    "risk_rationale": 30,
+    "alternatives_note": 20,
+}
+
+COMPACT_PREAMBLE = (
+    "You are a board-certified clinical pharmacogenomicist. For the patient data given, "
+    "reply with one JSON object, no markdown, with exactly these string keys "
+    "(maximum words in brackets): "
+    + ", ".join(f"{field} [{words}]" for field, words in COMPACT_FIELD_WORDS.items())
+    + ". summary: plain English for the patient. mechanism: what the gene does and how the "
+    "variants change drug handling. variant_significance: cite the rsIDs and star alleles. "
+    "clinical_implication: dosing and monitoring for the prescriber. population_context: "
+    "phenotype frequency. risk_rationale: why the risk label fits the evidence. "
+    "alternatives_note: the listed alternatives, if relevant. Align with CPIC guidelines."
+)
+
+# ~1.4 tokens per word plus quotes, key and separator per field, with 25% headroom
+COMPACT_MAX_OUTPUT_TOKENS = int(
+    (sum(COMPACT_FIELD_WORDS.values()) * 1.4 + 10 * len(COMPACT_FIELD_WORDS)) * 1.25
+)
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate BPE token count without a tokenizer: about four characters
+    per token for prose, but never fewer than the words and punctuation
+    marks (identifiers such as rs3892097 or *1/*4 split into several).
+    """
+    return max((len(text) + 3) // 4, len(_TOKEN_PIECES.findall(text)))
+
+
+def compact_variant_lines(variants: list, budget: int = PROMPT_VARIANT_TOKEN_BUDGET) -> List[str]:
+    """One terse line per distinct (rsid, star allele), cut to `budget` estimated tokens."""
+    distinct = {}
+    for v in variants:
+        distinct.setdefault((v.get("rsid", ""), v.get("star_allele", "")), v)
+
+    lines = []
+    used = 0
+    for v in distinct.values():
+        line = (
+            f"{v.get('rsid', '')} {v.get('star_allele', '')} "
+            f"{v.get('effect', '').replace('_', ' ')} {v.get('zygosity', '').replace('_', ' ')}"
+        ).strip()
+        cost = estimate_tokens(line)
+        if lines and used + cost > budget:
+            lines.append(f"+{len(distinct) - len(lines)} more")
+            break
+        lines.append(line)
+        used += cost
+    return lines
+
+
+def build_compact_prompt(
+    drug: str,
+    risk_label: str,
+    phenotype: str,
+    diplotype: str,
+    gene: str,
+    variants: list,
+    action: str,
+    severity: str,
+    alternatives: list,
+) -> str:
+    """The per-drug part of a compact prompt; pairs with COMPACT_PREAMBLE."""
+    variant_lines = compact_variant_lines(variants) or ["none detected (*1/*1 assumed)"]
+    return (
+        f"drug={drug} gene={gene} diplotype={diplotype} phenotype={phenotype} "
+        f"risk={risk_label} severity={severity}\n"
+        f"action: {action}\n"
+        f"variants: {'; '.join(variant_lines)}\n"
+        f"alternatives: {', '.join(alternatives[:2]) if alternatives else 'none'}"
+    )
+
+
+@dataclass
+class ClinicalPrompt:
+    """What is sent to a provider for one explanation."""
+    mode: str
+    user: str
+    # Static instruction sent separately (system role); None in full mode
+    system: Optional[str]
+    max_output_tokens: int
+
+    @property
+    def cache_key(self) -> str:
+        # Full-mode keys are unchanged, so existing cache entries stay valid
+        text = self.user if self.system is None else f"{self.system}\n\n{self.user}"
+        return explanation_cache.prompt_key(text)
+
+    def estimated_tokens(self) -> int:
+        return estimate_tokens(self.user) + (estimate_tokens(self.system) if self.system else 0)
+
+
+def clinical_prompt(mode: Optional[str] = None, **explanation_args) -> ClinicalPrompt:
+    """The prompt for one explanation in `mode` (default LLM_PROMPT_MODE)."""
+    mode = mode or LLM_PROMPT_MODE
+    if mode == "compact":
+        return ClinicalPrompt(
+            mode="compact",
+            user=build_compact_prompt(**explanation_args),
+            system=COMPACT_PREAMBLE,
+            max_output_tokens=COMPACT_MAX_OUTPUT_TOKENS,
+        )
+    return ClinicalPrompt(
+        mode="full",
+        user=build_clinical_prompt(**explanation_args),
+        system=None,
+        max_output_tokens=FULL_MAX_OUTPUT_TOKENS,
+    )
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # RULE-BASED FALLBACK (no API key required)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -239,68 +499,191 @@ def generate_fallback_explanation(
 # MAIN ENTRY POINT
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _record_attempt(provider: str, outcome: str, started: float, drug: str) -> None:
+    """Provider attempt → latency histogram + debug trace event."""
+    duration = time.perf_counter() - started
+    metrics.LLM_REQUEST_SECONDS.observe(duration, provider=provider, outcome=outcome)
+    tracing.event("llm_attempt", provider=provider, outcome=outcome, drug=drug,
+                  duration_ms=round(duration * 1000, 3))
+
+
 async def generate_clinical_explanation(
     drug: str, risk_label: str, phenotype: str, diplotype: str,
     gene: str, variants: list, action: str, severity: str, alternatives: list,
 ) -> dict:
     """
     Generate LLM clinical explanation.
-    Priority: Gemini → Groq → Rule-based fallback.
+    Priority: Explanation cache → Gemini → Groq → Rule-based fallback.
+    Within a request deadline (services/deadline.py) provider attempts only
+    get the remaining budget; once it is spent the rule-based explanation is
+    returned immediately, marked "rule-based-fallback (deadline)".
     Never fails — always returns a valid explanation dict.
     """
-    prompt = build_clinical_prompt(
+    explanation_args = dict(
         drug=drug, risk_label=risk_label, phenotype=phenotype,
         diplotype=diplotype, gene=gene, variants=variants,
         action=action, severity=severity, alternatives=alternatives,
     )
+    prompt = clinical_prompt(**explanation_args)
+
+    cache_key = prompt.cache_key
+    cached = await explanation_cache.lookup(cache_key)
+    metrics.CACHE_REQUESTS.inc(cache="explanation", result="hit" if cached is not None else "miss")
+    tracing.event("explanation_cache", drug=drug, hit=cached is not None)
+    if cached is not None:
+        return cached
+    if not has_llm_provider():
+        return generate_fallback_explanation(**explanation_args)
+    if deadline.nearly_expired():
+        return _deadline_fallback(explanation_args)
+
+    # Identical prompts already being generated are awaited, not re-requested
+    flight = _coalesced_explanation(prompt, cache_key, explanation_args, deadline.current())
+    try:
+        explanation = await asyncio.wait_for(flight, timeout=deadline.remaining())
+    except asyncio.TimeoutError:
+        # This caller's budget ran out; the flight continues for the others
+        return _deadline_fallback(explanation_args)
+    return dict(explanation)
+
+
+_explanation_flight = SingleFlight("explanation")
+# Budget of each in-flight explanation, extended by the callers that join it
+_flight_budgets: Dict[str, deadline.SharedBudget] = {}
+
+
+async def _coalesced_explanation(prompt: ClinicalPrompt, cache_key: str, explanation_args: dict,
+                                 caller_deadline: Optional[float]) -> dict:
+    # No await between the lookup and do(): a caller either extends the
+    # running flight's budget or starts a new flight with its own
+    budget = _flight_budgets.get(cache_key)
+    if budget is not None:
+        budget.extend(caller_deadline)
+
+    def start():
+        flight_budget = deadline.SharedBudget(caller_deadline)
+        _flight_budgets[cache_key] = flight_budget
+        return _shared_explanation(prompt, cache_key, explanation_args, flight_budget)
+
+    return await _explanation_flight.do(cache_key, start)
+
+
+async def _shared_explanation(prompt: ClinicalPrompt, cache_key: str, explanation_args: dict,
+                              budget: deadline.SharedBudget) -> dict:
+    # Provider attempts get the longest remaining budget among the callers,
+    # not just the leader's: a follower with more time (or none, like jobs
+    # and warm-up) must not receive the leader's deadline fallback
+    deadline.share(budget)
+    try:
+        return await _generate_explanation(prompt, cache_key, explanation_args)
+    finally:
+        if _flight_budgets.get(cache_key) is budget:
+            del _flight_budgets[cache_key]
+
+
+def _deadline_fallback(explanation_args: dict) -> dict:
+    """Rule-based explanation served because the request budget ran out."""
+    metrics.DEADLINE_FALLBACKS.inc()
+    tracing.event("deadline_fallback", drug=explanation_args["drug"])
+    result = generate_fallback_explanation(**explanation_args)
+    result["generated_by"] = "rule-based-fallback (deadline)"
+    return result
+
+
+def _record_tokens(provider: str, prompt: ClinicalPrompt, usage: dict, raw: str) -> None:
+    """Provider-reported token usage, or the estimate when the provider gives none."""
+    metrics.LLM_TOKENS.inc(usage.get("prompt") or prompt.estimated_tokens(),
+                           provider=provider, mode=prompt.mode, kind="prompt")
+    metrics.LLM_TOKENS.inc(usage.get("response") or estimate_tokens(raw),
+                           provider=provider, mode=prompt.mode, kind="response")
+
+
+async def _generate_explanation(prompt: ClinicalPrompt, cache_key: str, explanation_args: dict) -> dict:
+    """Provider chain for a cache miss: Gemini → Groq → rule-based."""
+    drug = explanation_args["drug"]
+    # Provider that was tried last and failed (for fallback metrics)
+    failed_provider = None
 
     # Try Gemini first
     if GEMINI_API_KEY:
+        if deadline.nearly_expired():
+            return _deadline_fallback(explanation_args)
+        started = time.perf_counter()
         try:
             # We use httpx directly for better async control and error handling
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
+            url = f"{GEMINI_BASE_URL}:generateContent?key={GEMINI_API_KEY}"
             payload = {
-                "contents": [{"parts": [{"text": prompt}]}],
+                "contents": [{"parts": [{"text": prompt.user}]}],
                 "generationConfig": {
                     "temperature": 0.3,
-                    "maxOutputTokens": 1024,
+                    "maxOutputTokens": prompt.max_output_tokens,
                     "responseMimeType": "application/json",
                 }
             }
-            async with httpx.AsyncClient(timeout=30) as client:
-                resp = await client.post(url, json=payload)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    raw = data["candidates"][0]["content"]["parts"][0]["text"]
-                    # Clean JSON if wrapped in markdown
-                    raw = raw.strip()
-                    if raw.startswith("```"):
-                        raw = raw.split("```")[1]
-                        if raw.startswith("json"):
-                            raw = raw[4:]
-                    parsed = json.loads(raw)
-                    parsed["generated_by"] = "gemini-1.5-flash"
-                    return parsed
+            if prompt.system:
+                payload["systemInstruction"] = {"parts": [{"text": prompt.system}]}
+            resp = await get_http_client().post(
+                url, json=payload, timeout=deadline.attempt_timeout(LLM_TIMEOUT_SECONDS)
+            )
+            if resp.status_code == 200:
+                data = resp.json()
+                raw = data["candidates"][0]["content"]["parts"][0]["text"]
+                usage = data.get("usageMetadata", {})
+                _record_tokens("gemini", prompt, {
+                    "prompt": usage.get("promptTokenCount"), "response": usage.get("candidatesTokenCount"),
+                }, raw)
+                # Clean JSON if wrapped in markdown
+                raw = raw.strip()
+                if raw.startswith("```"):
+                    raw = raw.split("```")[1]
+                    if raw.startswith("json"):
+                        raw = raw[4:]
+                parsed = json.loads(raw)
+                parsed["generated_by"] = "gemini-1.5-flash"
+                _record_attempt("gemini", "success", started, drug)
+                await explanation_cache.store(cache_key, parsed)
+                return parsed
+        except asyncio.CancelledError:
+            _record_attempt("gemini", "cancelled", started, drug)
+            raise
         except Exception as e:
             print(f"[LLM] Gemini failed: {e}. Trying Groq...")
+        _record_attempt("gemini", "error", started, drug)
+        failed_provider = "gemini"
 
     # Try Groq as fallback
     if GROQ_API_KEY:
+        if deadline.nearly_expired():
+            return _deadline_fallback(explanation_args)
+        if failed_provider:
+            metrics.PROVIDER_FALLBACKS.inc(from_provider=failed_provider, to_provider="groq")
+        started = time.perf_counter()
         try:
-            raw = await call_groq(prompt)
+            usage = {}
+            raw = await call_groq(
+                prompt.user,
+                timeout=deadline.attempt_timeout(LLM_TIMEOUT_SECONDS),
+                system=prompt.system or GROQ_SYSTEM_PROMPT,
+                max_tokens=prompt.max_output_tokens,
+                usage=usage,
+            )
+            _record_tokens("groq", prompt, usage, raw)
             parsed = json.loads(raw)
             parsed["generated_by"] = "groq-llama3-70b"
+            _record_attempt("groq", "success", started, drug)
+            await explanation_cache.store(cache_key, parsed)
             return parsed
+        except asyncio.CancelledError:
+            _record_attempt("groq", "cancelled", started, drug)
+            raise
         except Exception as e:
             print(f"[LLM] Groq failed: {e}. Using rule-based fallback.")
+        _record_attempt("groq", "error", started, drug)
+        failed_provider = "groq"
 
     # Rule-based fallback (always works)
-    result = generate_fallback_explanation(
-        drug=drug, risk_label=risk_label, phenotype=phenotype,
-        diplotype=diplotype, gene=gene, variants=variants,
-        action=action, severity=severity, alternatives=alternatives,
-    )
-    return result
-
-
-
+    if deadline.nearly_expired():
+        return _deadline_fallback(explanation_args)
+    if failed_provider:
+        metrics.PROVIDER_FALLBACKS.inc(from_provider=failed_provider, to_provider="rule-based")
+    return generate_fallback_explanation(**explanation_args)
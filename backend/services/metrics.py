@@ -0,0 +1,170 @@
+"""
+PharmaGuard Metrics
+Dependency-free counters and latency histograms rendered in the Prometheus
+text exposition format on /metrics. Recording is a dict lookup plus a
+bisect, so instrumentation stays negligible on the hot path.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Seconds; spans sub-millisecond parsing of small files to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY: List["_Metric"] = []
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key → [per-bucket counts (last = +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {repr(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_prometheus() -> str:
+    """All registered metrics in Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# APPLICATION METRICS
+# ─────────────────────────────────────────────────────────────────────────────
+
+STAGE_SECONDS = Histogram(
+    "genrx_stage_duration_seconds",
+    "Latency of each analysis pipeline stage.",
+    ("stage",),
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "genrx_llm_request_duration_seconds",
+    "Latency of each LLM provider call.",
+    ("provider", "outcome"),
+)
+VARIANTS_PARSED = Counter(
+    "genrx_variants_parsed_total",
+    "VCF data lines parsed.",
+)
+PGX_HITS = Counter(
+    "genrx_pgx_variants_total",
+    "Pharmacogenomic variants matched against the knowledge base.",
+)
+PROVIDER_FALLBACKS = Counter(
+    "genrx_provider_fallbacks_total",
+    "Explanation requests that fell through from one provider to the next.",
+    ("from_provider", "to_provider"),
+)
+CACHE_REQUESTS = Counter(
+    "genrx_cache_requests_total",
+    "Cache lookups by cache and result.",
+    ("cache", "result"),
+)
+SINGLEFLIGHT_REQUESTS = Counter(
+    "genrx_singleflight_requests_total",
+    "Coalesced work by group; followers awaited a leader's in-flight computation.",
+    ("group", "role"),
+)
+CANCELLED_WORK = Counter(
+    "genrx_cancelled_work_total",
+    "Work abandoned because every client waiting for it went away.",
+    ("kind",),
+)
+DEADLINE_FALLBACKS = Counter(
+    "genrx_deadline_fallbacks_total",
+    "Explanations served rule-based because the request deadline was nearly spent.",
+)
+LLM_TOKENS = Counter(
+    "genrx_llm_tokens_total",
+    "Tokens of successful explanation calls (provider usage, or estimated), by prompt mode.",
+    ("provider", "mode", "kind"),
+)
+
+
+def observe_stages(stage_seconds: Dict[str, float]) -> None:
+    """Record stage timings measured elsewhere (e.g. inside a worker process)."""
+    for stage, seconds in stage_seconds.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
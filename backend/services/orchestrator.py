@@ -0,0 +1,234 @@
+"""
+PharmaGuard Analysis Orchestrator
+Integrates VCF parsing, risk assessment and LLM explanations into the final
+AnalysisResult list. Shared by the synchronous /analyze endpoint and the
+background job runner.
+"""
+
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from models.models import (
+    AnalysisResult, RiskAssessment, PharmacogenomicProfile,
+    ClinicalRecommendation, LLMExplanation, QualityMetrics,
+    RiskLabel, Severity, Phenotype, DetectedVariant, PGxSiteCoverage
+)
+from services import executor, knowledge_base, llm_service, tracing, vcf_parser
+from services.uploads import SpooledVCF
+
+
+class VCFParseError(ValueError):
+    """Raised when the uploaded file is not a usable VCF v4.2."""
+
+
+def parse_drug_list(drugs: str) -> list:
+    """Normalize a comma-separated drug string to upper-case names."""
+    return [d.strip().upper() for d in drugs.split(",") if d.strip()]
+
+
+def explanation_kwargs(risk_result) -> dict:
+    """Arguments for llm_service.generate_clinical_explanation from a RiskResult."""
+    return dict(
+        drug=risk_result.drug,
+        risk_label=risk_result.risk_label,
+        phenotype=risk_result.phenotype,
+        diplotype=risk_result.diplotype,
+        gene=risk_result.primary_gene,
+        variants=risk_result.detected_variants,
+        action=risk_result.action,
+        severity=risk_result.severity,
+        alternatives=risk_result.alternatives,
+    )
+
+
+async def explain(risk_result) -> dict:
+    """
+    Generate the explanation for one RiskResult. Identical prompts in flight
+    anywhere in the process (same batch or concurrent requests) are
+    requested from the provider once.
+    """
+    return await llm_service.generate_clinical_explanation(**explanation_kwargs(risk_result))
+
+
+@dataclass
+class AnalysisOutcome:
+    """Raw per-request outcome, before it is shaped into a response schema."""
+    analysis_id: str
+    patient_id: str
+    timestamp: str
+    pipeline: executor.PipelineResult
+    # (drug, RiskResult, explanation dict) in request order
+    drugs: list = field(default_factory=list)
+
+
+def as_enum(enum_cls, value, default):
+    """Map a raw string to an Enum member, falling back to `default`."""
+    try:
+        return enum_cls(value)
+    except ValueError:
+        return default
+
+
+def coverage_summary(coverage: dict) -> Optional[List[PGxSiteCoverage]]:
+    """gVCF PGx site coverage for the response; None for plain VCFs."""
+    if not coverage:
+        return None
+    return [
+        PGxSiteCoverage(
+            gene=gene,
+            uncurated=vcf_parser.PGX_UNCURATED_SITES.get(gene, []),
+            # Uncurated sites were never checked, so they cannot confirm *1/*1
+            reference_confirmed=(
+                len(entry["hom_ref"]) == entry["sites"] and not vcf_parser.PGX_UNCURATED_SITES.get(gene)
+            ),
+            **entry,
+        )
+        for gene, entry in coverage.items()
+    ]
+
+
+def build_analysis_result(
+    drug: str,
+    risk_result,
+    explanation_data: dict,
+    pipeline: executor.PipelineResult,
+    patient_id: str,
+    analysis_id: str,
+    timestamp: Optional[str] = None,
+) -> AnalysisResult:
+    """Construct the final mandatory JSON for one drug."""
+    # Map raw strings to Enums for Pydantic validation
+    risk_enum = as_enum(RiskLabel, risk_result.risk_label, RiskLabel.UNKNOWN)
+    severity_enum = as_enum(Severity, risk_result.severity, Severity.NONE)
+    phenotype_enum = as_enum(Phenotype, risk_result.phenotype, Phenotype.UNKNOWN)
+
+    # Convert detected variants to Pydantic models
+    pydantic_variants = [
+        DetectedVariant(**v) for v in risk_result.detected_variants
+    ]
+
+    return AnalysisResult(
+        patient_id=patient_id,
+        drug=drug,
+        timestamp=timestamp or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        risk_assessment=RiskAssessment(
+            risk_label=risk_enum,
+            confidence_score=risk_result.confidence_score,
+            severity=severity_enum
+        ),
+        pharmacogenomic_profile=PharmacogenomicProfile(
+            primary_gene=risk_result.primary_gene,
+            diplotype=risk_result.diplotype,
+            phenotype=phenotype_enum,
+            phenotype_description=risk_result.phenotype_description,
+            detected_variants=pydantic_variants
+        ),
+        clinical_recommendation=ClinicalRecommendation(
+            action=risk_result.action,
+            dose_modifier=risk_result.dose_modifier,
+            cpic_level=risk_result.cpic_level,
+            alternative_drugs=risk_result.alternatives,
+            monitoring_parameters=risk_result.monitoring
+        ),
+        llm_generated_explanation=LLMExplanation(
+            summary=explanation_data.get("summary", ""),
+            mechanism=explanation_data.get("mechanism", ""),
+            variant_significance=explanation_data.get("variant_significance", ""),
+            clinical_implication=explanation_data.get("clinical_implication", ""),
+            population_context=explanation_data.get("population_context", ""),
+            risk_rationale=explanation_data.get("risk_rationale", ""),
+            alternatives_note=explanation_data.get("alternatives_note", ""),
+            generated_by=explanation_data.get("generated_by", "rule-based")
+        ),
+        quality_metrics=QualityMetrics(
+            vcf_parsing_success=pipeline.success,
+            vcf_version=pipeline.vcf_version,
+            genome_build=pipeline.genome_build or None,
+            total_variants_parsed=pipeline.total_variants,
+            pharmacogenomic_variants_found=pipeline.pharmaco_variant_count,
+            genes_analyzed=pipeline.genes_analyzed,
+            parsing_errors=pipeline.parsing_errors,
+            analysis_id=analysis_id,
+            pgx_coverage=coverage_summary(pipeline.coverage),
+            knowledge_base_version=knowledge_base.KB_VERSION,
+        )
+    )
+
+
+async def analyze(
+    vcf: SpooledVCF,
+    drug_list: list,
+    patient_id: Optional[str] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> AnalysisOutcome:
+    """
+    Full pipeline for one VCF:
+    1. Parse + assess risk off the event loop (executor.py)
+    2. Generate LLM explanations per drug (llm_service.py)
+    `on_progress` receives the completed fraction (0.0 → 1.0).
+    Concurrent duplicates share the parse and the provider calls, but each
+    request still gets its own analysis_id.
+    """
+    # Gene profiles are kept so stored results can be re-evaluated later
+    pipeline = await executor.run_analysis_pipeline(vcf, drug_list, include_profiles=True)
+    if not pipeline.success:
+        raise VCFParseError("Failed to parse VCF file. Ensure it is a valid VCF v4.2 format.")
+
+    # Parsing is the first step; explanations share the remaining progress
+    if on_progress:
+        on_progress(0.1)
+
+    return await explain_pipeline(pipeline, drug_list, patient_id, on_progress)
+
+
+async def explain_pipeline(
+    pipeline: executor.PipelineResult,
+    drug_list: list,
+    patient_id: Optional[str] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> AnalysisOutcome:
+    """Generate explanations for an already assessed pipeline (fresh or from a stored profile)."""
+    outcome = AnalysisOutcome(
+        analysis_id=str(uuid.uuid4()),
+        patient_id=patient_id or pipeline.patient_id,
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        pipeline=pipeline,
+    )
+
+    for i, (drug, risk_result) in enumerate(zip(drug_list, pipeline.risk_results), start=1):
+        with tracing.stage("explain", drug=drug):
+            explanation_data = await explain(risk_result)
+        outcome.drugs.append((drug, risk_result, explanation_data))
+        if on_progress:
+            on_progress(0.1 + 0.9 * i / len(drug_list))
+
+    return outcome
+
+
+def build_analysis_results(outcome: AnalysisOutcome) -> List[AnalysisResult]:
+    """Shape an outcome into the default List[AnalysisResult] schema."""
+    return [
+        build_analysis_result(
+            drug=drug,
+            risk_result=risk_result,
+            explanation_data=explanation_data,
+            pipeline=outcome.pipeline,
+            patient_id=outcome.patient_id,
+            analysis_id=outcome.analysis_id,
+            timestamp=outcome.timestamp,
+        )
+        for drug, risk_result, explanation_data in outcome.drugs
+    ]
+
+
+async def run_analysis(
+    vcf: SpooledVCF,
+    drug_list: list,
+    patient_id: Optional[str] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> List[AnalysisResult]:
+    """Run the pipeline and return the default List[AnalysisResult]."""
+    outcome = await analyze(vcf, drug_list, patient_id, on_progress)
+    return build_analysis_results(outcome)
@@ -0,0 +1,83 @@
+"""
+PharmaGuard Genotype Profile Store
+Keeps the compact per-gene profiles of a parsed VCF (a few KB) so follow-up
+drug queries go straight to the risk engine without re-uploading the genome.
+"""
+
+import json
+import time
+import uuid
+from dataclasses import asdict, replace
+from typing import Optional
+
+from services import executor, tracing, vcf_parser
+from services.db import connect
+
+PROFILES_DB = "profiles.db"
+
+
+def compact_pipeline(pipeline: executor.PipelineResult) -> dict:
+    """The stored form of a parsed pipeline: genotype only, no per-request results."""
+    return asdict(replace(pipeline, risk_results=[], stage_seconds={}, parse_stats={}, profile_report=None))
+
+
+class ProfileStore:
+    def __init__(self):
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(PROFILES_DB)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS profiles (
+                    profile_id TEXT PRIMARY KEY,
+                    patient_id TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    pipeline   TEXT NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_profiles_patient ON profiles (patient_id, created_at)")
+            self._conn.commit()
+        return self._conn
+
+    def save(self, pipeline: executor.PipelineResult, patient_id: Optional[str] = None) -> dict:
+        """Persist a parsed pipeline (without risk results) and return its record."""
+        record = {
+            "profile_id": str(uuid.uuid4()),
+            "patient_id": patient_id or pipeline.patient_id,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "pipeline": compact_pipeline(pipeline),
+        }
+        self._db().execute(
+            "INSERT INTO profiles (profile_id, patient_id, created_at, pipeline) VALUES (?, ?, ?, ?)",
+            (record["profile_id"], record["patient_id"], record["created_at"], json.dumps(record["pipeline"])),
+        )
+        self._db().commit()
+        return record
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        row = self._db().execute("SELECT * FROM profiles WHERE profile_id = ?", (profile_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "profile_id": row["profile_id"],
+            "patient_id": row["patient_id"],
+            "created_at": row["created_at"],
+            "pipeline": json.loads(row["pipeline"]),
+        }
+
+    def assess(self, record: dict, drug_list: list) -> executor.PipelineResult:
+        """
+        Rebuild the stored pipeline and run the risk engine for `drug_list`.
+        Profiles are rebuilt from the stored variant calls with the current
+        knowledge base, not taken as computed at parse time.
+        """
+        pipeline = executor.PipelineResult(**record["pipeline"])
+        gene_profiles = vcf_parser.reannotate_gene_profiles(pipeline.gene_profiles)
+        pipeline.gene_profiles = vcf_parser.gene_profiles_to_dict(gene_profiles)
+        executor.assess_profiles(pipeline, gene_profiles, drug_list)
+        tracing.record_stages(pipeline.stage_seconds)
+        return pipeline
+
+
+profile_store = ProfileStore()
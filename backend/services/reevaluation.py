@@ -0,0 +1,160 @@
+"""
+PharmaGuard Re-evaluation
+Brings stored analyses up to date after a knowledge-base change (a new CPIC
+rule, a corrected activity value). The analysis store's dependency index
+yields only the (analysis, drug) results computed from an entry that has
+since changed; each is recomputed from the variant calls stored with its
+analysis, re-annotated with the current entries (profile_store.assess), so
+no VCF is re-uploaded or re-parsed. A result whose
+explanation inputs did not change keeps its explanation; the others go
+through the normal (cached, coalesced) explanation path.
+"""
+
+import asyncio
+import os
+import time
+from itertools import groupby
+from typing import Optional
+
+from models.models import AnalysisResult, ReevaluationStatus
+from services import knowledge_base, orchestrator, shared_cache
+from services.analysis_store import analysis_store
+from services.profile_store import profile_store
+
+# Look for stale results when the API starts (a deploy is when the KB changes)
+REEVALUATION_ON_STARTUP = os.getenv("REEVALUATION_ON_STARTUP", "1") != "0"
+# Re-evaluated results written per store transaction
+REEVALUATION_BATCH_SIZE = int(os.getenv("REEVALUATION_BATCH_SIZE", "50"))
+# Host-wide lease so only one API worker re-evaluates
+REEVALUATION_LEASE_SECONDS = 120
+
+_status: Optional[ReevaluationStatus] = None
+_task: Optional[asyncio.Task] = None
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _explanation_inputs(result: AnalysisResult) -> dict:
+    """The fields an explanation is generated from (see orchestrator.explanation_kwargs)."""
+    data = result.model_dump(mode="json")
+    profile = data["pharmacogenomic_profile"]
+    recommendation = data["clinical_recommendation"]
+    return dict(
+        drug=data["drug"],
+        risk_label=data["risk_assessment"]["risk_label"],
+        severity=data["risk_assessment"]["severity"],
+        phenotype=profile["phenotype"],
+        diplotype=profile["diplotype"],
+        gene=profile["primary_gene"],
+        variants=profile["detected_variants"],
+        action=recommendation["action"],
+        alternatives=recommendation["alternative_drugs"],
+    )
+
+
+def _assessment(result: AnalysisResult) -> tuple:
+    return (
+        result.risk_assessment.model_dump(),
+        result.pharmacogenomic_profile.model_dump(),
+        result.clinical_recommendation.model_dump(),
+    )
+
+
+async def _reevaluate_analysis(analysis_id: str, drugs: list, status: ReevaluationStatus) -> list:
+    """Recompute the stale drugs of one analysis; returns store revisions."""
+    genotype = await asyncio.to_thread(analysis_store.get_genotype, analysis_id)
+    previous = {r.drug: r for r in await asyncio.to_thread(analysis_store.get_analysis, analysis_id)}
+    if genotype is None or not previous:
+        raise LookupError(f"No stored genotype for analysis {analysis_id}")
+
+    pipeline = profile_store.assess({"pipeline": genotype}, drugs)
+    revisions = []
+    for drug, risk_result in zip(drugs, pipeline.risk_results):
+        old = previous[drug]
+        fields = dict(
+            drug=drug,
+            risk_result=risk_result,
+            pipeline=pipeline,
+            patient_id=old.patient_id,
+            analysis_id=analysis_id,
+            timestamp=old.timestamp,
+        )
+        result = orchestrator.build_analysis_result(
+            explanation_data=old.llm_generated_explanation.model_dump(), **fields
+        )
+        if _explanation_inputs(result) == _explanation_inputs(old):
+            status.explanations_reused += 1
+        else:
+            explanation = await orchestrator.explain(risk_result)
+            result = orchestrator.build_analysis_result(explanation_data=explanation, **fields)
+        if _assessment(result) != _assessment(old):
+            status.changed += 1
+        revisions.append((analysis_id, result, knowledge_base.dependencies(risk_result)))
+    return revisions
+
+
+def _new_status() -> ReevaluationStatus:
+    return ReevaluationStatus(running=True, knowledge_base_version=knowledge_base.KB_VERSION, started_at=_now())
+
+
+async def run_reevaluation(status: Optional[ReevaluationStatus] = None) -> ReevaluationStatus:
+    """One pass over every stale result; unaffected results are re-tagged as current."""
+    global _status
+    status = _status = status or _new_status()
+    try:
+        if not shared_cache.acquire_lease("reevaluation", REEVALUATION_LEASE_SECONDS):
+            print("[REEVAL] Another worker is re-evaluating; skipping.")
+            return status
+
+        stale = await asyncio.to_thread(analysis_store.stale_results)
+        status.stale_results = len(stale)
+        pending = []
+        for analysis_id, pairs in groupby(stale, key=lambda pair: pair[0]):
+            shared_cache.acquire_lease("reevaluation", REEVALUATION_LEASE_SECONDS)
+            try:
+                revisions = await _reevaluate_analysis(analysis_id, [drug for _, drug in pairs], status)
+            except Exception as e:
+                print(f"[REEVAL] Analysis {analysis_id} failed: {e}")
+                status.failed += 1
+                continue
+            pending.extend(revisions)
+            status.recomputed += len(revisions)
+            if len(pending) >= REEVALUATION_BATCH_SIZE:
+                await asyncio.to_thread(analysis_store.apply_revisions, pending)
+                pending = []
+        if pending:
+            await asyncio.to_thread(analysis_store.apply_revisions, pending)
+
+        if not status.failed:
+            await asyncio.to_thread(analysis_store.retag)
+        print(
+            f"[REEVAL] KB {status.knowledge_base_version}: {status.recomputed}/{status.stale_results} "
+            f"stale results recomputed, {status.changed} changed, "
+            f"{status.explanations_reused} explanations reused, {status.failed} failed."
+        )
+        return status
+    finally:
+        status.running = False
+        status.finished_at = _now()
+
+
+def start() -> ReevaluationStatus:
+    """Start a background pass unless one is already running."""
+    global _task, _status
+    if _task is None or _task.done():
+        _status = _new_status()
+        _task = asyncio.create_task(run_reevaluation(_status))
+    return _status
+
+
+def status() -> Optional[ReevaluationStatus]:
+    """The running or most recent pass (None before the first one)."""
+    return _status
+
+
+async def stop() -> None:
+    if _task is not None and not _task.done():
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
@@ -6,6 +6,8 @@ CPIC-aligned pharmacogenomic risk prediction per drug + gene profile
 from dataclasses import dataclass
 from typing import Optional
 
+from services import vcf_parser
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CPIC Drug-Gene Clinical Rules
 # Format: (gene, phenotype) → risk_label, severity, dose_modifier, action, cpic_level
@@ -97,6 +99,8 @@ def calculate_confidence(
     variant_count: int,
     has_primary_gene: bool,
     cpic_level: str,
+    coverage_fraction: Optional[float] = None,
+    coverage_complete: bool = False,
 ) -> float:
     base = 0.5
     
@@ -110,6 +114,14 @@ def calculate_confidence(
         base += 0.05
     elif cpic_level == "B":
         base += 0.02
+    # gVCF evidence: every knowledge-base site called confirms the genotype
+    # (incl. a *1/*1 default); sites absent from the file may hide an unseen
+    # variant. Sites without curated coordinates are unknown either way.
+    if coverage_fraction is not None:
+        if coverage_fraction < 1.0:
+            base -= 0.2 * (1.0 - coverage_fraction)
+        elif coverage_complete:
+            base += 0.1
 
     return round(min(base, 0.97), 2)
 
@@ -132,10 +144,11 @@ class RiskResult:
     detected_variants: list
 
 
-def assess_drug_risk(drug: str, gene_profiles: dict) -> RiskResult:
+def assess_drug_risk(drug: str, gene_profiles: dict, coverage: Optional[dict] = None) -> RiskResult:
     """
     Given a drug name and a dict of GeneProfile objects,
     return a complete RiskResult with CPIC-aligned recommendations.
+    `coverage` (gVCF inputs) refines the confidence score.
     """
     drug_upper = drug.strip().upper()
     
@@ -192,6 +205,8 @@ def assess_drug_risk(drug: str, gene_profiles: dict) -> RiskResult:
         variant_count=len(detected_variants),
         has_primary_gene=profile is not None,
         cpic_level=cpic_level,
+        coverage_fraction=vcf_parser.coverage_fraction(coverage, primary_gene) if coverage else None,
+        coverage_complete=bool(coverage) and vcf_parser.coverage_complete(coverage, primary_gene),
     )
 
     # Serialize detected variants
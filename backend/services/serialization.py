@@ -0,0 +1,91 @@
+"""
+PharmaGuard Response Serialization
+Compact, deduplicated response format for /analyze?format=compact.
+Models are assembled with model_construct (inputs come from our own
+pipeline, so re-validation is skipped) and encoded in a single pass by
+pydantic-core's native JSON serializer.
+"""
+
+from pydantic_core import to_json
+
+from models.models import (
+    CompactAnalysisResponse, CompactDrugResult, CompactPharmacogenomicProfile,
+    RiskAssessment, ClinicalRecommendation, LLMExplanation, QualityMetrics,
+    RiskLabel, Severity, Phenotype, DetectedVariant
+)
+from services import knowledge_base
+from services.orchestrator import AnalysisOutcome, as_enum, coverage_summary
+
+RESPONSE_FORMATS = ("full", "compact")
+
+_VARIANT_FIELDS = tuple(DetectedVariant.model_fields)
+_EXPLANATION_FIELDS = tuple(f for f in LLMExplanation.model_fields if f != "generated_by")
+
+
+def build_compact_response(outcome: AnalysisOutcome) -> CompactAnalysisResponse:
+    """Shape an outcome into the compact schema without re-validating it."""
+    pipeline = outcome.pipeline
+    variants = []
+    variant_index = {}
+    results = []
+
+    for drug, risk_result, explanation_data in outcome.drugs:
+        indices = []
+        for v in risk_result.detected_variants:
+            key = tuple(v.get(f) for f in _VARIANT_FIELDS)
+            idx = variant_index.get(key)
+            if idx is None:
+                idx = variant_index[key] = len(variants)
+                variants.append(DetectedVariant.model_construct(**{f: v.get(f) for f in _VARIANT_FIELDS}))
+            indices.append(idx)
+
+        explanation = {f: explanation_data.get(f, "") for f in _EXPLANATION_FIELDS}
+        explanation["generated_by"] = explanation_data.get("generated_by", "rule-based")
+
+        results.append(CompactDrugResult.model_construct(
+            drug=drug,
+            risk_assessment=RiskAssessment.model_construct(
+                risk_label=as_enum(RiskLabel, risk_result.risk_label, RiskLabel.UNKNOWN),
+                confidence_score=risk_result.confidence_score,
+                severity=as_enum(Severity, risk_result.severity, Severity.NONE),
+            ),
+            pharmacogenomic_profile=CompactPharmacogenomicProfile.model_construct(
+                primary_gene=risk_result.primary_gene,
+                diplotype=risk_result.diplotype,
+                phenotype=as_enum(Phenotype, risk_result.phenotype, Phenotype.UNKNOWN),
+                phenotype_description=risk_result.phenotype_description,
+                variant_indices=indices,
+            ),
+            clinical_recommendation=ClinicalRecommendation.model_construct(
+                action=risk_result.action,
+                dose_modifier=risk_result.dose_modifier,
+                cpic_level=risk_result.cpic_level,
+                alternative_drugs=risk_result.alternatives,
+                monitoring_parameters=risk_result.monitoring,
+            ),
+            llm_generated_explanation=LLMExplanation.model_construct(**explanation),
+        ))
+
+    return CompactAnalysisResponse.model_construct(
+        patient_id=outcome.patient_id,
+        timestamp=outcome.timestamp,
+        quality_metrics=QualityMetrics.model_construct(
+            vcf_parsing_success=pipeline.success,
+            vcf_version=pipeline.vcf_version,
+            genome_build=pipeline.genome_build or None,
+            total_variants_parsed=pipeline.total_variants,
+            pharmacogenomic_variants_found=pipeline.pharmaco_variant_count,
+            genes_analyzed=pipeline.genes_analyzed,
+            parsing_errors=pipeline.parsing_errors,
+            analysis_id=outcome.analysis_id,
+            pgx_coverage=coverage_summary(pipeline.coverage),
+            knowledge_base_version=knowledge_base.KB_VERSION,
+        ),
+        variants=variants,
+        results=results,
+    )
+
+
+def dumps(model) -> bytes:
+    """Encode a (possibly model_construct-ed) model straight to JSON bytes."""
+    return to_json(model)
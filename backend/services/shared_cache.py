@@ -0,0 +1,109 @@
+"""
+PharmaGuard Shared Cache
+Host-wide key/value cache in a single SQLite database (WAL mode), shared by
+every API worker process. Lookups are plain indexed reads that never block
+on a writer; writes are short upserts serialized by SQLite itself, so
+adding workers does not split the cache into cold per-process copies.
+Also provides leases, so one-per-host background work (cache warm-up)
+runs in a single worker.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+from services.db import connect
+
+SHARED_CACHE_DB = "shared_cache.db"
+# Upper bound on stored entries; the oldest are pruned beyond it
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "20000"))
+# Prune expired / excess entries once every N writes
+_PRUNE_EVERY = 200
+
+_lock = threading.Lock()
+_conn = None
+_writes = 0
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = connect(SHARED_CACHE_DB)
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace  TEXT NOT NULL,
+                key        TEXT NOT NULL,
+                value      BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        _conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_created ON cache_entries (created_at)")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS leases (
+                name       TEXT PRIMARY KEY,
+                owner      TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )"""
+        )
+        _conn.commit()
+    return _conn
+
+
+def get(namespace: str, key: str) -> Optional[bytes]:
+    """Return the stored value, or None when missing or expired."""
+    with _lock:
+        row = _db().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+    if row is None or (row["expires_at"] is not None and row["expires_at"] < time.time()):
+        return None
+    return row["value"]
+
+
+def put(namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+    """Insert or overwrite an entry. Concurrent writers of the same key are safe: last one wins."""
+    global _writes
+    now = time.time()
+    with _lock:
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, value, now, now + ttl if ttl else None),
+        )
+        _writes += 1
+        if _writes % _PRUNE_EVERY == 0:
+            _prune(conn, now)
+        conn.commit()
+
+
+def _prune(conn, now: float) -> None:
+    conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+    conn.execute(
+        "DELETE FROM cache_entries WHERE rowid IN ("
+        "  SELECT rowid FROM cache_entries ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+        (SHARED_CACHE_MAX_ENTRIES,),
+    )
+
+
+def acquire_lease(name: str, ttl: float) -> bool:
+    """
+    Take (or renew) a named host-wide lease for this process.
+    Returns False while another live process holds it.
+    """
+    owner = str(os.getpid())
+    now = time.time()
+    with _lock:
+        conn = _db()
+        cur = conn.execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+            (name, owner, now + ttl, now),
+        )
+        conn.commit()
+    return cur.rowcount > 0
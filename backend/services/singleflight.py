@@ -0,0 +1,64 @@
+"""
+PharmaGuard Single-Flight
+Coalesces identical concurrent work: the first caller for a key starts the
+computation, every caller that arrives while it is in flight awaits the same
+result instead of repeating it. Keys are dropped as soon as the work
+finishes, so this never serves stale results — caching is the job of
+explanation_cache / shared_cache. When every waiter has been cancelled
+(all clients disconnected) the shared work itself is cancelled.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from services import metrics, tracing
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn()` once per key at a time; concurrent callers share its result."""
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda done: self._forget(key, done))
+            metrics.SINGLEFLIGHT_REQUESTS.inc(group=self.name, role="leader")
+        else:
+            metrics.SINGLEFLIGHT_REQUESTS.inc(group=self.name, role="follower")
+            tracing.event("coalesced", group=self.name, key=key[:16])
+
+        flight.waiters += 1
+        try:
+            # shield: one caller going away must not cancel the others' result
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # Last interested caller left: stop the work, and let the next
+                # caller for this key start afresh instead of joining a dying task
+                flight.task.cancel()
+                self._forget(key, flight.task)
+                metrics.CANCELLED_WORK.inc(kind=self.name)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
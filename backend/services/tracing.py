@@ -0,0 +1,103 @@
+"""
+PharmaGuard Request Tracing
+Opt-in per-request debug trace (X-GenRx-Debug: 1 or ?debug=1): stage spans
+with durations, VCF parser diagnostics and every LLM provider attempt.
+An optional cProfile report of the CPU-bound stages can be attached too.
+Stage timings always feed the /metrics histograms; spans are only kept
+when a trace is active for the current request.
+"""
+
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from services import metrics
+
+# Fraction of debug requests that also get a cProfile report without asking
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("genrx_trace", default=None)
+
+
+class Trace:
+    def __init__(self, profile: bool = False):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.profile = profile
+        self._origin = time.perf_counter()
+        self.spans = []
+        self.events = []
+        self.parse_stats: Optional[dict] = None
+        self.profile_report: Optional[str] = None
+
+    def _ms(self, seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    def add_span(self, name: str, duration: float, start: Optional[float] = None, **attrs) -> None:
+        span = {"name": name, "duration_ms": self._ms(duration)}
+        if start is not None:
+            span["start_ms"] = self._ms(start - self._origin)
+        if attrs:
+            span["attributes"] = attrs
+        self.spans.append(span)
+
+    def add_event(self, name: str, **attrs) -> None:
+        self.events.append({"name": name, "at_ms": self._ms(time.perf_counter() - self._origin), **attrs})
+
+    def to_dict(self) -> dict:
+        data = {
+            "trace_id": self.trace_id,
+            "total_ms": self._ms(time.perf_counter() - self._origin),
+            "spans": self.spans,
+            "events": self.events,
+            "parser": self.parse_stats,
+        }
+        if self.profile_report is not None:
+            data["profile"] = self.profile_report
+        return data
+
+
+def start_trace(profile: bool = False) -> Trace:
+    """Activate a trace for the current request context."""
+    if not profile and PROFILE_SAMPLE_RATE > 0:
+        profile = random.random() < PROFILE_SAMPLE_RATE
+    trace = Trace(profile=profile)
+    _current.set(trace)
+    return trace
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str, **attrs):
+    """Time a pipeline stage: always into /metrics, into the trace when active."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        metrics.STAGE_SECONDS.observe(duration, stage=name)
+        trace = _current.get()
+        if trace is not None:
+            trace.add_span(name, duration, start, **attrs)
+
+
+def record_stages(stage_seconds: Dict[str, float]) -> None:
+    """Record stages measured elsewhere (e.g. inside a worker process)."""
+    metrics.observe_stages(stage_seconds)
+    trace = _current.get()
+    if trace is not None:
+        for name, seconds in stage_seconds.items():
+            trace.add_span(name, seconds, process="worker")
+
+
+def event(name: str, **attrs) -> None:
+    """Attach a point-in-time event (e.g. an LLM attempt) to the active trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add_event(name, **attrs)
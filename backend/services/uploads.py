@@ -0,0 +1,80 @@
+"""
+PharmaGuard Upload Spooling
+Uploaded VCFs are streamed to a file under GENRX_DATA_DIR in fixed-size
+chunks and hashed as they are written, so a multi-GB upload is never held
+in memory, never hashed on the event loop, and never pickled into a pool
+worker: workers receive the path and parse the file line by line.
+"""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from services.db import db_path
+
+# Bytes read / hashed / written per step while spooling
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+
+@dataclass
+class SpooledVCF:
+    """A VCF on local disk, with the SHA-256 of its content (the pipeline cache key)."""
+    path: str
+    sha256: str
+    size: int
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def spool_path(prefix: str = "upload") -> str:
+    return db_path(f"{prefix}_{uuid.uuid4().hex}.vcf")
+
+
+def spool(fileobj, path: Optional[str] = None) -> SpooledVCF:
+    """
+    Copy a binary file object to `path` (a fresh spool file by default).
+    Blocking: call it through asyncio.to_thread from async code.
+    """
+    path = path or spool_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = fileobj.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        SpooledVCF(path, "", 0).remove()
+        raise
+    return SpooledVCF(path, digest.hexdigest(), size)
+
+
+def spooled_file(path: str) -> SpooledVCF:
+    """Describe an already spooled file (e.g. a queued job's upload). Blocking."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return SpooledVCF(path, digest.hexdigest(), size)
+
+
+async def spool_upload(upload, path: Optional[str] = None) -> SpooledVCF:
+    """Spool a FastAPI UploadFile off the event loop."""
+    await upload.seek(0)
+    return await asyncio.to_thread(spool, upload.file, path)
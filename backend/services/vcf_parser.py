@@ -5,8 +5,12 @@ across 6 critical genes: CYP2D6, CYP2C19, CYP2C9, SLCO1B1, TPMT, DPYD
 """
 
 import re
-from dataclasses import dataclass, field
-from typing import Optional
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+
+from services.annotation import AnnotationDecoder, carried_alleles
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -66,6 +70,180 @@ GENE_CHROMOSOMES = {
     "DPYD":    "chr1",
 }
 
+# ─────────────────────────────────────────────────────────────────────────────
+# COORDINATES — per genome build, precomputed at import (no liftover per request)
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Build assumed when the header names none (the build the tables were curated on)
+DEFAULT_BUILD = "GRCh37"
+
+# Positions of the PGx sites per build (chromosome without "chr"). Used for
+# position-based matching and to tell "covered as reference" from "not covered"
+# in gVCFs. Six knowledge-base variants are deliberately absent from both builds
+# and are matched by rsID / INFO tags only (and reported as uncurated in gVCF
+# coverage): the deletions rs35742686 (CYP2D6*3), rs5030655 (CYP2D6*6) and
+# rs9332131 (CYP2C9*6), whose VCF POS/REF depend on the caller's indel
+# left-alignment, and rs28371706 (CYP2D6*41), rs74064213 (SLCO1B1*15) and
+# rs72552739 (TPMT*3D), whose coordinates and alleles have not yet been
+# verified against dbSNP for both builds. A wrong coordinate would assign a
+# star allele to an unrelated variant, so none is better than a guess.
+PGX_SITE_POSITIONS = {
+    "GRCh37": {
+        "rs3892097":  ("22", 42524947), "rs16947":    ("22", 42523943),
+        "rs1135840":  ("22", 42522613), "rs1065852":  ("22", 42526694),
+        "rs4244285":  ("10", 96541616), "rs4986893":  ("10", 96540410),
+        "rs12248560": ("10", 96521657), "rs28399504": ("10", 96522463),
+        "rs56337013": ("10", 96612495), "rs1799853":  ("10", 96702047),
+        "rs1057910":  ("10", 96741053), "rs28371686": ("10", 96741058),
+        "rs7900194":  ("10", 96702066), "rs4149056":  ("12", 21331549),
+        "rs2306283":  ("12", 21329738), "rs11045819": ("12", 21329813),
+        "rs1800460":  ("6", 18139228),  "rs1142345":  ("6", 18130918),
+        "rs1800462":  ("6", 18143955),  "rs3918290":  ("1", 97915614),
+        "rs55886062": ("1", 97981343),  "rs67376798": ("1", 97547947),
+        "rs75017182": ("1", 98045449),
+    },
+    "GRCh38": {
+        "rs3892097":  ("22", 42128945), "rs16947":    ("22", 42127941),
+        "rs1135840":  ("22", 42126611), "rs1065852":  ("22", 42130692),
+        "rs4244285":  ("10", 94781859), "rs4986893":  ("10", 94780653),
+        "rs12248560": ("10", 94761900), "rs28399504": ("10", 94762706),
+        "rs56337013": ("10", 94852738), "rs1799853":  ("10", 94942290),
+        "rs1057910":  ("10", 94981296), "rs28371686": ("10", 94981301),
+        "rs7900194":  ("10", 94942309), "rs4149056":  ("12", 21178615),
+        "rs2306283":  ("12", 21176804), "rs11045819": ("12", 21176879),
+        "rs1800460":  ("6", 18138997),  "rs1142345":  ("6", 18130687),
+        "rs1800462":  ("6", 18143724),  "rs3918290":  ("1", 97450058),
+        "rs55886062": ("1", 97515787),  "rs67376798": ("1", 97082391),
+        "rs75017182": ("1", 97579893),
+    },
+}
+
+# Gene regions per build (chromosome without "chr", start, end), used by
+# clients that pre-extract PGx lines before upload (GET /pgx-regions)
+PGX_GENE_REGIONS = {
+    "GRCh37": {
+        "CYP2D6":  ("22", 42522501, 42526883),
+        "CYP2C19": ("10", 96522438, 96612671),
+        "CYP2C9":  ("10", 96698415, 96749147),
+        "SLCO1B1": ("12", 21284128, 21392730),
+        "TPMT":    ("6", 18128542, 18155374),
+        "DPYD":    ("1", 97543299, 98386615),
+    },
+    "GRCh38": {
+        "CYP2D6":  ("22", 42126499, 42130881),
+        "CYP2C19": ("10", 94762681, 94855547),
+        "CYP2C9":  ("10", 94938658, 94990091),
+        "SLCO1B1": ("12", 21131194, 21239796),
+        "TPMT":    ("6", 18128311, 18155305),
+        "DPYD":    ("1", 97077743, 97921049),
+    },
+}
+GENOME_BUILDS = tuple(PGX_SITE_POSITIONS)
+
+# Forward-strand (REF, ALT) of each site, the same in both builds. A record
+# matched by position alone must carry this allele: another change at the
+# same position is a different variant.
+PGX_SITE_ALLELES = {
+    "rs3892097":  ("C", "T"), "rs16947":    ("G", "A"),
+    "rs1135840":  ("C", "G"), "rs1065852":  ("G", "A"),
+    "rs4244285":  ("G", "A"), "rs4986893":  ("G", "A"),
+    "rs12248560": ("C", "T"), "rs28399504": ("A", "G"),
+    "rs56337013": ("C", "T"), "rs1799853":  ("C", "T"),
+    "rs1057910":  ("A", "C"), "rs28371686": ("C", "G"),
+    "rs7900194":  ("G", "A"), "rs4149056":  ("T", "C"),
+    "rs2306283":  ("A", "G"), "rs11045819": ("C", "A"),
+    "rs1800460":  ("C", "T"), "rs1142345":  ("T", "C"),
+    "rs1800462":  ("C", "G"), "rs3918290":  ("C", "T"),
+    "rs55886062": ("A", "C"), "rs67376798": ("T", "A"),
+    "rs75017182": ("G", "C"),
+}
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+# Header evidence for the build. Contig lengths are checked first: they are
+# written by the aligner, while ##reference is often just a file path.
+BUILD_CONTIG_LENGTHS = {
+    ("1", 249250621): "GRCh37",  ("1", 248956422): "GRCh38",
+    ("6", 171115067): "GRCh37",  ("6", 170805979): "GRCh38",
+    ("10", 135534747): "GRCh37", ("10", 133797422): "GRCh38",
+    ("12", 133851895): "GRCh37", ("12", 133275309): "GRCh38",
+    ("22", 51304566): "GRCh37",  ("22", 50818468): "GRCh38",
+}
+# RefSeq accession versions of the pharmacogene chromosomes
+BUILD_ACCESSIONS = {
+    "NC_000001.10": "GRCh37", "NC_000001.11": "GRCh38",
+    "NC_000006.11": "GRCh37", "NC_000006.12": "GRCh38",
+    "NC_000010.10": "GRCh37", "NC_000010.11": "GRCh38",
+    "NC_000012.11": "GRCh37", "NC_000012.12": "GRCh38",
+    "NC_000022.10": "GRCh37", "NC_000022.11": "GRCh38",
+}
+# Assembly names in ##reference / ##assembly / contig assembly=, GRCh38 checked first
+BUILD_NAME_PATTERNS = (
+    ("GRCh38", re.compile(r"grch38|hg38|hs38|b38", re.IGNORECASE)),
+    ("GRCh37", re.compile(r"grch37|hg19|hs37|b37|g1k_v37", re.IGNORECASE)),
+)
+_CONTIG_ID = re.compile(r"[<,]ID=([^,>]+)")
+_CONTIG_LENGTH = re.compile(r"[<,]length=(\d+)")
+_CONTIG_ASSEMBLY = re.compile(r"[<,]assembly=([^,>]+)")
+
+# Every spelling of a chromosome seen in the wild → the bare name used in the tables
+CHROM_ALIASES = {}
+for _n, _name in enumerate([str(i) for i in range(1, 23)] + ["X", "Y"], start=1):
+    for _alias in (_name, f"chr{_name}", f"CHR{_name}", f"Chr{_name}", f"NC_{_n:06d}"):
+        CHROM_ALIASES[_alias] = _name
+for _alias in ("MT", "M", "chrM", "chrMT", "CHRM", "NC_012920", "NC_012920.1"):
+    CHROM_ALIASES[_alias] = "MT"
+for _accession in BUILD_ACCESSIONS:
+    CHROM_ALIASES[_accession] = CHROM_ALIASES[_accession.split(".")[0]]
+
+
+@dataclass(frozen=True)
+class CoordinateIndex:
+    """One build's PGx coordinates as sorted arrays, for O(1) and bisect lookups."""
+    build: str
+    # chromosome → (sorted positions, rsids in the same order)
+    sites_by_chrom: dict
+    # (chromosome, position) → rsid
+    site_lookup: dict
+    # (chromosome, start, end, gene), sorted
+    regions: tuple
+
+
+def _coordinate_index(build: str) -> CoordinateIndex:
+    by_chrom = {}
+    for rsid, (chrom, pos) in PGX_SITE_POSITIONS[build].items():
+        by_chrom.setdefault(chrom, []).append((pos, rsid))
+    sites_by_chrom = {}
+    for chrom, sites in by_chrom.items():
+        sites.sort()
+        sites_by_chrom[chrom] = ([pos for pos, _ in sites], [rsid for _, rsid in sites])
+    return CoordinateIndex(
+        build=build,
+        sites_by_chrom=sites_by_chrom,
+        site_lookup={site: rsid for rsid, site in PGX_SITE_POSITIONS[build].items()},
+        regions=tuple(sorted((chrom, start, end, gene)
+                             for gene, (chrom, start, end) in PGX_GENE_REGIONS[build].items())),
+    )
+
+
+COORDINATE_INDEX = {build: _coordinate_index(build) for build in GENOME_BUILDS}
+
+# Every rsid with curated coordinates (the same set, in the same order, in each build)
+PGX_SITE_RSIDS = PGX_SITE_POSITIONS[DEFAULT_BUILD].keys()
+
+# gene → knowledge-base variants without curated coordinates. A gVCF cannot
+# show them as covered, so such a gene is never reported as fully confirmed
+PGX_UNCURATED_SITES = {}
+for _rsid, _data in PHARMACO_VARIANTS_DB.items():
+    if _rsid not in PGX_SITE_RSIDS:
+        PGX_UNCURATED_SITES.setdefault(_data["gene"], []).append(_rsid)
+
+# Meta line a pre-extracting client adds with the data line count of the full file
+ORIGINAL_VARIANT_COUNT_META = "##genrx_original_variant_count="
+
+# gVCF symbolic ALT alleles: reference blocks carry only these
+GVCF_SYMBOLIC_ALTS = ("<NON_REF>", "<*>")
+_END_TAG = re.compile(r"(?:^|[\t;])END=(\d+)")
+
 # Phenotype determination rules per gene
 def determine_phenotype(gene: str, activity_score: float, variant_count: int) -> str:
     """Convert activity score to CPIC phenotype classification."""
@@ -123,6 +301,28 @@ class GeneProfile:
     star_alleles: list
 
 
+class ParseCancelled(Exception):
+    """Raised inside parse_vcf when its cancel check reports the request is gone."""
+
+
+# Lines between cancellation checks (a check is one stat() call)
+CANCEL_CHECK_INTERVAL = 4096
+
+
+def iter_lines(text: str):
+    """
+    Lines of `text` one at a time. Unlike str.split, a multi-GB file never
+    exists twice in memory (as the text and as a list of line copies).
+    """
+    start = 0
+    end = text.find("\n")
+    while end >= 0:
+        yield text[start:end]
+        start = end + 1
+        end = text.find("\n", start)
+    yield text[start:]
+
+
 @dataclass
 class ParseResult:
     patient_id: str
@@ -133,6 +333,10 @@ class ParseResult:
     parsing_errors: list
     vcf_version: str
     success: bool
+    # Genome build the positions were matched on (see detect_build)
+    genome_build: str = DEFAULT_BUILD
+    # gVCF only: gene → PGx site coverage (see summarize_coverage)
+    coverage: dict = field(default_factory=dict)
 
 
 def parse_genotype(gt_string: str) -> tuple:
@@ -165,13 +369,19 @@ def extract_info_field(info_str: str, field_name: str) -> Optional[str]:
     return match.group(1) if match else None
 
 
-def parse_vcf(file_content: str) -> ParseResult:
+def parse_vcf(file_content, stats: Optional[dict] = None,
+              cancel_check: Optional[Callable[[], bool]] = None) -> ParseResult:
     """
-    Main VCF parser. Handles:
+    Main VCF parser. `file_content` is the VCF text, or any iterable of its
+    lines (e.g. a file opened in text mode, read as it is parsed). Handles:
     - Standard VCF v4.2 format
     - INFO tags: GENE, STAR, RS, ANN
     - Genotype (GT) field
-    - Both rsID-based and position-based variant detection
+    - Both rsID-based and position-based variant detection, on GRCh37 or
+      GRCh38 coordinates (build read from ##contig/##reference, see detect_build)
+    If `stats` is given it is filled with diagnostic timings/counters.
+    `cancel_check` is polled every CANCEL_CHECK_INTERVAL lines; when it
+    returns True parsing stops with ParseCancelled.
     """
     errors = []
     pharmaco_variants = []
@@ -180,18 +390,44 @@ def parse_vcf(file_content: str) -> ParseResult:
     sample_count = 0
     total_variants = 0
     header_cols = []
-
-    lines = file_content.strip().split('\n')
-    
-    for line in lines:
+    # Diagnostics: lines seen, and lines each matching method tried and rejected
+    lines_scanned = malformed_lines = 0
+    rejected_rsid = rejected_info = rejected_ann = 0
+    annotations = AnnotationDecoder(GENE_CHROMOSOMES)
+    # Set when the client uploaded only the PGx lines of a larger file
+    original_variant_count = None
+    # gVCF: reference blocks skipped, and PGx site rsid → coverage status
+    reference_blocks = 0
+    site_status = {}
+    # Coordinates of the build the header names; contig evidence outranks names
+    build, build_source = DEFAULT_BUILD, "default"
+    index = COORDINATE_INDEX[build]
+
+    lines = iter_lines(file_content) if isinstance(file_content, str) else file_content
+    for line_no, line in enumerate(lines):
+        if cancel_check is not None and line_no % CANCEL_CHECK_INTERVAL == 0 and cancel_check():
+            raise ParseCancelled()
         line = line.strip()
         if not line:
             continue
+        lines_scanned += 1
 
         # Meta lines
         if line.startswith("##"):
             if line.startswith("##fileformat="):
                 vcf_version = line.split("=")[1]
+            elif line.startswith(ORIGINAL_VARIANT_COUNT_META):
+                try:
+                    original_variant_count = int(line[len(ORIGINAL_VARIANT_COUNT_META):])
+                except ValueError:
+                    errors.append(f"Invalid original variant count: {line}")
+            elif line.startswith("##INFO=<ID=CSQ"):
+                annotations.read_header(line)
+            elif build_source != "contig":
+                hint = detect_build(line)
+                if hint and (hint[1] == "contig" or build_source == "default"):
+                    build, build_source = hint
+                    index = COORDINATE_INDEX[build]
             continue
 
         # Header line
@@ -207,14 +443,24 @@ def parse_vcf(file_content: str) -> ParseResult:
                     patient_id = sample_cols[0]
             continue
 
+        # gVCF reference block: not a variant, only checked against PGx sites
+        if "<" in line:
+            head = line.split("\t", 5)
+            if len(head) > 5 and head[4] in GVCF_SYMBOLIC_ALTS:
+                reference_blocks += 1
+                mark_reference_block(head, site_status, index)
+                continue
+
         # Data lines
         parts = line.split("\t")
         if len(parts) < 8:
+            malformed_lines += 1
             continue
 
         total_variants += 1
 
         chrom = parts[0]
+        canonical_chrom = CHROM_ALIASES.get(chrom, chrom)
         pos_str = parts[1]
         rsid = parts[2]
         ref = parts[3]
@@ -232,6 +478,7 @@ def parse_vcf(file_content: str) -> ParseResult:
         # Parse genotype if FORMAT column exists
         genotype = "."
         zygosity = "unknown"
+        alleles = ()
         if len(parts) > 9 and len(header_cols) > 9:
             format_str = parts[8]
             sample_str = parts[9]
@@ -244,20 +491,36 @@ def parse_vcf(file_content: str) -> ParseResult:
                     alleles, zygosity = parse_genotype(gt_val)
                     genotype = gt_val
 
-        # Try to identify pharmacogenomic relevance
+        # A PGx site reported as a record: called variant, hom-ref or no-call
+        site = rsid if rsid in PGX_SITE_RSIDS else index.site_lookup.get((canonical_chrom, pos))
+        if site:
+            if genotype != "." and zygosity == "homozygous_ref":
+                site_status[site] = "hom_ref"
+            elif genotype != "." and zygosity == "unknown":
+                site_status[site] = "no_call"
+            else:
+                site_status[site] = "variant"
+
+        # gVCF's trailing <NON_REF> is not an allele of the sample
+        alts = [a for a in alt.split(",") if a not in GVCF_SYMBOLIC_ALTS] or [alt]
+        # Try to identify pharmacogenomic relevance. The rsID and INFO tags
+        # describe the record as a whole: it stays one variant, as before
         variant_data = None
 
-        # Method 1: Direct rsID lookup
-        rsid_clean = rsid.lower().replace("rs", "rs")
+        # Method 1: Direct rsID lookup, or the site at this position when the ID is missing
         if rsid in PHARMACO_VARIANTS_DB:
             variant_data = PHARMACO_VARIANTS_DB[rsid].copy()
+        elif rsid in (".", "") and site and site_allele_matches(site, ref, alts):
+            variant_data = PHARMACO_VARIANTS_DB[site].copy()
+            rsid = site
 
         # Method 2: INFO field annotations (GENE, STAR, RS tags)
         if not variant_data:
+            rejected_rsid += 1
             info_gene = extract_info_field(info_str, "GENE")
             info_star = extract_info_field(info_str, "STAR")
             info_rs   = extract_info_field(info_str, "RS")
-            
+
             if info_rs and f"rs{info_rs}" in PHARMACO_VARIANTS_DB:
                 variant_data = PHARMACO_VARIANTS_DB[f"rs{info_rs}"].copy()
                 if not rsid or rsid == ".":
@@ -272,48 +535,75 @@ def parse_vcf(file_content: str) -> ParseResult:
                     "drug_relevance": []
                 }
 
-        # Method 3: Check ANN field (SnpEff annotations)
-        if not variant_data:
-            ann = extract_info_field(info_str, "ANN")
-            if ann:
-                for known_gene in GENE_CHROMOSOMES.keys():
-                    if known_gene in ann:
-                        variant_data = {
-                            "gene": known_gene,
-                            "star": "unknown",
-                            "effect": "unknown",
-                            "activity": 1.0,
-                            "drug_relevance": []
-                        }
-                        break
-
         if variant_data:
-            # Adjust activity score for homozygous (both alleles affected)
-            activity = variant_data.get("activity", 1.0)
-            if zygosity == "homozygous_alt":
-                # Both alleles non-functional → double the impact
-                pass  # activity already reflects per-allele; diplotype handles totals
-            
+            matches = [(variant_data, ",".join(alts), zygosity)]
+        else:
+            # Method 3: SnpEff ANN / VEP CSQ annotations are allele-specific, so a
+            # multi-allelic record yields one variant per ALT allele the sample carries
+            rejected_info += 1
+            ann_genes = annotations.genes_by_allele(info_str, alts)
+            matches = []
+            for allele_num, allele_alt, allele_zygosity in carried_alleles(alts, alleles, zygosity):
+                if allele_num:
+                    ann_gene = ann_genes.get(allele_num) or ann_genes.get(0)
+                else:
+                    ann_gene = next(iter(ann_genes.values()), None)
+                if ann_gene:
+                    matches.append(({
+                        "gene": ann_gene,
+                        "star": "unknown",
+                        "effect": "unknown",
+                        "activity": 1.0,
+                        "drug_relevance": []
+                    }, allele_alt, allele_zygosity))
+            if not matches:
+                rejected_ann += 1
+
+        for variant_data, allele_alt, allele_zygosity in matches:
             vcf_var = VCFVariant(
                 chrom=chrom,
                 pos=pos,
-                rsid=rsid if rsid != "." else f"chr{chrom}:{pos}",
+                rsid=rsid if rsid != "." else f"chr{canonical_chrom}:{pos}",
                 ref=ref,
-                alt=alt,
+                alt=allele_alt,
                 qual=qual,
                 filter_status=filter_status,
                 genotype=genotype,
                 gene=variant_data.get("gene",""),
                 star_allele=variant_data.get("star",""),
                 effect=variant_data.get("effect","unknown"),
-                activity=activity,
+                # Per-allele score; diplotype totals are built from zygosity
+                activity=variant_data.get("activity", 1.0),
                 drug_relevance=variant_data.get("drug_relevance",[]),
-                zygosity=zygosity,
+                zygosity=allele_zygosity,
             )
             pharmaco_variants.append(vcf_var)
 
     # Build per-gene profiles
+    profiles_start = time.perf_counter()
     gene_profiles = build_gene_profiles(pharmaco_variants)
+    if stats is not None:
+        stats["build_gene_profiles_seconds"] = time.perf_counter() - profiles_start
+        stats.update(
+            lines_scanned=lines_scanned,
+            data_lines=total_variants,
+            malformed_lines=malformed_lines,
+            invalid_positions=len([e for e in errors if e.startswith("Invalid position")]),
+            rejected_by_rsid_lookup=rejected_rsid,
+            rejected_by_info_tags=rejected_info,
+            rejected_by_ann_field=rejected_ann,
+            pharmacogenomic_hits=len(pharmaco_variants),
+            gvcf=reference_blocks > 0,
+            reference_blocks=reference_blocks,
+            genome_build=build,
+            genome_build_source=build_source,
+        )
+
+    # A pre-extracted upload reports the size of the file it was cut from
+    if original_variant_count is not None:
+        if stats is not None:
+            stats["prefiltered_variants_uploaded"] = total_variants
+        total_variants = max(original_variant_count, total_variants)
 
     # Strict v4.2 check (Requirement #1)
     is_v42 = "4.2" in vcf_version
@@ -329,9 +619,134 @@ def parse_vcf(file_content: str) -> ParseResult:
         parsing_errors=errors,
         vcf_version=vcf_version,
         success=total_variants > 0 and is_v42,
+        genome_build=build,
+        coverage=summarize_coverage(site_status) if reference_blocks else {},
     )
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# GENOME BUILD
+# ─────────────────────────────────────────────────────────────────────────────
+
+def normalize_chrom(chrom: str) -> str:
+    """chr22 / 22 / NC_000022.11 → "22"; chrM / M → "MT". Unknown names pass through."""
+    return CHROM_ALIASES.get(chrom, chrom)
+
+
+def site_allele_matches(rsid: str, ref: str, alts: list) -> bool:
+    """
+    The record carries the curated allele of a PGx site. Gene-oriented
+    pipelines write minus-strand genes' alleles complemented (CYP2D6*4 as
+    G>A rather than C>T), so the complemented pair is accepted as well.
+    """
+    expected = PGX_SITE_ALLELES.get(rsid)
+    if expected is None:
+        return False
+    site_ref, site_alt = expected
+    if ref == site_ref and site_alt in alts:
+        return True
+    return ref == site_ref.translate(_COMPLEMENT) and site_alt.translate(_COMPLEMENT) in alts
+
+
+def detect_build(line: str) -> Optional[tuple]:
+    """
+    (build, source) named by one header meta line, or None. source is
+    "contig" for a ##contig line with a known pharmacogene-chromosome
+    length or RefSeq accession, otherwise "reference" for an assembly name
+    in ##reference, ##assembly or a contig's assembly= field.
+    """
+    if line.startswith("##contig="):
+        contig = _CONTIG_ID.search(line)
+        length = _CONTIG_LENGTH.search(line)
+        if contig:
+            name = contig.group(1)
+            build = BUILD_ACCESSIONS.get(name)
+            if build is None and length:
+                build = BUILD_CONTIG_LENGTHS.get((normalize_chrom(name), int(length.group(1))))
+            if build:
+                return build, "contig"
+        assembly = _CONTIG_ASSEMBLY.search(line)
+        text = assembly.group(1) if assembly else ""
+    elif line.startswith(("##reference=", "##assembly=")):
+        text = line.split("=", 1)[1]
+    else:
+        return None
+    for build, pattern in BUILD_NAME_PATTERNS:
+        if pattern.search(text):
+            return build, "reference"
+    return None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# gVCF COVERAGE
+# ─────────────────────────────────────────────────────────────────────────────
+
+def mark_reference_block(head: list, site_status: dict,
+                         index: CoordinateIndex = COORDINATE_INDEX[DEFAULT_BUILD]) -> None:
+    """
+    Record PGx sites inside a reference block (CHROM, POS, ID, REF, ALT, rest).
+    Blocks off the pharmacogene chromosomes or between sites cost one bisect.
+    """
+    sites = index.sites_by_chrom.get(normalize_chrom(head[0]))
+    if not sites:
+        return
+    try:
+        start = int(head[1])
+    except ValueError:
+        return
+    end_match = _END_TAG.search(head[5])
+    end = int(end_match.group(1)) if end_match else start
+
+    positions, rsids = sites
+    covered = rsids[bisect_left(positions, start):bisect_right(positions, end)]
+    if not covered:
+        return
+
+    # rest = QUAL, FILTER, INFO, FORMAT, sample...
+    status = "hom_ref"
+    rest = head[5].split("\t")
+    if len(rest) > 4:
+        fmt_fields = rest[3].split(":")
+        smp_fields = rest[4].split(":")
+        if "GT" in fmt_fields and fmt_fields.index("GT") < len(smp_fields):
+            _, zygosity = parse_genotype(smp_fields[fmt_fields.index("GT")])
+            if zygosity == "unknown":
+                status = "no_call"
+    for rsid in covered:
+        # A variant record at the same site wins over a reference block
+        site_status.setdefault(rsid, status)
+
+
+def summarize_coverage(site_status: dict) -> dict:
+    """
+    Per gene: which PGx sites were called as variant, confirmed homozygous
+    reference, explicitly no-called, or absent from the gVCF altogether.
+    """
+    coverage = {}
+    for rsid in PGX_SITE_RSIDS:
+        gene = PHARMACO_VARIANTS_DB[rsid]["gene"]
+        entry = coverage.setdefault(gene, {"sites": 0, "variant": [], "hom_ref": [], "no_call": [], "absent": []})
+        entry["sites"] += 1
+        entry[site_status.get(rsid, "absent")].append(rsid)
+    return coverage
+
+
+def coverage_complete(coverage: dict, gene: str) -> bool:
+    """
+    Every knowledge-base variant of a gene was called in the gVCF. False
+    when any of them has no curated coordinates, however the others fared.
+    """
+    return coverage_fraction(coverage, gene) == 1.0 and not PGX_UNCURATED_SITES.get(gene)
+
+
+def coverage_fraction(coverage: dict, gene: str) -> Optional[float]:
+    """Share of a gene's PGx sites with a genotype call; None without gVCF coverage."""
+    entry = coverage.get(gene)
+    if not entry or not entry["sites"]:
+        return None
+    return (len(entry["variant"]) + len(entry["hom_ref"])) / entry["sites"]
+
+
 def build_gene_profiles(variants: list) -> dict:
     """Build diplotype and phenotype per gene from detected variants."""
     gene_variants = {}
@@ -387,3 +802,42 @@ def build_gene_profiles(variants: list) -> dict:
         )
 
     return profiles
+
+
+def gene_profiles_to_dict(profiles: dict) -> dict:
+    """Serialize GeneProfile objects to plain JSON-ready dicts."""
+    return {gene: asdict(profile) for gene, profile in profiles.items()}
+
+
+def gene_profiles_from_dict(data: dict) -> dict:
+    """Rebuild GeneProfile objects from gene_profiles_to_dict output."""
+    return {
+        gene: GeneProfile(**{**profile, "variants": [VCFVariant(**v) for v in profile["variants"]]})
+        for gene, profile in data.items()
+    }
+
+
+def reannotate_gene_profiles(data: dict) -> dict:
+    """
+    Rebuild gene profiles from gene_profiles_to_dict output against the
+    current PHARMACO_VARIANTS_DB. Each stored call keeps what the VCF said
+    (rsid, position, alleles, zygosity); its gene, star allele, effect and
+    activity are looked up again and diplotypes / phenotypes recomputed, so
+    a corrected entry reaches stored genotypes. Calls without an entry
+    (INFO-tag or ANN/CSQ matches) keep their stored annotation.
+    """
+    variants = []
+    for profile in data.values():
+        for stored in profile["variants"]:
+            entry = PHARMACO_VARIANTS_DB.get(stored["rsid"])
+            if entry is not None:
+                stored = {
+                    **stored,
+                    "gene": entry["gene"],
+                    "star_allele": entry["star"],
+                    "effect": entry["effect"],
+                    "activity": entry["activity"],
+                    "drug_relevance": list(entry["drug_relevance"]),
+                }
+            variants.append(VCFVariant(**stored))
+    return build_gene_profiles(variants)
@@ -0,0 +1,128 @@
+"""
+PharmaGuard Explanation Warm-up
+Precomputes LLM explanations at startup for every supported drug × phenotype
+combination plus the most common diplotypes per gene, so cold traffic right
+after a deploy is answered from the explanation cache.
+"""
+
+import asyncio
+import os
+
+from services import explanation_cache, llm_service, orchestrator, risk_engine, shared_cache
+from services.vcf_parser import (
+    PHARMACO_VARIANTS_DB, GENE_CHROMOSOMES, VCFVariant, build_gene_profiles,
+)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "0") == "1"
+# Extra diplotypes per gene on top of the ones needed to cover every phenotype
+WARMUP_TOP_DIPLOTYPES = int(os.getenv("WARMUP_TOP_DIPLOTYPES", "3"))
+# Stay well inside the free-tier provider limits (Gemini: 15 RPM)
+WARMUP_REQUESTS_PER_MINUTE = float(os.getenv("WARMUP_REQUESTS_PER_MINUTE", "10"))
+# Host-wide lease so only one API worker runs the warm-up
+WARMUP_LEASE_SECONDS = 120
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# WARM-UP PLAN
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _synthetic_variant(rsid: str, zygosity: str) -> VCFVariant:
+    data = PHARMACO_VARIANTS_DB[rsid]
+    return VCFVariant(
+        chrom=GENE_CHROMOSOMES.get(data["gene"], ""),
+        pos=0,
+        rsid=rsid,
+        ref="",
+        alt="",
+        qual=".",
+        filter_status="PASS",
+        genotype="1/1" if zygosity == "homozygous_alt" else "0/1",
+        gene=data["gene"],
+        star_allele=data["star"],
+        effect=data["effect"],
+        activity=data["activity"],
+        drug_relevance=data["drug_relevance"],
+        zygosity=zygosity,
+    )
+
+
+def candidate_profiles(gene: str) -> list:
+    """
+    Gene-profile dicts in decreasing order of expected frequency:
+    the reference *1/*1, then each known allele heterozygous, then homozygous.
+    Knowledge-base order is used as the frequency proxy (main alleles first).
+    """
+    rsids = [rs for rs, data in PHARMACO_VARIANTS_DB.items() if data["gene"] == gene]
+    candidates = [{}]
+    for zygosity in ("heterozygous", "homozygous_alt"):
+        for rsid in rsids:
+            candidates.append(build_gene_profiles([_synthetic_variant(rsid, zygosity)]))
+    return candidates
+
+
+def build_warmup_plan(top_n: int = WARMUP_TOP_DIPLOTYPES) -> list:
+    """
+    RiskResults to pre-explain: for each drug, the first diplotype reaching
+    every phenotype its rules cover, plus up to `top_n` further common diplotypes.
+    """
+    plan = []
+    for drug, rules in risk_engine.DRUG_GENE_RULES.items():
+        candidates = [
+            risk_engine.assess_drug_risk(drug, profiles)
+            for profiles in candidate_profiles(rules["primary_gene"])
+        ]
+        seen_phenotypes = set()
+        seen_diplotypes = set()
+        extras = []
+        for risk in candidates:
+            if risk.diplotype in seen_diplotypes:
+                continue
+            if risk.phenotype not in seen_phenotypes:
+                seen_phenotypes.add(risk.phenotype)
+                seen_diplotypes.add(risk.diplotype)
+                plan.append(risk)
+            else:
+                extras.append(risk)
+        added = 0
+        for risk in extras:
+            if added >= top_n:
+                break
+            if risk.diplotype not in seen_diplotypes:
+                seen_diplotypes.add(risk.diplotype)
+                plan.append(risk)
+                added += 1
+    return plan
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# BACKGROUND TASK
+# ─────────────────────────────────────────────────────────────────────────────
+
+async def run_warmup() -> None:
+    """
+    Fill the explanation cache sequentially, pacing provider calls to
+    WARMUP_REQUESTS_PER_MINUTE. Entries already cached cost nothing.
+    """
+    if not llm_service.has_llm_provider():
+        print("[WARMUP] No LLM provider configured; rule-based explanations need no warm-up.")
+        return
+
+    if not shared_cache.acquire_lease("warmup", WARMUP_LEASE_SECONDS):
+        print("[WARMUP] Another worker is warming the cache; skipping.")
+        return
+
+    interval = 60.0 / max(WARMUP_REQUESTS_PER_MINUTE, 0.1)
+    plan = build_warmup_plan()
+    generated = 0
+    for risk in plan:
+        if not shared_cache.acquire_lease("warmup", WARMUP_LEASE_SECONDS):
+            # Lease expired and was taken over: leave the rest to the new holder
+            print(f"[WARMUP] Lost the warm-up lease; stopping after {generated} generated.")
+            return
+        kwargs = orchestrator.explanation_kwargs(risk)
+        if await explanation_cache.contains(llm_service.clinical_prompt(**kwargs).cache_key):
+            continue
+        await llm_service.generate_clinical_explanation(**kwargs)
+        generated += 1
+        await asyncio.sleep(interval)
+    print(f"[WARMUP] Explanation cache warm: {generated} generated, {len(plan) - generated} already cached.")
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend the way main.py does: `from services import ...`
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the embedded stores (services.db) at a fresh directory."""
+    from services import db
+    monkeypatch.setattr(db, "DATA_DIR", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,40 @@
+import os
+
+from services import executor, llm_service, orchestrator
+from services.analysis_store import AnalysisStore
+
+SAMPLE_VCF = os.path.join(os.path.dirname(__file__), "..", "..", "sample_vcf", "sample_high_risk.vcf")
+
+
+def _outcome(analysis_id: str, timestamp: str) -> orchestrator.AnalysisOutcome:
+    pipeline = executor.run_pipeline(SAMPLE_VCF, ["CODEINE"])
+    drugs = [
+        (risk.drug, risk, llm_service.generate_fallback_explanation(**orchestrator.explanation_kwargs(risk)))
+        for risk in pipeline.risk_results
+    ]
+    return orchestrator.AnalysisOutcome(
+        analysis_id=analysis_id, patient_id="P1", timestamp=timestamp, pipeline=pipeline, drugs=drugs,
+    )
+
+
+def test_patient_listing_includes_queued_analyses(data_dir):
+    store = AnalysisStore()
+    store._write([_outcome("a1", "2026-01-01T00:00:00Z"), _outcome("a3", "2026-01-03T00:00:00Z")])
+    # Queued, not yet flushed by the writer
+    store._pending["a2"] = _outcome("a2", "2026-01-02T00:00:00Z")
+    # Already committed but still queued: listed once
+    store._pending["a3"] = _outcome("a3", "2026-01-03T00:00:00Z")
+
+    total, analyses = store.list_patient_analyses("P1", limit=10, offset=0)
+    assert total == 3
+    assert [a.analysis_id for a in analyses] == ["a3", "a2", "a1"]
+    assert all(a.results and a.results[0].drug == "CODEINE" for a in analyses)
+
+    total, analyses = store.list_patient_analyses("P1", limit=1, offset=1)
+    assert total == 3
+    assert [a.analysis_id for a in analyses] == ["a2"]
+
+    store._pending.clear()
+    total, analyses = store.list_patient_analyses("P1", limit=2, offset=1)
+    assert total == 2
+    assert [a.analysis_id for a in analyses] == ["a1"]
@@ -0,0 +1,35 @@
+from services import chat_service
+
+
+def _session(analysis_id: str) -> chat_service.ChatSession:
+    return chat_service.ChatSession(analysis_id=analysis_id, summary="", drugs=[], flagged=[])
+
+
+def test_workers_share_the_latest_history(data_dir):
+    # Two API workers: separate local session maps, one shared cache
+    worker_a, worker_b = chat_service.ChatSessions(), chat_service.ChatSessions()
+    session = _session("a1")
+    worker_a._sessions["a1"] = session
+    worker_a.save(session)
+
+    worker_a.record_turn(worker_a.get("a1"), "q1", "r1")
+    worker_b.record_turn(worker_b.get("a1"), "q2", "r2")
+    # Worker A still holds its older local copy; it must not answer from it
+    assert [q for q, _ in worker_a.get("a1").history] == ["q1", "q2"]
+
+    worker_a.record_turn(worker_a.get("a1"), "q3", "r3")
+    assert [q for q, _ in worker_b.get("a1").history] == ["q1", "q2", "q3"]
+
+
+def test_concurrent_turn_is_not_overwritten(data_dir):
+    worker_a, worker_b = chat_service.ChatSessions(), chat_service.ChatSessions()
+    session = _session("a2")
+    worker_a._sessions["a2"] = session
+    worker_a.save(session)
+
+    # Both workers load the session, then each records a turn
+    session_a, session_b = worker_a.get("a2"), worker_b.get("a2")
+    worker_b.record_turn(session_b, "q-b", "r-b")
+    worker_a.record_turn(session_a, "q-a", "r-a")
+
+    assert [q for q, _ in worker_b.get("a2").history] == ["q-b", "q-a"]
@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services import deadline, explanation_cache, llm_service
+
+SAMPLE_VCF = os.path.join(os.path.dirname(__file__), "..", "..", "sample_vcf", "sample_high_risk.vcf")
+EXPLANATION_ARGS = dict(
+    drug="CODEINE", risk_label="Toxic", phenotype="URM", diplotype="*1/*1xN", gene="CYP2D6",
+    variants=[], action="Avoid codeine", severity="critical", alternatives=["MORPHINE"],
+)
+
+
+@pytest.fixture
+def slow_provider(monkeypatch):
+    """A provider taking 0.3 s, recording the budget left to its flight after 0.1 s."""
+    seen = []
+
+    async def generate(prompt, cache_key, explanation_args):
+        await asyncio.sleep(0.1)
+        seen.append(deadline.remaining())
+        await asyncio.sleep(0.2)
+        return {"summary": "from provider", "generated_by": "gemini"}
+
+    monkeypatch.setattr(llm_service, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(llm_service, "_generate_explanation", generate)
+    monkeypatch.setattr(explanation_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(deadline, "DEADLINE_RESERVE_SECONDS", 0.0)
+    return seen
+
+
+def test_follower_without_deadline_gets_the_provider_result(slow_provider):
+    async def leader():
+        deadline.start(0.1)
+        return await llm_service.generate_clinical_explanation(**EXPLANATION_ARGS)
+
+    async def follower():
+        await asyncio.sleep(0.02)
+        # A job or warm-up caller: no request deadline
+        return await llm_service.generate_clinical_explanation(**EXPLANATION_ARGS)
+
+    async def scenario():
+        return await asyncio.gather(leader(), follower())
+
+    leader_result, follower_result = asyncio.run(scenario())
+
+    assert leader_result["generated_by"] == "rule-based-fallback (deadline)"
+    assert follower_result["generated_by"] == "gemini"
+    # The follower joined without a deadline, so the flight is no longer bounded
+    assert slow_provider == [None]
+
+
+def test_flight_runs_under_the_longest_caller_budget(slow_provider):
+    async def caller(budget: float, delay: float):
+        await asyncio.sleep(delay)
+        deadline.start(budget)
+        return await llm_service.generate_clinical_explanation(**EXPLANATION_ARGS)
+
+    async def scenario():
+        return await asyncio.gather(caller(0.5, 0), caller(5, 0.02))
+
+    results = asyncio.run(scenario())
+
+    assert [r["generated_by"] for r in results] == ["gemini", "gemini"]
+    # Bounded by the later caller's 5 s budget, not unbounded and not the leader's 0.5 s
+    assert slow_provider[0] is not None and 4.5 < slow_provider[0] <= 5
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-1"])
+def test_non_finite_or_negative_deadline_header_is_rejected(value, data_dir):
+    from main import app
+
+    with open(SAMPLE_VCF, "rb") as f:
+        vcf = f.read()
+    response = TestClient(app).post(
+        "/analyze",
+        files={"vcf_file": ("sample.vcf", vcf, "text/plain")},
+        data={"drugs": "CODEINE"},
+        headers={"X-GenRx-Deadline": value},
+    )
+    assert response.status_code == 400
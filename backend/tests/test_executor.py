@@ -0,0 +1,51 @@
+import asyncio
+import io
+import time
+
+from services import executor, knowledge_base, uploads
+
+
+def test_pipeline_cache_key_changes_with_the_knowledge_base(monkeypatch):
+    key = executor.pipeline_cache_key("0" * 64, ["CODEINE"], False)
+    assert executor.pipeline_cache_key("0" * 64, ["CODEINE"], False) == key
+
+    # A deploy with changed rules or variants must not reuse old risk results
+    monkeypatch.setattr(knowledge_base, "KB_VERSION", "next-release")
+    assert executor.pipeline_cache_key("0" * 64, ["CODEINE"], False) != key
+
+
+def test_inline_mode_parses_off_the_event_loop(data_dir, monkeypatch):
+    monkeypatch.setattr(executor, "ANALYSIS_WORKERS", 0)
+    monkeypatch.setattr(executor, "PIPELINE_CACHE_ENABLED", False)
+    monkeypatch.setattr(executor, "_pool", None)
+
+    def slow_pipeline(vcf_path, drugs, include_profiles, cancel_path=None):
+        time.sleep(0.3)
+        return executor.PipelineResult("P1", "VCFv4.2", True, 1, 0, [], [])
+
+    monkeypatch.setattr(executor, "run_pipeline", slow_pipeline)
+    vcf = uploads.spool(io.BytesIO(b"##fileformat=VCFv4.2\n"))
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        pipeline = await executor.run_analysis_pipeline(vcf, ["CODEINE"])
+        task.cancel()
+        return pipeline, ticks
+
+    try:
+        pipeline, ticks = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+        vcf.remove()
+
+    assert pipeline.success
+    # The loop kept running while the pipeline slept
+    assert ticks >= 10
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from services import explanation_cache
+
+
+@pytest.fixture
+def cache(data_dir, monkeypatch):
+    monkeypatch.setattr(explanation_cache, "_conn", None)
+    monkeypatch.setattr(explanation_cache, "_memory", type(explanation_cache._memory)())
+    monkeypatch.setattr(explanation_cache, "CACHE_ENABLED", True)
+    return explanation_cache
+
+
+def test_memory_is_bounded_and_evicts_least_recently_used(cache, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MEMORY_ENTRIES", 2)
+
+    async def scenario():
+        for key in ("a", "b"):
+            await cache.store(key, {"summary": key})
+        await cache.lookup("a")
+        await cache.store("c", {"summary": "c"})
+
+    asyncio.run(scenario())
+
+    assert list(cache._memory) == ["a", "c"]
+    # Evicted from memory, still served from SQLite
+    assert asyncio.run(cache.lookup("b")) == {"summary": "b"}
+    assert len(cache._memory) == 2
@@ -0,0 +1,138 @@
+"""
+Health-check latency while a large VCF is parsed (see services/executor.py).
+
+Starts the API with uvicorn in a subprocess, uploads a synthetic VCF of
+HEALTH_TEST_VCF_MB megabytes (default 64) and polls GET / for as long as
+the analysis runs. The parse happens in the process pool, so the event loop
+keeps answering: p95 health latency must stay under HEALTH_TEST_P95_SECONDS.
+The 1 GB case needs a few GB of free disk and minutes to run, so it is
+opt-in: HEALTH_TEST_LARGE=1.
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("fastapi")
+pytest.importorskip("uvicorn")
+
+from conftest import BACKEND_DIR
+
+VCF_MB = int(os.getenv("HEALTH_TEST_VCF_MB", "64"))
+LARGE_VCF_MB = 1024
+LARGE_ENABLED = os.getenv("HEALTH_TEST_LARGE", "0") == "1"
+P95_LIMIT_SECONDS = float(os.getenv("HEALTH_TEST_P95_SECONDS", "0.25"))
+POLL_INTERVAL_SECONDS = 0.05
+
+VCF_HEADER = (
+    "##fileformat=VCFv4.2\n"
+    '##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">\n'
+    '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tLOADTEST\n"
+    "chr22\t42524947\trs3892097\tG\tA\t99\tPASS\tDP=40\tGT\t0/1\n"
+)
+
+
+def _write_vcf(path: str, megabytes: int) -> None:
+    """Header, one PGx hit, then non-PGx filler lines up to `megabytes`."""
+    line = "chr2\t{}\t.\tA\tG\t50\tPASS\tDP=30;" + "X" * 120 + "\tGT\t0/1\n"
+    target = megabytes * 1024 * 1024
+    with open(path, "w") as f:
+        f.write(VCF_HEADER)
+        pos = 1
+        while f.tell() < target:
+            f.write("".join(line.format(pos + i) for i in range(10000)))
+            pos += 10000
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def server(tmp_path):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        GENRX_DATA_DIR=str(tmp_path / "data"),
+        GEMINI_API_KEY="",
+        GROQ_API_KEY="",
+        WARMUP_ENABLED="0",
+        REEVALUATION_ON_STARTUP="0",
+        PIPELINE_CACHE_ENABLED="0",
+        FAST_STARTUP="0",
+        ANALYSIS_WORKERS="2",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(base_url + "/", timeout=1)
+            break
+        except httpx.TransportError:
+            time.sleep(0.2)
+    else:
+        proc.kill()
+        pytest.fail("API did not start")
+    yield base_url
+    proc.terminate()
+    proc.wait(timeout=30)
+
+
+def _p95(values: list) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(0.95 * len(ordered)), len(ordered) - 1)]
+
+
+@pytest.mark.parametrize("megabytes", [
+    VCF_MB,
+    pytest.param(LARGE_VCF_MB, marks=pytest.mark.skipif(
+        not LARGE_ENABLED, reason="1 GB upload is opt-in (HEALTH_TEST_LARGE=1)"
+    )),
+])
+def test_health_latency_flat_during_large_parse(server, tmp_path, megabytes):
+    vcf_path = tmp_path / "large.vcf"
+    _write_vcf(str(vcf_path), megabytes)
+
+    async def scenario():
+        async with httpx.AsyncClient(base_url=server, timeout=None) as client:
+            async def analyze():
+                with open(vcf_path, "rb") as f:
+                    return await client.post(
+                        "/analyze",
+                        files={"vcf_file": ("large.vcf", f, "text/plain")},
+                        data={"drugs": "CODEINE"},
+                    )
+
+            task = asyncio.create_task(analyze())
+            latencies = []
+            while not task.done():
+                started = time.perf_counter()
+                response = await client.get("/")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            return await task, latencies
+
+    response, latencies = asyncio.run(scenario())
+
+    assert response.status_code == 200, response.text
+    result = response.json()[0]
+    assert result["pharmacogenomic_profile"]["primary_gene"] == "CYP2D6"
+    assert result["quality_metrics"]["total_variants_parsed"] > 1
+    # The analysis must have overlapped the polling for the check to mean anything
+    assert len(latencies) >= 10
+    assert _p95(latencies) < P95_LIMIT_SECONDS, (
+        f"p95 health latency {_p95(latencies):.3f}s over {len(latencies)} polls"
+    )
@@ -0,0 +1,40 @@
+import asyncio
+import hashlib
+import io
+
+from fastapi import UploadFile
+
+from models.models import JobState
+from services import uploads
+from services.jobs import JobManager
+
+
+def _submit(manager: JobManager, content: bytes):
+    return asyncio.run(manager.submit(UploadFile(io.BytesIO(content)), ["CODEINE"], None))
+
+
+def test_cancel_queued_job_removes_upload(data_dir):
+    manager = JobManager()
+    job = _submit(manager, b"##fileformat=VCFv4.2\n")
+    upload = data_dir / f"job_{job.job_id}.vcf"
+    assert upload.exists()
+
+    cancelled = manager.cancel(job.job_id)
+
+    assert cancelled.status == JobState.CANCELLED
+    assert not upload.exists()
+    # Nothing left for a runner to claim
+    assert manager._claim_next() is None
+
+
+def test_submit_streams_upload_to_disk_in_chunks(data_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_BYTES", 7)
+    content = b"##fileformat=VCFv4.2\n" * 50
+    manager = JobManager()
+
+    job = _submit(manager, content)
+
+    assert (data_dir / f"job_{job.job_id}.vcf").read_bytes() == content
+    row = manager._db().execute("SELECT upload_sha256 FROM jobs WHERE id = ?", (job.job_id,)).fetchone()
+    # Recorded while spooling, so the runner never re-reads the file to hash it
+    assert row["upload_sha256"] == hashlib.sha256(content).hexdigest()
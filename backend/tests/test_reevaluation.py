@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+from services import (
+    executor, knowledge_base, llm_service, orchestrator, reevaluation, shared_cache, vcf_parser,
+)
+from services.analysis_store import AnalysisStore
+
+SAMPLE_VCF = os.path.join(os.path.dirname(__file__), "..", "..", "sample_vcf", "sample_high_risk.vcf")
+DRUGS = ["CODEINE", "CLOPIDOGREL"]
+
+
+def _labels(results) -> dict:
+    return {
+        r.drug: (r.pharmacogenomic_profile.phenotype.value, r.risk_assessment.risk_label.value)
+        for r in results
+    }
+
+
+def test_reevaluation_applies_a_corrected_variant_entry(data_dir, monkeypatch):
+    monkeypatch.setattr(llm_service, "GEMINI_API_KEY", "")
+    monkeypatch.setattr(llm_service, "GROQ_API_KEY", "")
+    monkeypatch.setattr(shared_cache, "acquire_lease", lambda name, ttl: True)
+    store = AnalysisStore()
+    monkeypatch.setattr(reevaluation, "analysis_store", store)
+
+    pipeline = executor.run_pipeline(SAMPLE_VCF, DRUGS, include_profiles=True)
+    outcome = orchestrator.AnalysisOutcome(
+        analysis_id="a1", patient_id="P1", timestamp="2026-01-01T00:00:00Z", pipeline=pipeline,
+        drugs=[
+            (risk.drug, risk, llm_service.generate_fallback_explanation(**orchestrator.explanation_kwargs(risk)))
+            for risk in pipeline.risk_results
+        ],
+    )
+    store._write([outcome])
+    assert _labels(store.get_analysis("a1")) == {
+        "CODEINE": ("PM", "Ineffective"), "CLOPIDOGREL": ("PM", "Ineffective"),
+    }
+
+    # A knowledge-base release reclassifying CYP2D6*4 and CYP2C19*2 as normal function
+    for rsid in ("rs3892097", "rs4244285"):
+        entry = {**vcf_parser.PHARMACO_VARIANTS_DB[rsid], "effect": "normal_function", "activity": 1.0}
+        monkeypatch.setitem(vcf_parser.PHARMACO_VARIANTS_DB, rsid, entry)
+        key = knowledge_base.variant_key(rsid)
+        monkeypatch.setitem(knowledge_base.FINGERPRINTS, key, knowledge_base._fingerprint(entry))
+    monkeypatch.setattr(knowledge_base, "KB_VERSION", knowledge_base._fingerprint(knowledge_base.FINGERPRINTS))
+
+    status = asyncio.run(reevaluation.run_reevaluation())
+
+    assert status.failed == 0 and status.changed == 2
+    fresh = executor.run_pipeline(SAMPLE_VCF, DRUGS)
+    expected = {
+        r.drug: (r.phenotype, r.risk_label) for r in fresh.risk_results
+    }
+    assert _labels(store.get_analysis("a1")) == expected == {
+        "CODEINE": ("NM", "Safe"), "CLOPIDOGREL": ("URM", "Adjust Dosage"),
+    }
@@ -0,0 +1,82 @@
+from services import vcf_parser
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\n"
+)
+
+
+def _parse(*records: str, header: str = HEADER) -> vcf_parser.ParseResult:
+    return vcf_parser.parse_vcf(header + "\n".join(records) + "\n")
+
+
+def test_multiallelic_rsid_record_is_one_variant():
+    # rs3892097 (CYP2D6*4) with a second ALT allele; the sample carries both
+    result = _parse("chr22\t42524947\trs3892097\tG\tA,T\t99\tPASS\t.\tGT\t1/2")
+
+    assert len(result.pharmaco_variants) == 1
+    variant = result.pharmaco_variants[0]
+    assert (variant.rsid, variant.alt) == ("rs3892097", "A,T")
+    profile = result.gene_profiles["CYP2D6"]
+    assert profile.diplotype == "*1/*4"
+    assert profile.phenotype == "NM"
+    assert profile.activity_score == 1.0
+
+
+def test_multiallelic_ann_record_is_split_per_allele():
+    ann = "ANN=T|missense_variant|MODERATE|CYP2C19|CYP2C19|transcript|NM_000769.4|protein_coding"
+    result = _parse(f"chr10\t96541700\t.\tC\tA,T\t99\tPASS\t{ann}\tGT\t1/2")
+
+    # Only the T allele is annotated to a pharmacogene
+    assert [(v.gene, v.alt, v.zygosity) for v in result.pharmaco_variants] == [
+        ("CYP2C19", "T", "heterozygous")
+    ]
+
+
+GVCF_HEADER = HEADER.replace("#CHROM", '##contig=<ID=chr22,length=51304566>\n#CHROM')
+
+
+def _reference_block(chrom: str, start: int, end: int) -> str:
+    return f"{chrom}\t{start}\t.\tN\t<NON_REF>\t.\t.\tEND={end}\tGT\t0/0"
+
+
+def test_gene_with_uncurated_sites_is_not_reference_confirmed():
+    from services import orchestrator, risk_engine
+
+    result = _parse(
+        _reference_block("chr22", 42522000, 42527000),   # every curated CYP2D6 site
+        _reference_block("chr10", 96520000, 96613000),   # every CYP2C19 site
+        header=GVCF_HEADER,
+    )
+    summary = {c.gene: c for c in orchestrator.coverage_summary(result.coverage)}
+
+    # CYP2D6 *3, *6 and *41 have no coordinates: never checked, never confirmed
+    assert summary["CYP2D6"].hom_ref and not summary["CYP2D6"].absent
+    assert summary["CYP2D6"].uncurated == ["rs35742686", "rs5030655", "rs28371706"]
+    assert not summary["CYP2D6"].reference_confirmed
+    assert summary["CYP2C19"].reference_confirmed
+
+    codeine = risk_engine.assess_drug_risk("CODEINE", result.gene_profiles, result.coverage)
+    clopidogrel = risk_engine.assess_drug_risk("CLOPIDOGREL", result.gene_profiles, result.coverage)
+    plain = risk_engine.assess_drug_risk("CODEINE", result.gene_profiles)
+    # The all-sites-called bonus only applies when every knowledge-base site was checked
+    assert codeine.confidence_score == plain.confidence_score
+    assert clopidogrel.confidence_score > risk_engine.assess_drug_risk("CLOPIDOGREL", result.gene_profiles).confidence_score
+
+
+GRCH38_HEADER = HEADER.replace("#CHROM", "##contig=<ID=chr22,length=50818468>\n#CHROM")
+
+
+def test_position_match_requires_the_curated_allele():
+    # GRCh38 position of rs3892097 (CYP2D6*4, C>T on the forward strand)
+    star4 = _parse("chr22\t42128945\t.\tC\tT\t99\tPASS\t.\tGT\t0/1", header=GRCH38_HEADER)
+    assert [(v.rsid, v.star_allele) for v in star4.pharmaco_variants] == [("rs3892097", "*4")]
+    assert star4.genome_build == "GRCh38"
+
+    # Gene-oriented notation of the same allele
+    coding = _parse("chr22\t42128945\t.\tG\tA\t99\tPASS\t.\tGT\t0/1", header=GRCH38_HEADER)
+    assert [v.star_allele for v in coding.pharmaco_variants] == ["*4"]
+
+    # A different change at the same position is not *4
+    other = _parse("chr22\t42128945\t.\tG\tC\t99\tPASS\t.\tGT\t0/1", header=GRCH38_HEADER)
+    assert other.pharmaco_variants == []
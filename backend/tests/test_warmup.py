@@ -0,0 +1,22 @@
+import asyncio
+
+from services import explanation_cache, llm_service, shared_cache, warmup
+
+
+def test_warmup_stops_when_the_lease_is_lost(monkeypatch):
+    leases = iter([True, True, True, False])
+    generated = []
+
+    async def generate(**kwargs):
+        generated.append(kwargs["drug"])
+
+    monkeypatch.setattr(llm_service, "has_llm_provider", lambda: True)
+    monkeypatch.setattr(llm_service, "generate_clinical_explanation", generate)
+    monkeypatch.setattr(explanation_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(shared_cache, "acquire_lease", lambda name, ttl: next(leases, True))
+    monkeypatch.setattr(warmup, "WARMUP_REQUESTS_PER_MINUTE", 1e9)
+
+    asyncio.run(warmup.run_warmup())
+
+    # Initial acquire, two renewals, then the lost renewal ends the loop
+    assert len(generated) == 2
@@ -4,6 +4,7 @@ import { FileUpload } from './components/FileUpload';
 import { DrugInput } from './components/DrugInput';
 import { Dashboard } from './components/Dashboard';
 import { ResultsDisplay } from './components/ResultsDisplay';
+import { GenomeChat } from './components/GenomeChat';
 
 import { AnalysisLoader } from './components/AnalysisLoader';
 import { useAnalysis } from './hooks/useAnalysis';
@@ -17,6 +18,7 @@ const App: React.FC = () => {
   const [view, setView] = useState<'analysis' | 'dashboard'>('analysis');
   const [file, setFile] = useState<File | null>(null);
   const [fileError, setFileError] = useState<string | null>(null);
+  const [preExtract, setPreExtract] = useState<boolean>(false);
   const [drug, setDrug] = useState<string>('');
   const [patientId, setPatientId] = useState<string>('');
   const [latestResult, setLatestResult] = useState<any>(null);
@@ -38,7 +40,8 @@ const App: React.FC = () => {
       const analysisResults = await analyze({
         vcfFile: file,
         drugs: drug,
-        patientId: patientId || undefined
+        patientId: patientId || undefined,
+        preExtract
       });
       // Update dashboard state
       setLatestResult({ results: analysisResults });
@@ -129,6 +132,8 @@ const App: React.FC = () => {
                       setFile={handleFileChange}
                       error={fileError}
                       setError={setFileError}
+                      preExtract={preExtract}
+                      setPreExtract={setPreExtract}
                     />
 
                     <DrugInput
@@ -234,6 +239,7 @@ const App: React.FC = () => {
                     {results.map((res: any, index: number) => (
                       <ResultsDisplay key={`${res.drug}-${index}`} result={res} />
                     ))}
+                    <GenomeChat key={results[0]?.quality_metrics.analysis_id} results={results} />
                   </>
                 ) : (
                   <div className="h-full min-h-[500px] flex flex-col items-center justify-center glass-card rounded-3xl border-2 border-dashed border-slate-300 p-12 text-center animate-fade-in group">
@@ -1,13 +1,16 @@
 import React, { useCallback } from 'react';
 import { UploadCloud, FileText, X, AlertCircle } from 'lucide-react';
 
-const validateVCF = (file: File): string | null => {
+// Only the raw upload is capped; pre-extracted files shrink to the PGx lines
+const MAX_UPLOAD_BYTES = 5 * 1024 * 1024;
+
+const validateVCF = (file: File, preExtract: boolean): string | null => {
   const fileName = file.name.toLowerCase();
   if (!fileName.endsWith('.vcf') && !fileName.endsWith('.vcf.gz')) {
     return "Invalid format. I can only analyze .vcf or .vcf.gz files.";
   }
-  if (file.size > 5 * 1024 * 1024) {
-    return "File size exceeds the 5MB limit.";
+  if (!preExtract && file.size > MAX_UPLOAD_BYTES) {
+    return "File size exceeds the 5MB limit. Enable PGx pre-extraction for whole genomes.";
   }
   return null;
 };
@@ -17,9 +20,13 @@ interface FileUploadProps {
   setFile: (file: File | null) => void;
   error: string | null;
   setError: (err: string | null) => void;
+  preExtract: boolean;
+  setPreExtract: (enabled: boolean) => void;
 }
 
-export const FileUpload: React.FC<FileUploadProps> = ({ file, setFile, error, setError }) => {
+export const FileUpload: React.FC<FileUploadProps> = ({
+  file, setFile, error, setError, preExtract, setPreExtract
+}) => {
   const handleDragOver = (e: React.DragEvent) => {
     e.preventDefault();
     e.stopPropagation();
@@ -30,7 +37,7 @@ export const FileUpload: React.FC<FileUploadProps> = ({ file, setFile, error, se
     e.stopPropagation();
     const droppedFile = e.dataTransfer.files[0];
     handleFileSelection(droppedFile);
-  }, []);
+  }, [preExtract]);
 
   const handleFileInput = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files[0]) {
@@ -39,7 +46,7 @@ export const FileUpload: React.FC<FileUploadProps> = ({ file, setFile, error, se
   };
 
   const handleFileSelection = (selectedFile: File) => {
-    const validationError = validateVCF(selectedFile);
+    const validationError = validateVCF(selectedFile, preExtract);
     if (validationError) {
       setError(validationError);
       setFile(null);
@@ -49,6 +56,12 @@ export const FileUpload: React.FC<FileUploadProps> = ({ file, setFile, error, se
     }
   };
 
+  const togglePreExtract = () => {
+    const enabled = !preExtract;
+    setPreExtract(enabled);
+    if (file) setError(validateVCF(file, enabled));
+  };
+
   const removeFile = () => {
     setFile(null);
     setError(null);
@@ -84,7 +97,7 @@ export const FileUpload: React.FC<FileUploadProps> = ({ file, setFile, error, se
               Select Patient Genome
             </p>
             <p className="text-slate-500 text-[11px] font-medium">
-              v4.2 Variant Call Format • Max 5MB
+              v4.2 Variant Call Format • {preExtract ? 'Any size' : 'Max 5MB'}
             </p>
           </label>
         </div>
@@ -109,6 +122,18 @@ export const FileUpload: React.FC<FileUploadProps> = ({ file, setFile, error, se
         </div>
       )}
 
+      <label className="flex items-center gap-2 ml-1 cursor-pointer select-none">
+        <input
+          type="checkbox"
+          checked={preExtract}
+          onChange={togglePreExtract}
+          className="accent-teal-600"
+        />
+        <span className="text-[11px] font-bold text-slate-500">
+          Extract PGx variants in the browser (uploads only pharmacogene regions)
+        </span>
+      </label>
+
       {error && (
         <p className="mt-2 text-[11px] font-black text-rose-500 flex items-center gap-2 uppercase tracking-tight ml-1">
           <AlertCircle className="w-4 h-4" />
@@ -0,0 +1,98 @@
+import React, { useState } from 'react';
+import { Loader2, MessageSquare, Send } from 'lucide-react';
+import { AnalysisResult } from '../types';
+import { chatGenome } from '../services/api';
+
+interface GenomeChatProps {
+  results: AnalysisResult[];
+}
+
+interface ChatTurn {
+  question: string;
+  answer: string;
+}
+
+export const GenomeChat: React.FC<GenomeChatProps> = ({ results }) => {
+  const [turns, setTurns] = useState<ChatTurn[]>([]);
+  const [query, setQuery] = useState('');
+  const [suggestions, setSuggestions] = useState<string[]>([]);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const ask = async (question: string) => {
+    const text = question.trim();
+    if (!text || loading) return;
+    setLoading(true);
+    setError(null);
+    try {
+      const reply = await chatGenome(text, results);
+      setTurns((previous) => [...previous, { question: text, answer: reply.response }]);
+      setSuggestions(reply.suggested_follow_ups);
+      setQuery('');
+    } catch (err: any) {
+      setError(err.message || 'Chat failed');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  return (
+    <div className="glass-card rounded-2xl p-4 sm:p-6 space-y-4 animate-fade-in">
+      <div className="flex items-center gap-3">
+        <div className="bg-teal-500 p-2 rounded-xl shadow-lg shadow-teal-500/20">
+          <MessageSquare className="w-5 h-5 text-white" />
+        </div>
+        <h3 className="text-lg font-black text-slate-900 tracking-tight">Ask About This Report</h3>
+      </div>
+
+      {turns.map((turn, index) => (
+        <div key={index} className="space-y-2 text-sm">
+          <p className="font-bold text-slate-900">{turn.question}</p>
+          <p className="text-slate-600 whitespace-pre-line leading-relaxed">{turn.answer}</p>
+        </div>
+      ))}
+
+      {suggestions.length > 0 && (
+        <div className="flex flex-wrap gap-2">
+          {suggestions.map((s) => (
+            <button
+              key={s}
+              type="button"
+              onClick={() => ask(s)}
+              disabled={loading}
+              className="px-3 py-1.5 rounded-xl text-[11px] font-bold bg-white/80 text-slate-600 border border-slate-200 hover:border-teal-400 hover:text-teal-700 transition-all disabled:opacity-50"
+            >
+              {s}
+            </button>
+          ))}
+        </div>
+      )}
+
+      {error && <p className="text-xs font-bold text-rose-600">{error}</p>}
+
+      <form
+        className="flex gap-2"
+        onSubmit={(e) => {
+          e.preventDefault();
+          ask(query);
+        }}
+      >
+        <input
+          type="text"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          placeholder="e.g. Why is codeine flagged?"
+          className="flex-grow rounded-xl border border-slate-200 bg-white/50 px-4 py-2.5 text-sm text-slate-900 font-medium focus:border-teal-500 focus:ring-4 focus:ring-teal-500/10 outline-none transition-all"
+        />
+        <button
+          type="submit"
+          disabled={loading || !query.trim()}
+          className="flex items-center justify-center px-4 rounded-xl bg-teal-600 hover:bg-teal-700 text-white shadow-lg shadow-teal-600/20 transition-all active:scale-95 disabled:opacity-50"
+          title="Send"
+        >
+          {loading ? <Loader2 className="w-4 h-4 animate-spin" /> : <Send className="w-4 h-4" />}
+        </button>
+      </form>
+    </div>
+  );
+};
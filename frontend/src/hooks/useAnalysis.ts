@@ -1,4 +1,5 @@
 import { useState, useCallback, useRef } from 'react';
+import { extractPgxVariants } from '../utils/pgxExtract';
 
 const API_BASE = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -20,7 +21,7 @@ export function useAnalysis() {
 
   const stepRef = useRef(0);
 
-  const analyze = useCallback(async ({ vcfFile, drugs, patientId }: { vcfFile: File, drugs: string, patientId?: string }) => {
+  const analyze = useCallback(async ({ vcfFile, drugs, patientId, preExtract = false }: { vcfFile: File, drugs: string, patientId?: string, preExtract?: boolean }) => {
     setLoading(true);
     setError(null);
     setResults(null);
@@ -37,8 +38,11 @@ export function useAnalysis() {
     }, 800); // Slower initial pace for realism
 
     try {
+      // Opt-in: strip the file down to PGx lines off the main thread first
+      const upload = preExtract ? (await extractPgxVariants(vcfFile)).file : vcfFile;
+
       const formData = new FormData();
-      formData.append('vcf_file', vcfFile);
+      formData.append('vcf_file', upload);
       formData.append('drugs', drugs);
       if (patientId) formData.append('patient_id', patientId);
 
@@ -1,4 +1,4 @@
-import { AnalysisResult } from '../types';
+import { AnalysisResult, PgxRegionTable } from '../types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -27,22 +27,69 @@ export const analyzePharmacogenomics = async (
   return response.json();
 };
 
-export const chatGenome = async (
-  query: string,
-  context: AnalysisResult[]
-): Promise<{ response: string; suggested_follow_ups: string[] }> => {
-  const response = await fetch(`${API_BASE_URL}/chat`, {
+export interface ChatReply {
+  response: string;
+  suggested_follow_ups: string[];
+  analysis_id: string;
+}
+
+// Analyses whose chat session the server already holds
+const openChats = new Set<string>();
+
+const postChat = (body: object) =>
+  fetch(`${API_BASE_URL}/chat`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
     },
-    body: JSON.stringify({ query, context }),
+    body: JSON.stringify(body),
   });
 
+// The server keeps a session per analysis, so the results are sent only to
+// open it: on the first turn, or again if the session has expired (404)
+export const chatGenome = async (query: string, context: AnalysisResult[]): Promise<ChatReply> => {
+  const analysisId = context[0]?.quality_metrics.analysis_id;
+  const opened = analysisId !== undefined && openChats.has(analysisId);
+
+  let response = await postChat(opened ? { query, analysis_id: analysisId } : { query, analysis_id: analysisId, context });
+  if (opened && response.status === 404) {
+    openChats.delete(analysisId);
+    response = await postChat({ query, analysis_id: analysisId, context });
+  }
+
   if (!response.ok) {
     const errorData = await response.json().catch(() => ({}));
     throw new Error(errorData.detail || 'Chat failed');
   }
 
+  const reply: ChatReply = await response.json();
+  openChats.add(reply.analysis_id);
+  return reply;
+};
+
+export const fetchAnalysis = async (analysisId: string): Promise<AnalysisResult[]> => {
+  const response = await fetch(`${API_BASE_URL}/analyses/${encodeURIComponent(analysisId)}`);
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || 'Analysis not found');
+  }
+
   return response.json();
 };
+
+let pgxRegions: Promise<PgxRegionTable> | null = null;
+
+// The table only changes with a backend release, so fetch it once per page load
+export const fetchPgxRegions = (): Promise<PgxRegionTable> => {
+  if (!pgxRegions) {
+    pgxRegions = fetch(`${API_BASE_URL}/pgx-regions`).then((response) => {
+      if (!response.ok) throw new Error('Could not load PGx regions');
+      return response.json();
+    });
+    pgxRegions.catch(() => {
+      pgxRegions = null;
+    });
+  }
+  return pgxRegions;
+};
@@ -48,11 +48,13 @@ export interface LLMExplanation {
 export interface QualityMetrics {
   vcf_parsing_success: boolean;
   vcf_version?: string;
+  genome_build?: string;
   total_variants_parsed: number;
   pharmacogenomic_variants_found: number;
   genes_analyzed: string[];
   parsing_errors: string[];
   analysis_id: string;
+  knowledge_base_version?: string;
 }
 
 export interface AnalysisResult {
@@ -66,6 +68,25 @@ export interface AnalysisResult {
   quality_metrics: QualityMetrics;
 }
 
+export interface PgxRegion {
+  build: string;
+  gene: string;
+  chrom: string;
+  start: number;
+  end: number;
+}
+
+export interface PgxRegionTable {
+  builds: string[];
+  regions: PgxRegion[];
+  chrom_aliases: Record<string, string>;
+  rsids: string[];
+  gene_symbols: string[];
+  info_tags: string[];
+  original_count_meta: string;
+  gvcf_reference_alts: string[];
+}
+
 export const TARGET_GENES = [
   "CYP2D6",
   "CYP2C19",
@@ -0,0 +1,46 @@
+import { fetchPgxRegions } from '../services/api';
+import type { ExtractMessage } from '../workers/pgxExtract.worker';
+
+export interface ExtractedVcf {
+  file: File;
+  originalLines: number;
+  keptLines: number;
+}
+
+/**
+ * Reduce a VCF to its header and PGx-relevant lines in a Web Worker, so large
+ * genomes are never uploaded (or held on the main thread) in full.
+ */
+export const extractPgxVariants = async (
+  file: File,
+  onProgress?: (fraction: number) => void
+): Promise<ExtractedVcf> => {
+  const table = await fetchPgxRegions();
+  const worker = new Worker(new URL('../workers/pgxExtract.worker.ts', import.meta.url), {
+    type: 'module',
+  });
+
+  try {
+    return await new Promise<ExtractedVcf>((resolve, reject) => {
+      worker.onmessage = (event: MessageEvent<ExtractMessage>) => {
+        const message = event.data;
+        if (message.type === 'progress') {
+          onProgress?.(message.totalBytes ? message.bytesRead / message.totalBytes : 0);
+        } else if (message.type === 'done') {
+          const name = file.name.replace(/\.gz$/i, '').replace(/\.vcf$/i, '') + '.pgx.vcf';
+          resolve({
+            file: new File([message.text], name, { type: 'text/plain' }),
+            originalLines: message.originalLines,
+            keptLines: message.keptLines,
+          });
+        } else {
+          reject(new Error(message.message));
+        }
+      };
+      worker.onerror = (event) => reject(new Error(event.message || 'PGx extraction failed'));
+      worker.postMessage({ file, table });
+    });
+  } finally {
+    worker.terminate();
+  }
+};
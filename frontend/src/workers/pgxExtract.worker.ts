@@ -0,0 +1,103 @@
+/// <reference lib="webworker" />
+// Streams a (possibly gzipped) VCF and keeps only the header plus the lines the
+// backend parser could ever match, so a multi-GB genome uploads as a few KB.
+
+import type { PgxRegionTable } from '../types';
+
+export type ExtractRequest = { file: File; table: PgxRegionTable };
+
+export type ExtractMessage =
+  | { type: 'progress'; bytesRead: number; totalBytes: number }
+  | { type: 'done'; text: string; originalLines: number; keptLines: number }
+  | { type: 'error'; message: string };
+
+const buildMatcher = (table: PgxRegionTable) => {
+  const rsids = new Set(table.rsids);
+  // Regions of every build: a line is kept if it falls in the gene on either
+  const regions = new Map<string, Array<[number, number]>>();
+  for (const r of table.regions) {
+    const list = regions.get(r.chrom) ?? [];
+    list.push([r.start, r.end]);
+    regions.set(r.chrom, list);
+  }
+  const symbols = new RegExp(`(?<![A-Za-z0-9])(?:${table.gene_symbols.join('|')})(?![A-Za-z0-9])`);
+
+  const overlaps = (chrom: string, start: number, end: number) =>
+    (regions.get(table.chrom_aliases[chrom] ?? chrom) ?? []).some(([s, e]) => start <= e && end >= s);
+
+  return (cols: string[]): boolean => {
+    const [chrom, posStr, id, , alt, , , info = ''] = cols;
+    if (id.split(';').some((rs) => rsids.has(rs))) return true;
+
+    const pos = Number(posStr);
+    // gVCF reference blocks span POS..END
+    const endMatch = alt.startsWith('<') ? /(?:^|;)END=(\d+)/.exec(info) : null;
+    if (overlaps(chrom, pos, endMatch ? Number(endMatch[1]) : pos)) return true;
+
+    const rsTag = /(?:^|;)RS=(\d+)/.exec(info);
+    if (rsTag && rsids.has(`rs${rsTag[1]}`)) return true;
+    if (/(?:^|;)GENE=/.test(info) && /(?:^|;)STAR=/.test(info)) return true;
+    return (info.includes('ANN=') || info.includes('CSQ=')) && symbols.test(info);
+  };
+};
+
+self.onmessage = async (event: MessageEvent<ExtractRequest>) => {
+  const { file, table } = event.data;
+  const post = (message: ExtractMessage) => self.postMessage(message);
+
+  try {
+    const matches = buildMatcher(table);
+    const referenceAlts = new Set(table.gvcf_reference_alts);
+    let bytesRead = 0;
+    // Count raw (possibly compressed) bytes so progress matches file.size
+    let stream: ReadableStream<Uint8Array> = file.stream().pipeThrough(
+      new TransformStream<Uint8Array, Uint8Array>({
+        transform(chunk, controller) {
+          bytesRead += chunk.length;
+          controller.enqueue(chunk);
+        },
+      })
+    );
+    if (file.name.toLowerCase().endsWith('.gz')) {
+      stream = stream.pipeThrough(new DecompressionStream('gzip'));
+    }
+    const reader = stream.pipeThrough(new TextDecoderStream()).getReader();
+
+    const meta: string[] = [];
+    const kept: string[] = [];
+    let columnHeader = '';
+    let originalLines = 0;
+    let carry = '';
+
+    const handle = (line: string) => {
+      if (!line) return;
+      if (line.startsWith('##')) {
+        meta.push(line);
+      } else if (line.startsWith('#CHROM')) {
+        columnHeader = line;
+      } else {
+        const cols = line.split('\t', 8);
+        // Counted as the backend counts variants: no gVCF reference blocks, no malformed lines
+        if (cols.length >= 8 && !referenceAlts.has(cols[4])) originalLines += 1;
+        if (matches(cols)) kept.push(line);
+      }
+    };
+
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      const lines = (carry + value).split('\n');
+      carry = lines.pop() ?? '';
+      for (const line of lines) handle(line.replace(/\r$/, ''));
+      post({ type: 'progress', bytesRead, totalBytes: file.size });
+    }
+    handle(carry.replace(/\r$/, ''));
+
+    // The backend reports the full file's size as total_variants_parsed
+    meta.push(`${table.original_count_meta}${originalLines}`);
+    const text = [...meta, columnHeader, ...kept].join('\n') + '\n';
+    post({ type: 'done', text, originalLines, keptLines: kept.length });
+  } catch (err: any) {
+    post({ type: 'error', message: err?.message ?? String(err) });
+  }
+};